@@ -1,20 +1,57 @@
-﻿from flask import Flask, render_template, request, jsonify, url_for, redirect, flash, session
+﻿from flask import Flask, Response, render_template, request, jsonify, url_for, redirect, flash, session, send_file, g, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, date, timedelta
-from sqlalchemy import text
+from sqlalchemy import text, func, select, insert, update, delete, union, case, and_
 from sqlalchemy.exc import IntegrityError
+from urllib.parse import urlsplit
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
+from collections import Counter
+from contextlib import nullcontext
+from functools import wraps
+import click
+import hashlib
+import hmac
 import json
 import os
+import tempfile
+import time
+import uuid
+
+import config
+import sqlite_backend
+from json_provider import loads as json_loads, provider_class
+from assets import StaticAssets
+from async_db import AsyncDatabase
+from compression import Compressor
+from export_formats import ZipStream, csv_chunks, ndjson_lines
+from health import TableSizeSampler, pool_status
+from profiler import RequestProfiler
+from rate_limit import RateLimiter, rate_class
+from replicas import ReplicaRouter, read_only
+from response_cache import ResponseCache
+from sharding import RoutingSession, ShardRouter
+from slow_queries import SlowQueryLog
+from sql_metrics import QueryTracker, metric_lines
+from write_queue import PendingToggles, QueueFull, WriteCoalescer
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'stardew-farm-secret-key-2024'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://root:@localhost/daily_tracker'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-
-db = SQLAlchemy(app)
+# database URL, pool tuning, cache settings etc. all come from the environment via config.py
+app.config.from_object(config)
+
+# Extensions are bound to the app (and the engine created) by create_app() at the bottom
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+shard_router = ShardRouter()  # per-user tables -> SHARD_DATABASE_URLS (off when unset)
+replica_router = ReplicaRouter()  # @read_only views -> REPLICA_DATABASE_URLS (off when unset)
+query_tracker = QueryTracker()  # per-request SQL counts, N+1 warnings
+slow_query_log = SlowQueryLog()
+static_assets = StaticAssets()
+response_cache = ResponseCache()
+async_db = AsyncDatabase()  # optional asyncio engine for the /api/async read path
+compressor = Compressor()  # gzip/brotli per Accept-Encoding
+write_queue = WriteCoalescer()  # optional write-behind for mood and habit-log POSTs
+habit_toggles = PendingToggles()  # completed_today answered for queued habit logs
+rate_limiter = RateLimiter()  # per-user token buckets (RATE_LIMITS) and load shedding for /api
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -29,15 +66,192 @@ class User(db.Model):
             'user_id': self.user_id,
             'name': self.name,
             'email': self.email,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
 
+# ===== Per-user data versions (validators for conditional GET) =====
+class DataVersion(db.Model):
+    """Counter per (user, resource), bumped in the same transaction as every write to that resource."""
+    __tablename__ = 'data_versions'
+    user_id = db.Column(db.Integer, primary_key=True)
+    resource = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+def upsert_increment(table, keys, deltas):
+    """
+    Add `deltas` to the row of `table` identified by `keys`, inserting it if
+    missing. One statement on MySQL/SQLite; update-then-insert elsewhere.
+    Runs in the caller's session.
+    """
+    values = dict(keys, **deltas)
+    dialect = db.session.get_bind(clause=table).dialect.name
+
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as upsert
+        stmt = upsert(table).values(**values)
+        stmt = stmt.on_duplicate_key_update({k: table.c[k] + stmt.inserted[k] for k in deltas})
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as upsert
+        stmt = upsert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={k: table.c[k] + stmt.excluded[k] for k in deltas}
+        )
+    else:
+        updated = db.session.execute(
+            table.update()
+            .where(*(table.c[k] == v for k, v in keys.items()))
+            .values({k: table.c[k] + v for k, v in deltas.items()})
+        )
+        if updated.rowcount:
+            return
+        stmt = insert(table).values(**values)
+    db.session.execute(stmt)
+
+def bump_data_version(user_id, *resources):
+    for resource in resources:
+        upsert_increment(DataVersion.__table__, {'user_id': user_id, 'resource': resource}, {'version': 1})
+
+def versioned(*resources):
+    """
+    Conditional GET for a per-user list endpoint. The weak ETag combines the
+    user's versions of `resources` (one primary-key lookup), today's date and
+    the query string, so a matching If-None-Match gets a 304 before the view
+    runs its query or serializer. Other methods pass straight through.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            user_id = session.get('user_id', 1)
+            versions = dict(db.session.execute(
+                select(DataVersion.resource, DataVersion.version)
+                .where(DataVersion.user_id == user_id, DataVersion.resource.in_(resources))
+            ).all())
+            key = f"{user_id}|{date.today()}|{request.full_path}|" + ','.join(f"{r}={versions.get(r, 0)}" for r in resources)
+            etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+# ===== Sparse fieldsets (?compact=1, ?fields=a,b) =====
+# Canonical field names of each list resource. Computed fields cost extra
+# queries, so compact mode leaves them out unless they are named in fields=.
+FIELDSETS = {
+    'mood': {'fields': ('mood_id', 'user_id', 'mood', 'energy_level', 'notes', 'log_date', 'created_at'), 'computed': ()},
+    'habits': {'fields': ('habit_id', 'user_id', 'habit_name', 'description', 'completed_today'), 'computed': ('streak',)},
+    'tasks': {'fields': ('task_id', 'user_id', 'task_name', 'priority', 'due_date', 'is_completed'), 'computed': ()},
+    'journal': {'fields': ('journal_id', 'user_id', 'content', 'stickers', 'entry_date', 'created_at'), 'computed': ()},
+}
+
+def sparse_fields(resource):
+    """
+    Parse ?fields= / ?compact=1 into g.fields: None for the full legacy payload
+    (aliases and all), otherwise the tuple of canonical fields to send, each once.
+    Unknown field names are answered with 400.
+    """
+    fieldset = FIELDSETS[resource]
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.fields = None
+            if request.method == 'GET' and request.args.get('fields'):
+                names = tuple(dict.fromkeys(f.strip() for f in request.args['fields'].split(',') if f.strip()))
+                unknown = [f for f in names if f not in fieldset['fields'] + fieldset['computed']]
+                if unknown:
+                    return jsonify({'error': f"Unknown fields for {resource}: {', '.join(unknown)}"}), 400
+                g.fields = names
+            elif request.method == 'GET' and request.args.get('compact') in ('1', 'true'):
+                g.fields = fieldset['fields']
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def project(row, fields, to_dict):
+    """to_dict(row) for the full payload, otherwise just the requested fields."""
+    if fields is None:
+        return to_dict(row)
+    return {f: getattr(row, f) for f in fields}
+
+def lean_select(model, fields=None):
+    """
+    SELECT of the model's columns (only `fields` when given) that returns plain
+    rows instead of ORM instances: no identity map, no change tracking, no
+    per-object state. Rows expose the column names as attributes, so
+    Model.to_dict(row) serializes them like an instance.
+    """
+    table = model.__table__
+    return select(*(table.c if fields is None else [table.c[f] for f in fields]))
+
+# ===== Streamed list responses =====
+def history_days():
+    """?days= clamped to 0..HISTORY_MAX_DAYS (default 30), or None if it is not an integer."""
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        return None
+    return max(0, min(days, app.config['HISTORY_MAX_DAYS']))
+
+def stream_list(key, rows, to_item, limit, **extra):
+    """
+    JSON response {"success": true, **extra, key: [...], "count": n, "truncated": bool}
+    written incrementally: rows are consumed lazily (run the query with yield_per
+    so MySQL uses a server-side cursor) and encoded in batches, so memory stays
+    flat whatever the result size. At most `limit` items are sent; pass a query
+    limited to limit + 1 rows so `truncated` can be reported. If reading fails
+    midway the list is cut short and the trailer carries "truncated": true and
+    an "error" field.
+    """
+    dumps = app.json.dumps
+    batch_size = app.config['STREAM_BATCH_SIZE']
+
+    def generate():
+        yield '{"success":true,' + ''.join(f'{dumps(k)}:{dumps(v)},' for k, v in extra.items()) + f'{dumps(key)}:['
+        count, truncated, batch, error = 0, False, [], None
+        try:
+            for row in rows:
+                if count == limit:
+                    truncated = True
+                    break
+                batch.append(dumps(to_item(row)))
+                count += 1
+                if len(batch) == batch_size:
+                    yield (',' if count > batch_size else '') + ','.join(batch)
+                    batch = []
+        except Exception as e:
+            # the 200 is sent already; end the document saying it is incomplete
+            app.logger.exception('Error while streaming %s', key)
+            truncated, error = True, str(e)
+        finally:
+            close = getattr(rows, 'close', None)
+            if close is not None:
+                close()
+        if batch:
+            yield (',' if count > len(batch) else '') + ','.join(batch)
+        trailer = f'],"count":{count},"truncated":{dumps(truncated)}'
+        yield trailer + (f',"error":{dumps(error)}}}' if error is not None else '}')
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
 from datetime import datetime, date, timedelta
 # ...existing code...
 
 # ===== MOOD model & API (replace existing/misplaced mood sections) =====
 class Mood(db.Model):
     __tablename__ = 'mood'
+    __table_args__ = (
+        db.Index('idx_mood_user_id', 'user_id'),
+        db.Index('idx_mood_log_date', 'log_date'),
+    )
     mood_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, nullable=False, default=1)
     mood = db.Column(db.String(100), nullable=False)
@@ -53,11 +267,13 @@ class Mood(db.Model):
             'mood': self.mood,
             'energy_level': self.energy_level,
             'notes': self.notes,
-            'log_date': self.log_date.isoformat() if self.log_date else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'log_date': self.log_date,
+            'created_at': self.created_at
         }
 
 @app.route('/api/mood', methods=['GET', 'POST'])
+@versioned('mood')
+@sparse_fields('mood')
 def api_mood():
     user_id = session.get('user_id', 1)
     if request.method == 'GET':
@@ -65,10 +281,19 @@ def api_mood():
         try:
             if qdate:
                 d = datetime.strptime(qdate, '%Y-%m-%d').date()
-                entries = Mood.query.filter_by(user_id=user_id, log_date=d).order_by(Mood.created_at.desc()).all()
-                return jsonify({'success': True, 'entries': [e.to_dict() for e in entries]})
-            recent = Mood.query.filter_by(user_id=user_id).order_by(Mood.log_date.desc(), Mood.created_at.desc()).limit(50).all()
-            return jsonify({'success': True, 'entries': [e.to_dict() for e in recent]})
+                entries = db.session.execute(
+                    lean_select(Mood, g.fields)
+                    .where(Mood.user_id == user_id, Mood.log_date == d)
+                    .order_by(Mood.created_at.desc())
+                )
+                return jsonify({'success': True, 'entries': [project(e, g.fields, Mood.to_dict) for e in entries]})
+            recent = db.session.execute(
+                lean_select(Mood, g.fields)
+                .where(Mood.user_id == user_id)
+                .order_by(Mood.log_date.desc(), Mood.created_at.desc())
+                .limit(50)
+            )
+            return jsonify({'success': True, 'entries': [project(e, g.fields, Mood.to_dict) for e in recent]})
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -102,7 +327,7 @@ def api_mood():
                 pass
 
         now = datetime.utcnow()
-        entry = Mood(
+        values = dict(
             user_id=user_id,
             mood=mood_label,
             energy_level=energy_level,
@@ -110,43 +335,82 @@ def api_mood():
             log_date=entry_date,
             created_at=now
         )
+        if write_queue.enabled:
+            return queued_write(
+                'mood', values,
+                respond=lambda entry: jsonify({'success': True, 'entry': entry}),
+                respond_queued=lambda: jsonify({'success': True, 'queued': True, 'entry': Mood(**values).to_dict()}))
+
+        entry = Mood(**values)
         db.session.add(entry)
+        bump_daily_summary(user_id, entry_date, mood_entries=1)
+        bump_data_version(user_id, 'mood')
         db.session.commit()
+        response_cache.invalidate(user_id, 'farm_stats', 'mood_streak')
         return jsonify({'success': True, 'entry': entry.to_dict()})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/mood/recent', methods=['GET'])
+@read_only
+@versioned('mood')
+@sparse_fields('mood')
 def api_mood_recent():
     try:
         user_id = session.get('user_id', 1)
         limit = int(request.args.get('limit', 7))
-        rows = Mood.query.filter_by(user_id=user_id).order_by(Mood.log_date.desc(), Mood.created_at.desc()).limit(limit).all()
-        return jsonify({'success': True, 'recent': [r.to_dict() for r in rows]})
+        rows = db.session.execute(
+            lean_select(Mood, g.fields)
+            .where(Mood.user_id == user_id)
+            .order_by(Mood.log_date.desc(), Mood.created_at.desc())
+            .limit(limit)
+        )
+        return jsonify({'success': True, 'recent': [project(r, g.fields, Mood.to_dict) for r in rows]})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/mood/history', methods=['GET'])
+@read_only
+@versioned('mood')
+@sparse_fields('mood')
 def api_mood_history():
     try:
         user_id = session.get('user_id', 1)
-        days = int(request.args.get('days', 30))
+        days = history_days()
+        if days is None:
+            return jsonify({'error': 'days must be an integer'}), 400
         cutoff = date.today() - timedelta(days=days)
-        entries = Mood.query.filter(Mood.user_id==user_id, Mood.log_date >= cutoff).order_by(Mood.log_date.desc(), Mood.created_at.desc()).all()
-        return jsonify({'success': True, 'entries': [e.to_dict() for e in entries]})
+        limit = app.config['LIST_MAX_ROWS']
+        entries = db.session.execute(
+            lean_select(Mood, g.fields)
+            .where(Mood.user_id == user_id, Mood.log_date >= cutoff)
+            .order_by(Mood.log_date.desc(), Mood.created_at.desc())
+            .limit(limit + 1),
+            execution_options={'yield_per': app.config['STREAM_BATCH_SIZE']}
+        )
+        fields = g.fields
+        return stream_list('entries', entries, lambda e: project(e, fields, Mood.to_dict), limit, days=days)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/mood/streak', methods=['GET'])
+@read_only
+@rate_class('stats')
+@response_cache.cached('mood_streak')
 def api_mood_streak():
     try:
         user_id = session.get('user_id', 1)
-        rows = Mood.query.filter_by(user_id=user_id).all()
-        dates_with = set(r.log_date for r in rows if r.log_date)
-        streak = 0
         cur = date.today()
-        while cur in dates_with:
+        mood_days = db.session.execute(
+            select(DailySummary.day)
+            .where(DailySummary.user_id == user_id, DailySummary.mood_entries > 0, DailySummary.day <= cur)
+            .order_by(DailySummary.day.desc())
+        ).scalars()
+        streak = 0
+        for day in mood_days:
+            if day != cur:
+                break
             streak += 1
             cur = cur - timedelta(days=1)
         return jsonify({'success': True, 'streak': streak})
@@ -156,6 +420,7 @@ def api_mood_streak():
 
 class Habit(db.Model):
     __tablename__ = 'habits'
+    __table_args__ = (db.Index('idx_habits_user_id', 'user_id'),)
     
     # MATCH YOUR ACTUAL DATABASE COLUMNS
     habit_id = db.Column('habit_id', db.Integer, primary_key=True, autoincrement=True)
@@ -173,25 +438,12 @@ class Habit(db.Model):
     def streak(self):
         """Calculate streak from logs"""
         try:
-            logs = HabitLog.query.filter_by(
-                habit_id=self.habit_id,
-                completed=True
-            ).order_by(HabitLog.log_date.desc()).all()
-            
-            if not logs:
-                return 0
-            
-            streak = 0
-            current_date = date.today()
-            
-            for log in logs:
-                if log.log_date == current_date:
-                    streak += 1
-                    current_date -= timedelta(days=1)
-                else:
-                    break
-            
-            return streak
+            days = db.session.execute(
+                select(HabitLog.log_date)
+                .where(HabitLog.habit_id == self.habit_id, HabitLog.completed == True)
+                .order_by(HabitLog.log_date.desc())
+            ).scalars()
+            return streak_of(days, date.today())
         except:
             return 0
     
@@ -221,12 +473,13 @@ class Habit(db.Model):
             'streak': self.streak,  # Virtual property
             'frequency': self.frequency,  # Virtual property
             'is_active': self.is_active,  # Virtual property
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
 
 class HabitLog(db.Model):
     __tablename__ = 'habit_logs'
+    __table_args__ = (db.Index('idx_habit_logs_habit_id', 'habit_id'),)
     
     # MATCH YOUR ACTUAL DATABASE COLUMNS
     habit_log_id = db.Column('habit_log_id', db.Integer, primary_key=True, autoincrement=True)
@@ -252,11 +505,62 @@ class HabitLog(db.Model):
             'log_id': self.log_id,
             'habit_id': self.habit_id,
             'completed': self.completed,
-            'log_date': self.log_date.isoformat() if self.log_date else None
+            'log_date': self.log_date
         }
+
+def habit_days_query(user_id):
+    """Completed log days of all the user's habits, newest first within each habit."""
+    return (
+        select(HabitLog.habit_id, HabitLog.log_date)
+        .join(Habit, Habit.habit_id == HabitLog.habit_id)
+        .where(Habit.user_id == user_id, HabitLog.completed == True)
+        .order_by(HabitLog.habit_id, HabitLog.log_date.desc())
+    )
+
+def group_habit_days(rows):
+    days = {}
+    for row in rows:
+        days.setdefault(row.habit_id, []).append(row.log_date)
+    return days
+
+def streak_of(days, today):
+    """Consecutive days ending today in a newest-first list of completion days."""
+    streak = 0
+    for day in days:
+        if day != today:
+            break
+        streak += 1
+        today -= timedelta(days=1)
+    return streak
+
+def habit_to_dict(habit, days, today, fields=None):
+    """Serialize a habit row given its completion days; legacy shape when fields is None."""
+    if fields is not None:
+        values = {'completed_today': today in days}
+        if 'streak' in fields:
+            values['streak'] = streak_of(days, today)
+        return {f: values[f] if f in values else getattr(habit, f) for f in fields}
+    now = datetime.utcnow()
+    return {
+        'habit_id': habit.habit_id,
+        'user_id': habit.user_id,
+        'name': habit.habit_name,
+        'habit_name': habit.habit_name,
+        'description': habit.description,
+        'streak': streak_of(days, today),
+        'frequency': 'daily',
+        'is_active': True,
+        'created_at': now,
+        'updated_at': now,
+        'completed_today': today in days
+    }
     
 class Task(db.Model):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        db.Index('idx_tasks_user_id', 'user_id'),
+        db.Index('idx_tasks_due_date', 'due_date'),
+    )
     
     # MATCH YOUR ACTUAL DATABASE COLUMNS
     task_id = db.Column('task_id', db.Integer, primary_key=True, autoincrement=True)
@@ -306,34 +610,36 @@ class Task(db.Model):
             'name': self.name,
             'task_name': self.task_name,
             'priority': self.priority,
-            'date': self.date.isoformat() if self.date else None,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'date': self.date,
+            'due_date': self.due_date,
             'completed': self.completed,
             'is_completed': self.is_completed,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
 
 
 @app.route('/api/habits', methods=['GET'])
+@read_only
+@versioned('habits')
+@sparse_fields('habits')
 def get_habits():
     try:
         user_id = session.get('user_id', 1)
-        habits = Habit.query.filter_by(user_id=user_id).all()
-        
-        habits_data = []
-        for habit in habits:
-            habit_dict = habit.to_dict()
-            
-            # Check if completed today
-            today = date.today()
-            today_log = HabitLog.query.filter_by(
-                habit_id=habit.habit_id,
-                log_date=today,
-                completed=True
-            ).first()
-            
-            habit_dict['completed_today'] = bool(today_log)
-            habits_data.append(habit_dict)
+        today = date.today()
+        fields = g.fields
+        habits = db.session.execute(
+            select(Habit.habit_id, Habit.user_id, Habit.habit_name, Habit.description)
+            .where(Habit.user_id == user_id)
+        ).all()
+
+        # completion days for all habits in one query (not one or two per habit);
+        # the full history is only read when streaks are wanted
+        days_query = habit_days_query(user_id)
+        if fields is not None and 'streak' not in fields:
+            days_query = days_query.where(HabitLog.log_date == today)
+        days = group_habit_days(db.session.execute(days_query)) if habits else {}
+
+        habits_data = [habit_to_dict(h, days.get(h.habit_id, []), today, fields) for h in habits]
         
         return jsonify({
             'success': True,
@@ -361,7 +667,9 @@ def create_habit():
         )
         
         db.session.add(new_habit)
+        bump_data_version(user_id, 'habits')
         db.session.commit()
+        response_cache.invalidate(user_id, 'farm_stats', 'habits_stats')
         
         return jsonify({
             'success': True,
@@ -383,6 +691,33 @@ def log_habit(habit_id):
         habit = Habit.query.get(habit_id)
         if not habit:
             return jsonify({'error': 'Habit not found'}), 404
+
+        if write_queue.enabled:
+            def respond(completed):
+                habit_dict = habit.to_dict()
+                habit_dict['completed_today'] = completed
+                return jsonify({'success': True, 'message': 'Habit logged successfully', 'habit': habit_dict})
+
+            payload = {'habit_id': habit_id, 'user_id': habit.user_id, 'log_date': today}
+            expected = {}
+
+            def submit():
+                # not applied yet: predict the state the toggle produces, counting
+                # toggles of this habit still in the queue
+                future, expected['completed'] = habit_toggles.toggle(
+                    (habit_id, today),
+                    lambda: HabitLog.query.filter_by(
+                        habit_id=habit_id, log_date=today, completed=True).first() is not None,
+                    lambda: write_queue.submit('habit_log', payload))
+                return future
+
+            def respond_queued():
+                habit_dict = habit.to_dict()
+                habit_dict['completed_today'] = expected['completed']
+                return jsonify({'success': True, 'queued': True, 'message': 'Habit log queued', 'habit': habit_dict})
+
+            return queued_write('habit_log', payload, respond, respond_queued,
+                                submit=submit if write_queue.ack == 'queued' else None)
         
         # Check if already logged today
         existing_log = HabitLog.query.filter_by(
@@ -393,6 +728,7 @@ def log_habit(habit_id):
         if existing_log:
             # Toggle completion
             existing_log.completed = not existing_log.completed
+            completed_delta = 1 if existing_log.completed else -1
         else:
             # Create new log
             new_log = HabitLog(
@@ -401,8 +737,13 @@ def log_habit(habit_id):
                 completed=True
             )
             db.session.add(new_log)
+            completed_delta = 1
         
+        bump_daily_summary(habit.user_id, today, habits_completed=completed_delta)
+        refresh_habit_streak(habit_id, habit.user_id)
+        bump_data_version(habit.user_id, 'habits')
         db.session.commit()
+        response_cache.invalidate(habit.user_id, 'farm_stats', 'habits_stats')
         
         # Return updated habit
         habit_dict = habit.to_dict()
@@ -424,26 +765,23 @@ def log_habit(habit_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/habits/stats', methods=['GET'])
+@read_only
+@rate_class('stats')
+@response_cache.cached('habits_stats')
 def get_habits_stats():
     try:
         user_id = session.get('user_id', 1)
-        habits = Habit.query.filter_by(user_id=user_id).all()
-
         today = date.today()
-        habit_ids = [h.habit_id for h in habits]
-        if habit_ids:
-            today_logs = HabitLog.query.filter(HabitLog.habit_id.in_(habit_ids), HabitLog.log_date==today, HabitLog.completed==True).all()
-        else:
-            today_logs = []
+        total_habits = db.session.scalar(select(func.count()).select_from(Habit).where(Habit.user_id == user_id))
+        today_summary = db.session.get(DailySummary, (user_id, today))
         
-        total_habits = len(habits)
-        completed_today = len(today_logs)
+        completed_today = today_summary.habits_completed if today_summary else 0
         completion_rate = round((completed_today / total_habits * 100) if total_habits > 0 else 0, 1)
         
-        best_streak = 0
-        for habit in habits:
-            if habit.streak > best_streak:
-                best_streak = habit.streak
+        # materialized per habit by the habit-log writes; only runs ending today count
+        best_streak = db.session.scalar(
+            select(func.coalesce(func.max(HabitStreak.length), 0))
+            .where(HabitStreak.user_id == user_id, HabitStreak.last_day == today))
         
         return jsonify({
             'success': True,
@@ -468,10 +806,22 @@ def delete_habit(habit_id):
         if not habit:
             return jsonify({'error': 'Habit not found'}), 404
 
+        # take the habit's completions out of the daily summary
+        completed_days = db.session.execute(
+            select(HabitLog.log_date, func.count())
+            .where(HabitLog.habit_id == habit_id, HabitLog.completed == True)
+            .group_by(HabitLog.log_date)
+        ).all()
+        for log_day, n in completed_days:
+            bump_daily_summary(habit.user_id, log_day, habits_completed=-n)
+
         # delete related logs first
         HabitLog.query.filter_by(habit_id=habit_id).delete()
+        db.session.execute(delete(HabitStreak).where(HabitStreak.habit_id == habit_id))
         db.session.delete(habit)
+        bump_data_version(habit.user_id, 'habits')
         db.session.commit()
+        response_cache.invalidate(habit.user_id, 'farm_stats', 'habits_stats')
         return jsonify({'success': True, 'message': 'Habit deleted'})
     except Exception as e:
         db.session.rollback()
@@ -479,47 +829,48 @@ def delete_habit(habit_id):
         return jsonify({'error': str(e)}), 500
     
 
+TASK_COLUMNS = (Task.task_id, Task.task_name, Task.due_date, Task.is_completed, Task.priority, Task.user_id)
+
+def task_lookup(user_id, task_id, *columns):
+    # Core statements (not raw SQL) so the shard router can see the tasks table
+    return select(*(columns or TASK_COLUMNS)).where(Task.task_id == task_id, Task.user_id == user_id)
+
+def tasks_query(user_id, limit=None):
+    sql = (
+        select(*TASK_COLUMNS)
+        .where(Task.user_id == user_id)
+        .order_by(Task.is_completed.asc(), Task.due_date.asc(), Task.task_id.desc())
+    )
+    return sql.limit(limit) if limit is not None else sql
+
+def task_row_to_dict(row):
+    return {
+        'task_id': row.task_id,
+        'name': row.task_name,  # Map task_name to name for JavaScript
+        'date': row.due_date,  # Map due_date to date
+        'completed': bool(row.is_completed),  # Map is_completed to completed
+        'priority': row.priority,
+        'user_id': row.user_id,
+        'task_name': row.task_name,  # Keep original
+        'due_date': row.due_date,  # Keep original
+        'is_completed': bool(row.is_completed)  # Keep original
+    }
+
 @app.route('/api/tasks', methods=['GET'])
+@read_only
+@versioned('tasks')
+@sparse_fields('tasks')
 def get_tasks():
     """Get all tasks for current user"""
     try:
         user_id = session.get('user_id', 1)
-        
-        # Use raw SQL that matches your actual database columns
-        sql = text("""
-            SELECT 
-                task_id,
-                task_name,
-                due_date,
-                is_completed,
-                priority,
-                user_id
-            FROM tasks 
-            WHERE user_id = :user_id
-            ORDER BY is_completed ASC, due_date ASC, task_id DESC
-        """)
-        
-        result = db.session.execute(sql, {'user_id': user_id})
-        tasks = []
-        
-        for row in result:
-            tasks.append({
-                'task_id': row.task_id,
-                'name': row.task_name,  # Map task_name to name for JavaScript
-                'date': row.due_date.isoformat() if row.due_date else None,  # Map due_date to date
-                'completed': bool(row.is_completed),  # Map is_completed to completed
-                'priority': row.priority,
-                'user_id': row.user_id,
-                'task_name': row.task_name,  # Keep original
-                'due_date': row.due_date.isoformat() if row.due_date else None,  # Keep original
-                'is_completed': bool(row.is_completed)  # Keep original
-            })
-        
-        return jsonify({
-            'success': True,
-            'tasks': tasks,
-            'count': len(tasks)
-        })
+        limit = app.config['LIST_MAX_ROWS']
+        result = db.session.execute(
+            tasks_query(user_id, limit + 1),
+            execution_options={'yield_per': app.config['STREAM_BATCH_SIZE']}
+        )
+        fields = g.fields
+        return stream_list('tasks', result, lambda row: project(row, fields, task_row_to_dict), limit)
         
     except Exception as e:
         print(f"Error in get_tasks: {e}")
@@ -554,7 +905,10 @@ def create_task():
         )
         
         db.session.add(new_task)
+        bump_daily_summary(user_id, task_date, tasks_total=1)
+        bump_data_version(user_id, 'tasks')
         db.session.commit()
+        response_cache.invalidate(user_id, 'farm_stats', 'tasks_stats')
         
         return jsonify({
             'success': True,
@@ -576,47 +930,49 @@ def update_task(task_id):
         
         # Check if task exists
         user_id = session.get('user_id', 1)
-        check_sql = text("SELECT COUNT(*) as count FROM tasks WHERE task_id = :task_id AND user_id = :user_id")
-        count = db.session.execute(check_sql, {'task_id': task_id, 'user_id': user_id}).scalar()
+        existing = db.session.execute(task_lookup(user_id, task_id, Task.due_date, Task.is_completed)).fetchone()
         
-        if count == 0:
+        if existing is None:
             return jsonify({'error': 'Task not found'}), 404
         
         # Build update query dynamically
-        updates = []
-        params = {'task_id': task_id}
+        params = {}
         
         if 'name' in data:
-            updates.append("task_name = :task_name")
             params['task_name'] = data['name']
         
         if 'date' in data:
             try:
-                due_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-                updates.append("due_date = :due_date")
-                params['due_date'] = due_date
+                params['due_date'] = datetime.strptime(data['date'], '%Y-%m-%d').date()
             except:
                 pass
         
         if 'completed' in data:
-            updates.append("is_completed = :is_completed")
             params['is_completed'] = data['completed']
         
-        if updates:
-            update_sql = text(f"UPDATE tasks SET {', '.join(updates)} WHERE task_id = :task_id AND user_id = :user_id")
-            params['user_id'] = user_id
-            db.session.execute(update_sql, params)
+        if params:
+            db.session.execute(
+                update(Task).where(Task.task_id == task_id, Task.user_id == user_id).values(**params)
+            )
+
+            # move the task between summary buckets if its day or status changed
+            old_completed = bool(existing.is_completed)
+            new_date = params.get('due_date', existing.due_date)
+            new_completed = bool(params['is_completed']) if 'is_completed' in params else old_completed
+            if (new_date, new_completed) != (existing.due_date, old_completed):
+                bump_daily_summary(user_id, existing.due_date, tasks_total=-1, tasks_completed=-int(old_completed))
+                bump_daily_summary(user_id, new_date, tasks_total=1, tasks_completed=int(new_completed))
+            bump_data_version(user_id, 'tasks')
             db.session.commit()
+            response_cache.invalidate(user_id, 'farm_stats', 'tasks_stats')
         
         # Get updated task
-        get_sql = text("SELECT * FROM tasks WHERE task_id = :task_id AND user_id = :user_id")
-        result = db.session.execute(get_sql, {'task_id': task_id, 'user_id': user_id})
-        row = result.fetchone()
+        row = db.session.execute(task_lookup(user_id, task_id)).fetchone()
         
         task_data = {
             'task_id': row.task_id,
             'name': row.task_name,
-            'date': row.due_date.isoformat() if row.due_date else None,
+            'date': row.due_date,
             'completed': bool(row.is_completed),
             'priority': row.priority,
             'user_id': row.user_id
@@ -639,16 +995,17 @@ def delete_task(task_id):
     try:
         # Check if task exists
         user_id = session.get('user_id', 1)
-        check_sql = text("SELECT COUNT(*) as count FROM tasks WHERE task_id = :task_id AND user_id = :user_id")
-        count = db.session.execute(check_sql, {'task_id': task_id, 'user_id': user_id}).scalar()
+        existing = db.session.execute(task_lookup(user_id, task_id, Task.due_date, Task.is_completed)).fetchone()
         
-        if count == 0:
+        if existing is None:
             return jsonify({'error': 'Task not found'}), 404
         
         # Delete task
-        delete_sql = text("DELETE FROM tasks WHERE task_id = :task_id AND user_id = :user_id")
-        db.session.execute(delete_sql, {'task_id': task_id, 'user_id': user_id})
+        db.session.execute(delete(Task).where(Task.task_id == task_id, Task.user_id == user_id))
+        bump_daily_summary(user_id, existing.due_date, tasks_total=-1, tasks_completed=-int(bool(existing.is_completed)))
+        bump_data_version(user_id, 'tasks')
         db.session.commit()
+        response_cache.invalidate(user_id, 'farm_stats', 'tasks_stats')
         
         return jsonify({
             'success': True,
@@ -666,9 +1023,8 @@ def toggle_task(task_id):
     try:
         # Check if task exists
         user_id = session.get('user_id', 1)
-        check_sql = text("SELECT * FROM tasks WHERE task_id = :task_id AND user_id = :user_id")
-        result = db.session.execute(check_sql, {'task_id': task_id, 'user_id': user_id})
-        row = result.fetchone()
+        check_sql = task_lookup(user_id, task_id)
+        row = db.session.execute(check_sql).fetchone()
         
         if not row:
             return jsonify({'error': 'Task not found'}), 404
@@ -676,22 +1032,21 @@ def toggle_task(task_id):
         # Toggle completion
         new_status = not bool(row.is_completed)
         
-        toggle_sql = text("UPDATE tasks SET is_completed = :is_completed WHERE task_id = :task_id AND user_id = :user_id")
-        db.session.execute(toggle_sql, {
-            'task_id': task_id,
-            'is_completed': new_status,
-            'user_id': user_id
-        })
+        db.session.execute(
+            update(Task).where(Task.task_id == task_id, Task.user_id == user_id).values(is_completed=new_status)
+        )
+        bump_daily_summary(user_id, row.due_date, tasks_completed=1 if new_status else -1)
+        bump_data_version(user_id, 'tasks')
         db.session.commit()
+        response_cache.invalidate(user_id, 'farm_stats', 'tasks_stats')
         
         # Get updated task
-        result = db.session.execute(check_sql, {'task_id': task_id, 'user_id': user_id})
-        row = result.fetchone()
+        row = db.session.execute(check_sql).fetchone()
         
         task_data = {
             'task_id': row.task_id,
             'name': row.task_name,
-            'date': row.due_date.isoformat() if row.due_date else None,
+            'date': row.due_date,
             'completed': bool(row.is_completed),
             'priority': row.priority,
             'user_id': row.user_id
@@ -709,24 +1064,29 @@ def toggle_task(task_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/tasks/stats', methods=['GET'])
+@read_only
+@rate_class('stats')
+@response_cache.cached('tasks_stats')
 def get_tasks_stats():
     """Get task statistics"""
     try:
-        # Get all tasks for current user
+        # Read the per-day task counters for current user
         user_id = session.get('user_id', 1)
-        tasks = Task.query.filter_by(user_id=user_id).all()
+        today = date.today()
+        overdue = and_(DailySummary.day < today, DailySummary.day != UNDATED_DAY)
+        totals = db.session.execute(select(
+            summary_sum(DailySummary.tasks_total).label('total_tasks'),
+            summary_sum(DailySummary.tasks_completed).label('completed_tasks'),
+            summary_sum(case((DailySummary.day == today, DailySummary.tasks_total), else_=0)).label('today_tasks'),
+            summary_sum(case((overdue, DailySummary.tasks_total - DailySummary.tasks_completed), else_=0)).label('overdue_tasks'),
+        ).where(DailySummary.user_id == user_id)).one()
         
         # Calculate statistics
-        total_tasks = len(tasks)
-        completed_tasks = len([t for t in tasks if t.completed])
+        total_tasks = totals.total_tasks
+        completed_tasks = totals.completed_tasks
         pending_tasks = total_tasks - completed_tasks
         completion_rate = round((completed_tasks / total_tasks * 100) if total_tasks > 0 else 0, 1)
         
-        # Tasks by date
-        today = date.today()
-        today_tasks = [t for t in tasks if t.date == today]
-        overdue_tasks = [t for t in tasks if t.date and t.date < today and not t.completed]
-        
         return jsonify({
             'success': True,
             'stats': {
@@ -734,8 +1094,8 @@ def get_tasks_stats():
                 'completed_tasks': completed_tasks,
                 'pending_tasks': pending_tasks,
                 'completion_rate': completion_rate,
-                'today_tasks': len(today_tasks),
-                'overdue_tasks': len(overdue_tasks)
+                'today_tasks': totals.today_tasks,
+                'overdue_tasks': totals.overdue_tasks
             }
         })
         
@@ -745,6 +1105,7 @@ def get_tasks_stats():
     
 class Journal(db.Model):
     __tablename__ = 'journal'
+    __table_args__ = (db.Index('idx_journal_user_id', 'user_id'),)
     journal_id = db.Column('journal_id', db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column('user_id', db.Integer, nullable=False, default=1)
     content = db.Column('content', db.Text, nullable=False)
@@ -757,14 +1118,217 @@ class Journal(db.Model):
             'journal_id': self.journal_id,
             'user_id': self.user_id,
             'content': self.content,
-            'stickers': json.loads(self.stickers) if self.stickers else [],
-            'entry_date': self.entry_date.isoformat() if self.entry_date else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'stickers': json_loads(self.stickers) if self.stickers else [],
+            'entry_date': self.entry_date,
+            'created_at': self.created_at
         }
 
-# Ensure uploads folder exists for images/stickers
+# ===== Per-user daily summary (materialized counters) =====
+# Undated tasks have no natural day; they are counted in this bucket
+UNDATED_DAY = date(1970, 1, 1)
+
+class DailySummary(db.Model):
+    __tablename__ = 'daily_summary'
+    user_id = db.Column('user_id', db.Integer, primary_key=True, autoincrement=False)
+    day = db.Column('day', db.Date, primary_key=True)
+    mood_entries = db.Column('mood_entries', db.Integer, nullable=False, default=0, server_default='0')
+    habits_completed = db.Column('habits_completed', db.Integer, nullable=False, default=0, server_default='0')
+    tasks_total = db.Column('tasks_total', db.Integer, nullable=False, default=0, server_default='0')
+    tasks_completed = db.Column('tasks_completed', db.Integer, nullable=False, default=0, server_default='0')
+    journal_entries = db.Column('journal_entries', db.Integer, nullable=False, default=0, server_default='0')
+
+SUMMARY_COUNTERS = ('mood_entries', 'habits_completed', 'tasks_total', 'tasks_completed', 'journal_entries')
+
+class HabitStreak(db.Model):
+    """
+    Latest run of consecutive completed days per habit: `length` days ending on
+    last_day. The habit's current streak is `length` while last_day is today
+    and 0 otherwise (as streak_of computes it from the logs).
+    """
+    __tablename__ = 'habit_streaks'
+    __table_args__ = (db.Index('idx_habit_streaks_user_id', 'user_id'),)
+    habit_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    last_day = db.Column(db.Date, nullable=False)
+    length = db.Column(db.Integer, nullable=False)
+
+def latest_run(days):
+    """(last day, length) of the consecutive days heading a newest-first iterable; (None, 0) if empty."""
+    last_day, length = None, 0
+    for day in days:
+        if last_day is not None and day != last_day - timedelta(days=length):
+            break
+        last_day = last_day or day
+        length += 1
+    return last_day, length
+
+def set_habit_streak(habit_id, user_id, last_day, length):
+    db.session.execute(delete(HabitStreak).where(HabitStreak.habit_id == habit_id))
+    if length:
+        db.session.execute(insert(HabitStreak).values(
+            habit_id=habit_id, user_id=user_id, last_day=last_day, length=length))
+
+def refresh_habit_streak(habit_id, user_id):
+    """
+    Recompute one habit's latest run after its logs changed. Its completed days
+    are read newest first until the first gap, so the cost follows the streak,
+    not the history. Runs in the caller's session.
+    """
+    result = db.session.execute(
+        select(HabitLog.log_date)
+        .where(HabitLog.habit_id == habit_id, HabitLog.completed == True)
+        .order_by(HabitLog.log_date.desc()),
+        execution_options={'yield_per': 100})
+    try:
+        last_day, length = latest_run(result.scalars())
+    finally:
+        result.close()
+    set_habit_streak(habit_id, user_id, last_day, length)
+
+def summary_sum(expr):
+    """SUM over summary rows as a plain integer (0 when the user has no rows)."""
+    return db.cast(func.coalesce(func.sum(expr), 0), db.Integer)
+
+def bump_daily_summary(user_id, day, **deltas):
+    """
+    Add counter deltas to a user's summary row for `day`, creating it if needed.
+    Runs in the caller's session so it commits (or rolls back) with the write.
+    """
+    deltas = {k: v for k, v in deltas.items() if v}
+    if deltas:
+        upsert_increment(DailySummary.__table__, {'user_id': user_id, 'day': day or UNDATED_DAY}, deltas)
+
+def rebuild_daily_summary(user_id=None):
+    """Recompute summary rows and habit streaks from the raw tables. Returns the number of users rebuilt."""
+    if user_id is None:
+        user_ids = db.session.execute(union(
+            select(Mood.user_id), select(Habit.user_id), select(Task.user_id),
+            select(Journal.user_id), select(DailySummary.user_id), select(HabitStreak.user_id)
+        )).scalars().all()
+    else:
+        user_ids = [user_id]
+
+    for uid in user_ids:
+        rows = {}
+
+        def add(day, **counts):
+            row = rows.setdefault(day or UNDATED_DAY, dict.fromkeys(SUMMARY_COUNTERS, 0))
+            for k, v in counts.items():
+                row[k] += int(v or 0)
+
+        for day, n in db.session.execute(
+                select(Mood.log_date, func.count()).where(Mood.user_id == uid).group_by(Mood.log_date)):
+            add(day, mood_entries=n)
+        for day, n in db.session.execute(
+                select(HabitLog.log_date, func.count())
+                .join(Habit, Habit.habit_id == HabitLog.habit_id)
+                .where(Habit.user_id == uid, HabitLog.completed == True)
+                .group_by(HabitLog.log_date)):
+            add(day, habits_completed=n)
+        for day, n, done in db.session.execute(
+                select(Task.due_date, func.count(), func.sum(case((Task.is_completed == True, 1), else_=0)))
+                .where(Task.user_id == uid).group_by(Task.due_date)):
+            add(day, tasks_total=n, tasks_completed=done)
+        for day, n in db.session.execute(
+                select(Journal.entry_date, func.count()).where(Journal.user_id == uid).group_by(Journal.entry_date)):
+            add(day, journal_entries=n)
+
+        db.session.execute(delete(DailySummary).where(DailySummary.user_id == uid))
+        if rows:
+            db.session.execute(insert(DailySummary), [
+                dict(user_id=uid, day=day, **counts) for day, counts in rows.items()
+            ])
+
+        streaks = [(habit_id, *latest_run(days))
+                   for habit_id, days in group_habit_days(db.session.execute(habit_days_query(uid))).items()]
+        db.session.execute(delete(HabitStreak).where(HabitStreak.user_id == uid))
+        if streaks:
+            db.session.execute(insert(HabitStreak), [
+                dict(habit_id=habit_id, user_id=uid, last_day=last_day, length=length)
+                for habit_id, last_day, length in streaks
+            ])
+        db.session.commit()
+        response_cache.invalidate(uid, 'farm_stats', 'habits_stats', 'tasks_stats', 'mood_streak')
+
+    return len(user_ids)
+
+# ===== Write-behind queue (WRITE_BEHIND_ENABLED) =====
+def apply_mood_batch(payloads):
+    """New mood rows for a write-behind batch; one flush, summary and version bumps grouped."""
+    entries = [Mood(**p) for p in payloads]
+    db.session.add_all(entries)
+    for (user_id, day), n in Counter((p['user_id'], p['log_date']) for p in payloads).items():
+        bump_daily_summary(user_id, day, mood_entries=n)
+    for user_id in {p['user_id'] for p in payloads}:
+        bump_data_version(user_id, 'mood')
+    db.session.flush()
+    return [e.to_dict() for e in entries]
+
+def apply_habit_log_batch(payloads):
+    """
+    Habit completion toggles for a write-behind batch, applied in arrival order
+    (two toggles of one habit in a batch cancel out). Returns the completed
+    state after each toggle.
+    """
+    logs = {
+        (log.habit_id, log.log_date): log
+        for log in HabitLog.query.filter(
+            HabitLog.habit_id.in_({p['habit_id'] for p in payloads}),
+            HabitLog.log_date.in_({p['log_date'] for p in payloads}))
+    }
+    results, deltas = [], Counter()
+    for p in payloads:
+        log = logs.get((p['habit_id'], p['log_date']))
+        if log is None:
+            log = logs[(p['habit_id'], p['log_date'])] = HabitLog(
+                habit_id=p['habit_id'], log_date=p['log_date'], completed=True)
+            db.session.add(log)
+        else:
+            log.completed = not log.completed
+        deltas[(p['user_id'], p['log_date'])] += 1 if log.completed else -1
+        results.append(bool(log.completed))
+    for (user_id, day), delta in deltas.items():
+        bump_daily_summary(user_id, day, habits_completed=delta)
+    for habit_id, user_id in {(p['habit_id'], p['user_id']) for p in payloads}:
+        refresh_habit_streak(habit_id, user_id)
+    for user_id in {p['user_id'] for p in payloads}:
+        bump_data_version(user_id, 'habits')
+    return results
+
+write_queue.register('mood', apply_mood_batch, on_commit=lambda payloads, _: [
+    response_cache.invalidate(user_id, 'farm_stats', 'mood_streak') for user_id in {p['user_id'] for p in payloads}])
+write_queue.register('habit_log', apply_habit_log_batch, on_commit=lambda payloads, _: [
+    response_cache.invalidate(user_id, 'farm_stats', 'habits_stats') for user_id in {p['user_id'] for p in payloads}])
+
+def queued_write(kind, payload, respond, respond_queued, submit=None):
+    """
+    Hand a write to the write-behind queue (through submit() when given, which
+    returns the future). With WRITE_BEHIND_ACK=commit the response is
+    respond(result) once the batch has committed; with queued it is
+    respond_queued() (202) right away. A full queue answers 503. If the commit
+    takes longer than WRITE_BEHIND_TIMEOUT the write is still queued and will
+    most likely land, so the answer is 202 "pending" rather than an error the
+    client would retry (and, for a toggle, apply twice).
+    """
+    try:
+        future = submit() if submit is not None else write_queue.submit(kind, payload)
+    except QueueFull as e:
+        response = jsonify({'error': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    if write_queue.ack == 'queued':
+        return respond_queued(), 202
+    try:
+        result = write_queue.wait(future)
+    except TimeoutError:
+        app.logger.warning("Write-behind %s not committed within %ss; answered 202 pending", kind, write_queue.timeout)
+        return jsonify({'success': True, 'pending': True, 'message': 'Saved, still being applied'}), 202
+    db.session.commit()  # end this request's read transaction so respond() sees the batch
+    return respond(result)
+
+# Uploaded images/stickers (created by create_app)
 UPLOAD_FOLDER = os.path.join(app.static_folder, 'uploads')
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 ALLOWED_EXT = {'png', 'jpg', 'jpeg', 'gif'}
 
 def allowed_file(filename):
@@ -773,11 +1337,30 @@ def allowed_file(filename):
 # ===== Journal APIs =====
 
 @app.route('/api/journal', methods=['GET'])
+@read_only
+@versioned('journal')
+@sparse_fields('journal')
 def get_journal_entries():
     try:
         user_id = session.get('user_id', 1)
-        entries = Journal.query.filter_by(user_id=user_id).order_by(Journal.entry_date.desc(), Journal.created_at.desc()).all()
-        return jsonify({'success': True, 'entries': [e.to_dict() for e in entries]})
+        limit = app.config['LIST_MAX_ROWS']
+        rows = db.session.execute(
+            lean_select(Journal, g.fields)
+            .where(Journal.user_id == user_id)
+            .order_by(Journal.entry_date.desc(), Journal.created_at.desc())
+            .limit(limit + 1),
+            execution_options={'yield_per': app.config['STREAM_BATCH_SIZE']}
+        )
+        fields = g.fields
+
+        def to_item(row):
+            entry = project(row, fields, Journal.to_dict)
+            if fields is not None and 'stickers' in fields:
+                # stickers are stored as JSON text
+                entry['stickers'] = json_loads(entry['stickers']) if entry['stickers'] else []
+            return entry
+
+        return stream_list('entries', rows, to_item, limit)
     except Exception as e:
         print("get_journal_entries error:", e)
         return jsonify({'error': str(e)}), 500
@@ -801,7 +1384,10 @@ def create_journal_entry():
         user_id = session.get('user_id', 1)
         j = Journal(user_id=user_id, content=content, stickers=json.dumps(stickers), entry_date=entry_date)
         db.session.add(j)
+        bump_daily_summary(user_id, entry_date, journal_entries=1)
+        bump_data_version(user_id, 'journal')
         db.session.commit()
+        response_cache.invalidate(user_id, 'farm_stats')
         return jsonify({'success': True, 'entry': j.to_dict()})
     except Exception as e:
         db.session.rollback()
@@ -820,6 +1406,7 @@ def update_journal_entry(journal_id):
         if entry.user_id != user_id:
             return jsonify({'error': 'Entry not found'}), 404
 
+        old_date = entry.entry_date
         if 'content' in data:
             entry.content = data.get('content', entry.content)
         if 'entry_date' in data:
@@ -830,7 +1417,12 @@ def update_journal_entry(journal_id):
         if 'stickers' in data:
             entry.stickers = json.dumps(data.get('stickers', []))
 
+        if entry.entry_date != old_date:
+            bump_daily_summary(user_id, old_date, journal_entries=-1)
+            bump_daily_summary(user_id, entry.entry_date, journal_entries=1)
+        bump_data_version(user_id, 'journal')
         db.session.commit()
+        response_cache.invalidate(user_id, 'farm_stats')
         return jsonify({'success': True, 'entry': entry.to_dict()})
     except Exception as e:
         db.session.rollback()
@@ -845,7 +1437,10 @@ def delete_journal_entry(journal_id):
         if not entry or entry.user_id != user_id:
             return jsonify({'error': 'Entry not found'}), 404
         db.session.delete(entry)
+        bump_daily_summary(user_id, entry.entry_date, journal_entries=-1)
+        bump_data_version(user_id, 'journal')
         db.session.commit()
+        response_cache.invalidate(user_id, 'farm_stats')
         return jsonify({'success': True})
     except Exception as e:
         db.session.rollback()
@@ -871,54 +1466,523 @@ def upload_journal_image():
         print("upload_journal_image error:", e)
         return jsonify({'error': str(e)}), 500
 
+# ===== Data export =====
+EXPORT_VERSION = 1
+
+def export_tables(user_id):
+    """(table, statement) for every table holding the user's rows, parents before children."""
+    return [
+        ('users', select(User.user_id, User.name, User.email, User.created_at).where(User.user_id == user_id)),
+        ('mood', lean_select(Mood).where(Mood.user_id == user_id).order_by(Mood.mood_id)),
+        ('habits', lean_select(Habit).where(Habit.user_id == user_id).order_by(Habit.habit_id)),
+        ('habit_logs', lean_select(HabitLog).join(Habit, Habit.habit_id == HabitLog.habit_id)
+            .where(Habit.user_id == user_id).order_by(HabitLog.habit_log_id)),
+        ('tasks', lean_select(Task).where(Task.user_id == user_id).order_by(Task.task_id)),
+        ('journal', lean_select(Journal).where(Journal.user_id == user_id).order_by(Journal.journal_id)),
+    ]
+
+def export_rows(statement):
+    """Rows fetched STREAM_BATCH_SIZE at a time (a server-side cursor on MySQL); closed when exhausted."""
+    result = db.session.execute(statement, execution_options={'yield_per': app.config['STREAM_BATCH_SIZE']})
+    try:
+        yield from result
+    finally:
+        result.close()
+
+def export_record(table, row):
+    record = row._asdict()
+    if table == 'journal':
+        record['stickers'] = json_loads(record['stickers']) if record['stickers'] else []
+    return record
+
+def uploaded_image_path(url):
+    """Path of an uploaded image from its sticker URL (/static/uploads/<name>?v=...), or None."""
+    prefix = f'{app.static_url_path}/uploads/'
+    path = urlsplit(url).path if isinstance(url, str) else ''
+    name = path[len(prefix):] if path.startswith(prefix) else ''
+    if not name or name != secure_filename(name):
+        return None
+    full = os.path.join(UPLOAD_FOLDER, name)
+    return full if os.path.isfile(full) else None
+
+def export_ndjson(user_id, tables):
+    dumps = app.json.dumps
+    yield dumps({'table': 'export', 'row': {
+        'version': EXPORT_VERSION, 'user_id': user_id, 'exported_at': datetime.utcnow()}}) + '\n'
+    counts = {}
+    try:
+        for table, statement in tables:
+            counts[table] = 0
+            for line in ndjson_lines(table, export_rows(statement), lambda row: export_record(table, row), dumps):
+                counts[table] += 1
+                yield line
+    except Exception as e:
+        # no trailer: an importer can tell the file is incomplete
+        app.logger.error('Error while exporting user %s: %s', user_id, e)
+        return
+    yield dumps({'table': 'end', 'row': {'counts': counts}}) + '\n'
+
+def export_csv(statement):
+    batch_size = app.config['STREAM_BATCH_SIZE']
+    return csv_chunks([c.name for c in statement.selected_columns], export_rows(statement), batch_size)
+
+def export_zip(user_id, tables, images):
+    archive = ZipStream()
+    try:
+        for table, statement in tables:
+            yield from archive.add_chunks(f'{table}.csv', export_csv(statement))
+        if images:
+            seen = set()
+            for (stickers,) in export_rows(select(Journal.stickers).where(
+                    Journal.user_id == user_id, Journal.stickers.is_not(None))):
+                for url in json_loads(stickers) if stickers else []:
+                    path = uploaded_image_path(url)
+                    if path is not None and path not in seen:
+                        seen.add(path)
+                        yield from archive.add_file(f'images/{os.path.basename(path)}', path)
+    except Exception as e:
+        # the archive still gets its central directory, so what was written can be opened
+        app.logger.error('Error while exporting user %s: %s', user_id, e)
+    yield archive.close()
+
+@app.route('/api/export', methods=['GET'])
+@read_only
+@rate_class('export')
+def export_data():
+    """
+    Download everything the current user has stored, streamed as it is read:
+      ?format=ndjson              one {"table", "row"} document per line (default)
+      ?format=csv&table=<name>    one table as CSV
+      ?format=zip[&images=1]      one CSV per table, plus the uploaded images the journal uses
+    """
+    user_id = session.get('user_id', 1)
+    fmt = request.args.get('format', 'ndjson')
+    tables = export_tables(user_id)
+    if fmt == 'ndjson':
+        body, mimetype = export_ndjson(user_id, tables), 'application/x-ndjson'
+    elif fmt == 'csv':
+        statements = dict(tables)
+        table = request.args.get('table')
+        if table not in statements:
+            return jsonify({'error': f"table must be one of: {', '.join(statements)}"}), 400
+        body, mimetype = export_csv(statements[table]), 'text/csv'
+        fmt = f'{table}.csv'
+    elif fmt == 'zip':
+        images = request.args.get('images', '').lower() in ('1', 'true', 'yes')
+        body, mimetype = export_zip(user_id, tables, images), 'application/zip'
+    else:
+        return jsonify({'error': 'format must be ndjson, csv or zip'}), 400
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="farm-export-{user_id}-{date.today().isoformat()}.{fmt}"')
+    return response
+
+# ===== Data import =====
+class ImportJob(db.Model):
+    """Progress of one import: lines committed so far, so a failed upload can resume."""
+    __tablename__ = 'import_jobs'
+    job_id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    lines_done = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running | partial | done
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ImportIdMap(db.Model):
+    """Exported id -> id assigned on import, for rows that other rows point to."""
+    __tablename__ = 'import_id_map'
+    job_id = db.Column(db.String(64), primary_key=True)
+    table_name = db.Column(db.String(20), primary_key=True)
+    old_id = db.Column(db.Integer, primary_key=True)
+    new_id = db.Column(db.Integer, nullable=False)
+
+# exported table -> (model, data version resource); 'users' is the importing account itself
+IMPORT_TABLES = {
+    'mood': (Mood, 'mood'),
+    'habits': (Habit, 'habits'),
+    'habit_logs': (HabitLog, 'habits'),
+    'tasks': (Task, 'tasks'),
+    'journal': (Journal, 'journal'),
+}
+# child column -> parent table whose ids it references
+IMPORT_REFERENCES = {'habit_logs': {'habit_id': 'habits'}}
+IMPORT_PARENTS = {parent for refs in IMPORT_REFERENCES.values() for parent in refs.values()}
+
+def import_value(column, value):
+    """One exported value converted to what `column` stores; ValueError if it can't be."""
+    kind = column.type.python_type
+    if kind is datetime:
+        return datetime.fromisoformat(value) if isinstance(value, str) else None
+    if kind is date:
+        return date.fromisoformat(value[:10]) if isinstance(value, str) else None
+    if kind is bool:
+        return bool(value)
+    if kind is int:
+        return int(value)
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value)  # journal stickers come back as a list
+    value = str(value)
+    if getattr(column.type, 'length', None) and len(value) > column.type.length:
+        raise ValueError(f"{column.name} is longer than {column.type.length} characters")
+    return value
+
+def import_row(model, row):
+    """
+    Validated insert values for one exported row: every column but the primary
+    key and user_id, converted, with model defaults filling missing values.
+    Every row of a table gets the same keys, as a multi-row INSERT needs.
+    """
+    if not isinstance(row, dict):
+        raise ValueError('row must be an object')
+    values = {}
+    for column in model.__table__.c:
+        if column.primary_key or column.name == 'user_id':
+            continue
+        value = row.get(column.name)
+        try:
+            value = None if value is None else import_value(column, value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"bad {column.name}: {e}")
+        if value is None and column.default is not None:
+            value = column.default.arg(None) if column.default.is_callable else column.default.arg
+        if value is None and not column.nullable:
+            raise ValueError(f"{column.name} is required")
+        values[column.name] = value
+    return values
+
+class DataImport:
+    """
+    Replays an NDJSON export (see /api/export) into one user's account.
+
+    Lines are validated, grouped into batches of IMPORT_BATCH_SIZE rows of one
+    table, and each batch is written as a multi-row INSERT in its own
+    transaction together with the job's progress, so a failure loses at most
+    the batch in flight. Re-running the same job skips the lines already
+    committed. Exported ids are not kept: parent rows get fresh ids and the
+    old -> new mapping is stored with the job so children can be remapped
+    after a resume too.
+    """
+
+    def __init__(self, user_id, job_id=None):
+        self.user_id = user_id
+        self.batch_size = app.config['IMPORT_BATCH_SIZE']
+        if job_id and len(job_id) > 64:
+            raise LookupError(f"Unknown import job {job_id}")
+        self.job = db.session.get(ImportJob, job_id) if job_id else None
+        if self.job is not None and self.job.user_id != user_id:
+            raise LookupError(f"Unknown import job {job_id}")
+        if self.job is None:
+            self.job = ImportJob(job_id=job_id or uuid.uuid4().hex, user_id=user_id)
+            db.session.add(self.job)
+            db.session.commit()
+        self.job_id = self.job.job_id
+        self.resumed_from = self.job.lines_done
+        self.imported = dict.fromkeys(IMPORT_TABLES, 0)
+        self.complete = False
+        self._id_maps = {}
+        self._table, self._batch, self._last_line = None, [], 0
+
+    def run(self, lines):
+        """
+        Import `lines` (str or bytes); ValueError names the first bad line. The
+        job is done only once the export's end trailer has been read; input that
+        stops before it (or a failure) leaves it partial, to be resumed. Either
+        way the daily summary is rebuilt for the rows committed so far.
+        """
+        try:
+            self._read(lines)
+        except Exception:
+            try:
+                self._finish()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error('Import job %s: could not record the failure: %s', self.job_id, e)
+            raise
+        self._finish()
+        return self
+
+    def _finish(self):
+        self.job.status = 'done' if self.complete else 'partial'
+        db.session.commit()
+        rebuild_daily_summary(self.user_id)
+
+    def _read(self, lines):
+        for number, raw in enumerate(lines, 1):
+            if not raw.strip():
+                continue
+            try:
+                doc = json_loads(raw)
+                table, row = doc['table'], doc['row']
+            except (ValueError, TypeError, KeyError):
+                raise ValueError(f"line {number}: not an export record")
+            if number == 1:
+                if table != 'export' or row.get('version') != EXPORT_VERSION:
+                    raise ValueError(f"line 1: expected an export header with version {EXPORT_VERSION}")
+                continue
+            if table == 'end':
+                self.complete = True
+                break
+            if number <= self.resumed_from or table == 'users':
+                continue
+            if table not in IMPORT_TABLES:
+                raise ValueError(f"line {number}: unknown table {table!r}")
+            if table != self._table or len(self._batch) == self.batch_size:
+                self._flush()
+                self._table = table
+            model = IMPORT_TABLES[table][0]
+            try:
+                values = self._remap(table, import_row(model, row))
+            except ValueError as e:
+                raise ValueError(f"line {number}: {table}: {e}")
+            self._batch.append((row.get(model.__mapper__.primary_key[0].name), values))
+            self._last_line = number
+        self._flush()
+
+    def _remap(self, table, values):
+        for column, parent in IMPORT_REFERENCES.get(table, {}).items():
+            new_id = self._new_id(parent, values[column])
+            if new_id is None:
+                raise ValueError(f"{column} {values[column]} is not in this export")
+            values[column] = new_id
+        return values
+
+    def _new_id(self, table, old_id):
+        ids = self._id_maps.get(table)
+        if ids is None:
+            # after a resume the parents were imported by an earlier run
+            ids = self._id_maps[table] = dict(db.session.execute(
+                select(ImportIdMap.old_id, ImportIdMap.new_id)
+                .where(ImportIdMap.job_id == self.job_id, ImportIdMap.table_name == table)).all())
+        return ids.get(old_id)
+
+    def _flush(self):
+        if not self._batch:
+            return
+        table, batch = self._table, self._batch
+        model, resource = IMPORT_TABLES[table]
+        try:
+            if table in IMPORT_PARENTS:
+                # the ORM flush hands back the new ids (batched with RETURNING where the driver can)
+                objects = [model(user_id=self.user_id, **values) for _, values in batch]
+                db.session.add_all(objects)
+                db.session.flush()
+                pk = model.__mapper__.primary_key[0].name
+                pairs = [(old_id, getattr(obj, pk)) for (old_id, _), obj in zip(batch, objects) if old_id is not None]
+                if pairs:
+                    db.session.execute(insert(ImportIdMap), [
+                        {'job_id': self.job_id, 'table_name': table, 'old_id': old, 'new_id': new} for old, new in pairs])
+                    self._id_maps.setdefault(table, {}).update(pairs)
+            else:
+                rows = [values for _, values in batch]
+                if 'user_id' in model.__table__.c:
+                    rows = [dict(values, user_id=self.user_id) for values in rows]
+                db.session.execute(insert(model), rows)
+            bump_data_version(self.user_id, resource)
+            self.job.lines_done = self._last_line
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._id_maps.pop(table, None)
+            raise
+        self.imported[table] += len(batch)
+        self._batch = []
+
+    def result(self):
+        return {'job_id': self.job_id, 'imported': self.imported,
+                'resumed_from_line': self.resumed_from, 'complete': self.complete}
+
+@app.route('/api/import', methods=['POST'])
+@rate_class('import')
+def import_data():
+    """
+    Import an NDJSON export (GET /api/export) into the current user's account.
+    The body is read line by line as it arrives. Send ?job=<job_id> from an
+    earlier response to resume a failed import where it stopped.
+    """
+    user_id = session.get('user_id', 1)
+    try:
+        job = DataImport(user_id, request.args.get('job'))
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    try:
+        job.run(request.stream)
+    except ValueError as e:
+        return jsonify({'error': str(e), **job.result()}), 400
+    except Exception as e:
+        print("import_data error:", e)
+        return jsonify({'error': str(e), **job.result()}), 500
+    return jsonify({'success': True, **job.result()})
+
+
+# ===== User shards (SHARD_DATABASE_URLS) =====
+class UserShard(db.Model):
+    """Directory: which shard holds a user's rows. Lives on the default database."""
+    __tablename__ = 'user_shards'
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    shard = db.Column(db.String(20), nullable=False)
+    moving = db.Column(db.Boolean, nullable=False, default=False)
+
+# everything keyed by user lives on the user's shard; users and user_shards stay global
+SHARDED_MODELS = (Mood, Habit, HabitLog, Task, Journal, DailySummary, HabitStreak, DataVersion, ImportJob, ImportIdMap)
+
+def delete_user_rows(user_id):
+    """Delete all of a user's sharded rows (children first) on the current shard."""
+    habit_ids = select(Habit.habit_id).where(Habit.user_id == user_id)
+    job_ids = select(ImportJob.job_id).where(ImportJob.user_id == user_id)
+    db.session.execute(delete(HabitLog).where(HabitLog.habit_id.in_(habit_ids)))
+    db.session.execute(delete(ImportIdMap).where(ImportIdMap.job_id.in_(job_ids)))
+    for model in (Mood, Habit, Task, Journal, DailySummary, HabitStreak, DataVersion, ImportJob):
+        db.session.execute(delete(model).where(model.user_id == user_id))
+    db.session.commit()
+
+def move_user(user_id, target):
+    """
+    Move a user's rows to shard `target`. The user is flagged in the directory
+    first and gets 503s until the move is done; after one directory TTL no
+    worker writes to the source any more. Rows are copied with the export and
+    import pipeline (fresh ids on the target, resumable), then deleted from the
+    source and the directory is pointed at the target. If it fails, run it
+    again: the import resumes and the user stays flagged until it succeeds.
+    Returns False if the user is already on `target`.
+    """
+    if target not in shard_router.shards:
+        raise ValueError(f"Unknown shard {target!r}; shards are {', '.join(shard_router.shards)}")
+    source = shard_router.shard_for(user_id, allow_moving=True)
+    if source == target:
+        return False
+    shard_router.set_directory(user_id, source, moving=True)
+    time.sleep(shard_router.ttl)
+
+    with tempfile.TemporaryFile() as spool:
+        with shard_router.use_shard(source):
+            for line in export_ndjson(user_id, export_tables(user_id)):
+                spool.write(line.encode())
+            versions = db.session.execute(
+                select(DataVersion.resource, DataVersion.version).where(DataVersion.user_id == user_id)).all()
+            db.session.commit()
+        spool.seek(0)
+        with shard_router.use_shard(target):
+            # carry the data versions over (added, so they only grow) so old ETags can't match new data
+            for resource, version in versions:
+                upsert_increment(DataVersion.__table__, {'user_id': user_id, 'resource': resource}, {'version': version})
+            db.session.commit()
+            job = DataImport(user_id, f'move-{user_id}-{source}').run(spool)
+            if not job.complete:
+                raise RuntimeError(f"Export of user {user_id} from {source} was incomplete; run the move again")
+
+    with shard_router.use_shard(source):
+        delete_user_rows(user_id)
+    shard_router.set_directory(user_id, target, moving=False)
+    response_cache.invalidate(user_id, 'farm_stats', 'habits_stats', 'tasks_stats', 'mood_streak')
+    return True
+
 
 # ===== Farm aggregated stats API =====
+def farm_stats_queries(user_id, today):
+    """The three independent statements behind /api/farm/stats: counters, recent moods, recent journal."""
+    def count_of(model, *criteria):
+        return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+    # all scalar metrics in a single round trip over the daily summary
+    counts = select(
+        summary_sum(DailySummary.mood_entries).label('total_moods'),
+        count_of(Habit, Habit.user_id == user_id).label('total_habits'),
+        summary_sum(case((DailySummary.day == today, DailySummary.habits_completed), else_=0)).label('completed_habits_today'),
+        summary_sum(DailySummary.tasks_total).label('total_tasks'),
+        summary_sum(DailySummary.tasks_completed).label('completed_tasks'),
+        summary_sum(DailySummary.journal_entries).label('total_journal'),
+    ).where(DailySummary.user_id == user_id)
+
+    # recent lists as plain row projections; rows expose the same
+    # attribute names as the models, so to_dict() serializes them as-is
+    recent_moods = (
+        select(Mood.mood_id, Mood.user_id, Mood.mood, Mood.energy_level, Mood.notes, Mood.log_date, Mood.created_at)
+        .where(Mood.user_id == user_id)
+        .order_by(Mood.log_date.desc(), Mood.created_at.desc())
+        .limit(7)
+    )
+    recent_journal = (
+        select(Journal.journal_id, Journal.user_id, Journal.content, Journal.stickers, Journal.entry_date, Journal.created_at)
+        .where(Journal.user_id == user_id)
+        .order_by(Journal.entry_date.desc(), Journal.created_at.desc())
+        .limit(5)
+    )
+    return counts, recent_moods, recent_journal
+
+def farm_stats_payload(counts, recent_moods, recent_journal):
+    return {
+        'success': True,
+        'stats': {
+            'total_moods': counts.total_moods,
+            'recent_moods': [Mood.to_dict(m) for m in recent_moods],
+            'total_habits': counts.total_habits,
+            'completed_habits_today': counts.completed_habits_today,
+            'total_tasks': counts.total_tasks,
+            'completed_tasks': counts.completed_tasks,
+            'total_journal': counts.total_journal,
+            'recent_journal': [Journal.to_dict(j) for j in recent_journal]
+        }
+    }
+
 @app.route('/api/farm/stats', methods=['GET'])
+@read_only
+@rate_class('stats')
+@response_cache.cached('farm_stats')
 def api_farm_stats():
     try:
         user_id = session.get('user_id', 1)
-        total_moods = Mood.query.filter_by(user_id=user_id).count()
-        recent_moods = Mood.query.filter_by(user_id=user_id).order_by(Mood.log_date.desc(), Mood.created_at.desc()).limit(7).all()
-
-        total_habits = Habit.query.filter_by(user_id=user_id).count()
-        # limit habit logs to this user's habits
-        habit_ids = [h.habit_id for h in Habit.query.filter_by(user_id=user_id).all()]
-        if habit_ids:
-            completed_habits_today = HabitLog.query.filter(HabitLog.habit_id.in_(habit_ids), HabitLog.log_date==date.today(), HabitLog.completed==True).count()
-        else:
-            completed_habits_today = 0
-
-        total_tasks = Task.query.filter_by(user_id=user_id).count()
-        completed_tasks = Task.query.filter_by(user_id=user_id, is_completed=True).count()
+        counts, recent_moods, recent_journal = farm_stats_queries(user_id, date.today())
+        return jsonify(farm_stats_payload(
+            db.session.execute(counts).one(),
+            db.session.execute(recent_moods).all(),
+            db.session.execute(recent_journal).all()
+        ))
+    except Exception as e:
+        print(f"Error in api_farm_stats: {e}")
+        return jsonify({'error': str(e)}), 500
 
-        total_journal = Journal.query.filter_by(user_id=user_id).count()
-        recent_journal = Journal.query.filter_by(user_id=user_id).order_by(Journal.entry_date.desc(), Journal.created_at.desc()).limit(5).all()
 
-        return jsonify({
-            'success': True,
-            'stats': {
-                'total_moods': total_moods,
-                'recent_moods': [m.to_dict() for m in recent_moods],
-                'total_habits': total_habits,
-                'completed_habits_today': completed_habits_today,
-                'total_tasks': total_tasks,
-                'completed_tasks': completed_tasks,
-                'total_journal': total_journal,
-                'recent_journal': [j.to_dict() for j in recent_journal]
-            }
-        })
+# ===== Async read path =====
+# /api/farm/stats with its three independent statements run concurrently on
+# async_db's event loop (aiomysql / aiosqlite), so the request waits for the
+# slowest one instead of their sum. The worker still blocks until they are
+# done: single-query views gain nothing here, which is why there are none.
+# Enabled with ASYNC_DB_ENABLED=1.
+
+def async_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not async_db.enabled:
+            return jsonify({'error': 'Async API disabled (set ASYNC_DB_ENABLED=1)'}), 503
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/api/async/farm/stats', methods=['GET'])
+@rate_class('stats')
+@async_required
+@response_cache.cached('farm_stats')
+def async_farm_stats():
+    try:
+        user_id = session.get('user_id', 1)
+        counts, recent_moods, recent_journal = async_db.fetch(*farm_stats_queries(user_id, date.today()))
+        return jsonify(farm_stats_payload(counts[0], recent_moods, recent_journal))
     except Exception as e:
-        print(f"Error in api_farm_stats: {e}")
+        print(f"Error in async_farm_stats: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/cache/stats', methods=['GET'])
+def api_cache_stats():
+    return jsonify({'success': True, 'cache': response_cache.stats()})
+
 
 @app.before_request
 def require_login():
     # Allow access to static files, API, and auth endpoints
-    if request.path.startswith('/static') or request.path.startswith('/api'):
+    # (/admin views check ADMIN_TOKEN themselves)
+    if request.path.startswith('/static') or request.path.startswith('/api') or request.path.startswith('/admin'):
         return
-    if request.path in ['/register', '/login', '/init-db']:
+    if request.path in ['/register', '/login', '/init-db', '/health', '/health/live', '/health/ready', '/metrics']:
         return
     if 'user_id' not in session:
         return redirect(url_for('register'))
@@ -1015,31 +2079,320 @@ def farm_statistics():
 def farm_settings():
     return render_template('farm_settings.html')
 
+# Approximate row counts for health output, sampled in the background (no COUNT(*))
+table_sizes = TableSizeSampler(
+    app, db,
+    ['users', 'mood', 'habits', 'habit_logs', 'tasks', 'journal', 'daily_summary'],
+    interval=app.config['TABLE_SIZE_SAMPLE_INTERVAL']
+)
+
+def ping_db():
+    """Round-trip a trivial query through the pool; returns latency in ms."""
+    started = time.perf_counter()
+    with db.engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    return round((time.perf_counter() - started) * 1000, 2)
+
+@app.route('/health/live')
+def health_live():
+    # process is up and serving requests; deliberately no database access
+    return jsonify({'status': 'alive'})
+
+@app.route('/health/ready')
+def health_ready():
+    try:
+        latency_ms = ping_db()
+        status = {
+            'status': 'ready',
+            'db_latency_ms': latency_ms,
+            'pool': pool_status(db.engine),
+            'approx_rows': table_sizes.snapshot(),
+            'admission': rate_limiter.stats()
+        }
+        if replica_router.enabled:
+            # reads fall back to the primary, so unhealthy replicas don't make the app unready
+            status['replicas'] = replica_router.status()
+        return jsonify(status)
+    except Exception as e:
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+
 @app.route('/health')
 def health():
     try:
-        mood_count = Mood.query.count()
-        habit_count = Habit.query.count()
+        ping_db()
+        sizes = table_sizes.snapshot()['tables']
         return jsonify({
             'status': 'healthy',
-            'mood_entries': mood_count,
-            'habit_entries': habit_count
+            'mood_entries': sizes.get('mood'),
+            'habit_entries': sizes.get('habits')
         })
     except Exception as e:
         return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: per-endpoint SQL/latency histograms plus pool and cache counters."""
+    pool = pool_status(db.engine)
+    cache = response_cache.stats()
+    extra = []
+    extra += metric_lines('farm_db_pool_checked_out', 'Connections currently checked out.', 'gauge', pool.get('checkedout', 0))
+    extra += metric_lines('farm_db_pool_size', 'Configured persistent pool size.', 'gauge', pool.get('size', 0))
+    if 'checkout' in pool:
+        extra += metric_lines('farm_db_pool_checkouts_total', 'Pool checkouts.', 'counter', pool['checkout']['checkouts'])
+        extra += metric_lines('farm_db_pool_timeouts_total', 'Pool checkouts that timed out.', 'counter', pool['checkout']['timeouts'])
+    extra += metric_lines('farm_response_cache_hits_total', 'Stats cache hits.', 'counter', cache['hits'])
+    extra += metric_lines('farm_response_cache_misses_total', 'Stats cache misses.', 'counter', cache['misses'])
+    if replica_router.enabled:
+        replicas = replica_router.status()
+        extra += metric_lines('farm_db_replicas_healthy', 'Replicas currently taking reads.', 'gauge', sum(r['healthy'] for r in replicas))
+        extra += metric_lines('farm_db_replica_reads_total', 'Statements served by replicas.', 'counter', sum(r['reads'] for r in replicas))
+        extra += metric_lines('farm_db_replica_fallbacks_total', 'Read-only requests sent to the primary for lack of a healthy replica.', 'counter', replica_router.fallbacks)
+        extra += metric_lines('farm_db_replica_sticky_total', 'Read-only requests kept on the primary after a write.', 'counter', replica_router.sticky_reads)
+        extra += metric_lines('farm_db_replica_retries_total', 'Read-only requests run again on the primary after a replica error.', 'counter', replica_router.retries)
+    if write_queue.enabled:
+        extra += write_queue.render_metrics()
+    extra += rate_limiter.render_metrics()
+    return Response(query_tracker.render_metrics(extra), mimetype='text/plain; version=0.0.4')
+
+def is_admin_request():
+    """
+    True when the request carries ADMIN_TOKEN in the X-Admin-Token header
+    (never the query string, which ends up in access logs). Without a
+    configured token nobody passes, unless ADMIN_ALLOW_LOOPBACK is set: then
+    loopback clients do. Behind a local reverse proxy every client looks like
+    loopback, so leave it off there.
+    """
+    token = app.config.get('ADMIN_TOKEN')
+    supplied = request.headers.get('X-Admin-Token')
+    if token:
+        return supplied is not None and hmac.compare_digest(supplied, token)
+    return bool(app.config.get('ADMIN_ALLOW_LOOPBACK')) and request.remote_addr in ('127.0.0.1', '::1')
+
+def admin_required(view):
+    """Diagnostics guard for the /admin views, see is_admin_request()."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin_request():
+            return jsonify({'error': 'Forbidden'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+# Per-request cProfile: X-Profile: 1 from an admin, or 1-in-N per PROFILE_SAMPLE
+request_profiler = RequestProfiler()
+
+@app.route('/admin/slow-queries', methods=['GET', 'DELETE'])
+@admin_required
+def admin_slow_queries():
+    if request.method == 'DELETE':
+        slow_query_log.clear()
+        return jsonify({'success': True})
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'success': True,
+        'threshold_ms': app.config['SLOW_QUERY_MS'],
+        'entries': slow_query_log.snapshot(limit)
+    })
+
+@app.route('/admin/profiles')
+@admin_required
+def admin_profiles():
+    entries = request_profiler.index()
+    for entry in entries:
+        entry['report_url'] = url_for('admin_profile', profile_id=entry['id'])
+    return jsonify({
+        'success': True,
+        'max_files': request_profiler.max_files,
+        'sampled': request_profiler.sample_rates,
+        'profiles': entries
+    })
+
+@app.route('/admin/profiles/<profile_id>')
+@admin_required
+def admin_profile(profile_id):
+    # ?format=raw downloads the pstats dump (snakeviz, pstats); default is a text report
+    if request.args.get('format') == 'raw':
+        path = request_profiler.raw_path(profile_id)
+        if path is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                         download_name=f'{profile_id}.prof')
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'calls', 'ncalls'):
+        return jsonify({'error': 'Unsupported sort'}), 400
+    report = request_profiler.report(profile_id, sort, request.args.get('limit', 40, type=int))
+    if report is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return Response(report, mimetype='text/plain')
+
 @app.route('/init-db')
 def init_db():
     try:
         db.create_all()
+        shard_router.create_all()
         return jsonify({'success': True, 'message': 'Database initialized'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def bind_extensions(command):
+    """
+    Let CLI commands run with `flask --app app_fixed ...` too: that finds the bare
+    module-level app, so bind the extensions first (a no-op under the factory).
+    """
+    @wraps(command)
+    def wrapper(*args, **kwargs):
+        create_app()
+        return command(*args, **kwargs)
+    return wrapper
+
+@app.cli.command('rebuild-summary')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user (default: everyone).')
+@bind_extensions
+def rebuild_summary_command(user_id):
+    """Rebuild the daily_summary table from mood, habit, task and journal rows."""
+    if user_id is not None:
+        with shard_router.use_user(user_id):
+            n = rebuild_daily_summary(user_id)
+    elif shard_router.shards:
+        n = 0
+        for shard in shard_router.shards:
+            with shard_router.use_shard(shard):
+                n += rebuild_daily_summary()
+    else:
+        n = rebuild_daily_summary()
+    click.echo(f"✅ Daily summary rebuilt for {n} user(s)")
+
+@app.cli.command('import-data')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user-id', type=int, required=True, help='Account that receives the data.')
+@click.option('--job', 'job_id', default=None, help='Resume this import job.')
+@bind_extensions
+def import_data_command(path, user_id, job_id):
+    """Import an NDJSON export (GET /api/export) into an account."""
+    with open(path, 'rb') as f, shard_router.use_user(user_id):
+        job = DataImport(user_id, job_id)
+        try:
+            job.run(f)
+        except ValueError as e:
+            raise click.ClickException(f"{e} (resume with --job {job.job_id})")
+        if not job.complete:
+            raise click.ClickException(
+                f"{path} ends before the export's end record (resume with --job {job.job_id})")
+    counts = ', '.join(f"{n} {table}" for table, n in job.imported.items())
+    click.echo(f"✅ Imported {counts} for user {user_id} (job {job.job_id})")
+
+@app.cli.command('shards')
+@bind_extensions
+def shards_command():
+    """List the shards and how many users each holds."""
+    if not shard_router.shards:
+        raise click.ClickException('Sharding is off (SHARD_DATABASE_URLS is not set)')
+    placements = shard_router.placements()
+    for shard in shard_router.shards:
+        users = sum(1 for _, current, _ in placements if current == shard)
+        misplaced = sum(1 for _, current, wanted in placements if current == shard and wanted != shard)
+        click.echo(f"{shard}: {users} user(s), {misplaced} to move on rebalance")
+
+@app.cli.command('move-user')
+@click.option('--user-id', type=int, required=True)
+@click.option('--to', 'target', required=True, help='Target shard name, e.g. shard1.')
+@bind_extensions
+def move_user_command(user_id, target):
+    """Move one user's rows to another shard."""
+    try:
+        moved = move_user(user_id, target)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✅ User {user_id} moved to {target}" if moved else f"User {user_id} is already on {target}")
+
+@app.cli.command('rebalance')
+@click.option('--dry-run', is_flag=True, help='Only list the moves.')
+@bind_extensions
+def rebalance_command(dry_run):
+    """Move users whose shard differs from the hash ring's choice (e.g. after adding a shard)."""
+    if not shard_router.shards:
+        raise click.ClickException('Sharding is off (SHARD_DATABASE_URLS is not set)')
+    moves = [(user_id, current, wanted) for user_id, current, wanted in shard_router.placements() if current != wanted]
+    for user_id, current, wanted in moves:
+        click.echo(f"user {user_id}: {current} -> {wanted}")
+        if not dry_run:
+            move_user(user_id, wanted)
+    click.echo(f"{len(moves)} user(s) {'to move' if dry_run else 'moved'}")
+
+
+def create_app(config_overrides=None):
+    """
+    Bind the extensions to `app` and create the engine. Runs once per process;
+    config_overrides (e.g. a test DATABASE_URL) must come with the first call.
+    Used by wsgi.py, the bench scripts and `flask --app "app_fixed:create_app()"`.
+    """
+    if 'sqlalchemy' in app.extensions:
+        if config_overrides:
+            raise RuntimeError('create_app() already ran; pass config_overrides on the first call')
+        return app
+
+    app.config.update(config_overrides or {})
+    if 'SQLALCHEMY_DATABASE_URI' in (config_overrides or {}) and 'SQLALCHEMY_ENGINE_OPTIONS' not in config_overrides:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = config.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    # orjson when installed; both providers write dates as ISO 8601
+    app.json = provider_class(app.config['JSON_PROVIDER'])(app)
+
+    # first in line, so shed or limited requests never touch the database (not even the shard directory)
+    rate_limiter.init_app(app, pools=lambda: [bind.pool for bind in db.engines.values()])
+    # these add the shards and replicas to SQLALCHEMY_BINDS, so they go first
+    shard_router.init_app(app, db, UserShard.__table__, [m.__tablename__ for m in SHARDED_MODELS], config.engine_options)
+    replica_router.init_app(app, db, config.engine_options)
+    if shard_router.shards and app.config['ASYNC_DB_ENABLED']:
+        raise RuntimeError('The async read path does not route by shard; unset ASYNC_DB_ENABLED or SHARD_DATABASE_URLS')
+    db.init_app(app)
+    with app.app_context():
+        engine = db.engine
+        engines = list(db.engines.values())  # the default engine plus any shards and replicas
+        for bind in engines:
+            sqlite_backend.install(bind)  # WAL + pragmas; no-op on MySQL
+        query_tracker.init_app(app, engine)
+        for bind in engines:
+            query_tracker.instrument(bind)  # no-op for the default engine, done above
+        replica_router.watch_engines()
+        slow_query_log.init_app(app, query_tracker, engine)
+    static_assets.init_app(app)
+    response_cache.init_app(app)
+    compressor.init_app(app)
+    request_profiler.init_app(app, authorize=is_admin_request)
+    async_db.init_app(app)
+    write_queue.init_app(
+        app, db,
+        # flush each user's writes on their own shard
+        partition=lambda: shard_router.current_shard() if shard_router.enabled else None,
+        scope=lambda shard: shard_router.use_shard(shard) if shard else nullcontext())
+    async_db.on_engine.append(query_tracker.instrument)  # slow-query log sees async statements too
+    table_sizes.interval = app.config['TABLE_SIZE_SAMPLE_INTERVAL']
+
+    if hasattr(os, 'register_at_fork'):
+        # pooled connections and cache sockets must not be shared with forked workers;
+        # close=False leaves the parent's connections alone
+        os.register_at_fork(after_in_child=lambda: (
+            [bind.dispose(close=False) for bind in engines], response_cache.reset(), rate_limiter.reset()))
+    return app
+
+def shutdown_app():
+    """Stop background threads and close pooled connections (worker exit, Ctrl+C)."""
+    table_sizes.stop()
+    replica_router.stop()
+    slow_query_log.stop()
+    write_queue.stop()
+    async_db.dispose()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
 if __name__ == '__main__':
+    create_app()
     with app.app_context():
         db.create_all()
+        shard_router.create_all()
         print("✅ Database tables created/verified")
     
     print("🚀 Starting Stardew Valley Well-Being Tracker...")
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import threading
+
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+# Far-future lifetime for fingerprinted (content-addressed) asset URLs
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Uploaded journal images get a unique timestamped name on upload and are never
+# rewritten in place, so their plain URL is already safe to cache forever.
+IMMUTABLE_PREFIXES = ('uploads/',)
+
+
+class StaticAssets:
+    """
+    Serves the static folder with content fingerprints.
+
+    - url_for('static', filename=...) gets a ?v=<digest> query param
+    - requests carrying the current digest are cached as immutable for a year
+    - every response has a strong ETag derived from the file contents, so
+      unversioned URLs revalidate with a cheap 304
+    - Range / If-Range requests are answered with 206 partial content by
+      werkzeug's conditional send_file (seeking in the file, not reading it all)
+    """
+
+    def __init__(self, app=None):
+        self._digests = {}
+        self._lock = threading.Lock()
+        self.static_folder = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        app.config.setdefault('STATIC_IMMUTABLE_MAX_AGE', IMMUTABLE_MAX_AGE)
+        app.url_defaults(self._add_fingerprint)
+        app.view_functions['static'] = self.serve
+        app.extensions['static_assets'] = self
+
+    def digest(self, filename):
+        """Content digest of a static file, cached until its mtime/size change."""
+        path = safe_join(self.static_folder, filename)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._digests.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                h.update(chunk)
+        digest = h.hexdigest()[:16]
+        with self._lock:
+            self._digests[path] = (key, digest)
+        return digest
+
+    def _add_fingerprint(self, endpoint, values):
+        if endpoint != 'static' or 'v' in values:
+            return
+        filename = values.get('filename')
+        if not filename or filename.startswith(IMMUTABLE_PREFIXES):
+            return
+        digest = self.digest(filename)
+        if digest:
+            values['v'] = digest
+
+    def serve(self, filename):
+        from flask import current_app
+
+        digest = self.digest(filename)
+        immutable = filename.startswith(IMMUTABLE_PREFIXES) or (
+            digest is not None and request.args.get('v') == digest
+        )
+        max_age = current_app.config['STATIC_IMMUTABLE_MAX_AGE'] if immutable else 0
+
+        response = send_from_directory(
+            self.static_folder,
+            filename,
+            etag=digest if digest is not None else True,
+            max_age=max_age,
+            conditional=True,
+        )
+        response.cache_control.public = True
+        if immutable:
+            response.cache_control.immutable = True
+        else:
+            # force revalidation against the ETag instead of heuristic caching
+            response.cache_control.no_cache = True
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import threading
+
+from sqlalchemy.engine import make_url
+
+import sqlite_backend
+
+# sync driver -> asyncio driver for the same database
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_url(url):
+    """DATABASE_URL rewritten for an asyncio driver (aiomysql / aiosqlite)."""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.drivername)
+    if driver is None:
+        raise ValueError(f"No async driver known for {url.drivername!r}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=driver)
+
+
+class AsyncDatabase:
+    """
+    SQLAlchemy asyncio engine driven by one event-loop thread per process.
+
+    Views stay plain WSGI functions and hand coroutines to run(), which blocks
+    the calling worker thread until they finish: a single statement gains
+    nothing over the sync engine. What it buys is fetch(*statements), which
+    runs independent statements concurrently, each on its own pooled
+    connection, so a request costs the slowest query instead of their sum.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.url = None
+        self.timeout = 30
+        self.engine_options = {}
+        self.engine = None
+        self.on_engine = []
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASYNC_DB_ENABLED', False)
+        app.config.setdefault('ASYNC_DATABASE_URL', None)
+        app.config.setdefault('ASYNC_DB_TIMEOUT', 30)
+        self.enabled = app.config['ASYNC_DB_ENABLED']
+        self.timeout = app.config['ASYNC_DB_TIMEOUT']
+        if self.enabled:
+            self.url = make_url(app.config['ASYNC_DATABASE_URL'] or async_url(app.config['SQLALCHEMY_DATABASE_URI']))
+            # same pool sizing as the sync engine; SQLite's connect_args/poolclass don't carry over
+            options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+            self.engine_options = {
+                k: v for k, v in options.items()
+                if k in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+            } if self.url.get_backend_name() != 'sqlite' else {}
+        app.extensions['async_db'] = self
+
+    def _start(self):
+        # (re)start lazily, and again in a forked worker where the loop thread is gone
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='async-db-loop', daemon=True).start()
+            self.engine = create_async_engine(self.url, **self.engine_options)
+            sqlite_backend.install(self.engine.sync_engine)
+            for fn in self.on_engine:
+                fn(self.engine.sync_engine)
+            self._loop = loop
+            self._pid = os.getpid()
+
+    def run(self, coro):
+        """Run a coroutine on the database loop and wait for its result."""
+        if not self.enabled:
+            coro.close()
+            raise RuntimeError('ASYNC_DB_ENABLED is off')
+        self._start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(self.timeout)
+
+    async def all(self, statement):
+        async with self.engine.connect() as conn:
+            return (await conn.execute(statement)).all()
+
+    async def gather(self, *statements):
+        return await asyncio.gather(*(self.all(s) for s in statements))
+
+    def fetch(self, *statements):
+        """Rows of every statement, executed concurrently; one list per statement."""
+        return self.run(self.gather(*statements))
+
+    def dispose(self):
+        if self.engine is not None and self._pid == os.getpid():
+            self.run(self.engine.dispose())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self.engine = None
+        self._loop = None
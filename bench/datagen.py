@@ -0,0 +1,291 @@
+"""
+Synthetic large-scale dataset generator.
+
+Creates realistic volumes for reproducing production slowness: thousands of
+users, years of daily habit_logs, several moods per day, tens of thousands of
+tasks and long journal entries with stickers. Everything is derived from
+--seed and the user's index, so the same arguments always produce the same
+rows no matter how many worker processes are used.
+
+    python bench/datagen.py --database-url mysql+pymysql://root:@localhost/farm_bench \\
+        --users 2000 --years 3 --workers 8            # ~10M rows
+
+    python bench/datagen.py --database-url sqlite:///big.db --users 200 --years 2
+
+Users are split into chunks that a process pool generates and writes in
+parallel. Rows go to the database as batched executemany INSERTs (PyMySQL
+rewrites these into multi-row VALUES statements), or with --method load-data
+as tab-separated files fed to MySQL's LOAD DATA LOCAL INFILE. daily_summary
+rows are computed during generation, so no rebuild pass is needed.
+All generated users share the password given by --password.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MOODS = ['happy', 'calm', 'content', 'tired', 'anxious', 'sad', 'excited', 'grateful']
+HABITS = ['Drink water', 'Morning stretch', 'Read 20 pages', 'Meditate', 'Walk 8k steps',
+          'No sugar', 'Journal', 'Practice guitar', 'Sleep by 11', 'Water the plants']
+TASK_VERBS = ['Finish', 'Call', 'Buy', 'Clean', 'Plan', 'Review', 'Fix', 'Email', 'Harvest', 'Plant']
+TASK_NOUNS = ['report', 'groceries', 'mom', 'garage', 'budget', 'garden', 'bike', 'slides', 'parsnips', 'chicken coop']
+WORDS = ('today the farm was quiet and i watered the crops before breakfast then walked to town '
+         'the weather turned and rain fell over pelican town so i stayed in and read by the fire '
+         'felt tired but proud of the small steps progress is slow like growing blueberries '
+         'remember to rest tomorrow call a friend fish at the river and tidy the shed').split()
+STICKERS = ['/static/img/habit.PNG', '/static/img/mood.PNG', '/static/img/journal.PNG',
+            '/static/img/tasks.PNG', '/static/img/dashboard.PNG']
+
+TABLES = ('users', 'habits', 'habit_logs', 'mood', 'tasks', 'journal', 'daily_summary')
+COUNTERS = ('mood_entries', 'habits_completed', 'tasks_total', 'tasks_completed', 'journal_entries')
+
+
+# ===== generation (pure, deterministic) =====
+
+def user_rng(seed, index):
+    return random.Random(seed * 1_000_003 + index)
+
+
+def sentence(rng, lo, hi):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(lo, hi))).capitalize() + '.'
+
+
+def generate_user(index, opts):
+    """
+    Yield (table, row) for one user. Primary keys for users and habits are
+    assigned from the bases in `opts` so habit_logs can reference them
+    without a round trip; the other tables use autoincrement ids.
+    """
+    rng = user_rng(opts['seed'], index)
+    user_id = opts['user_base'] + index + 1
+    today = opts['today']
+    days = int(opts['years'] * 365)
+    summary = {}
+
+    def bump(day, counter, n=1):
+        row = summary.setdefault(day, dict.fromkeys(COUNTERS, 0))
+        row[counter] += n
+
+    joined = today - timedelta(days=days - 1)
+    yield 'users', {
+        'user_id': user_id, 'name': f'Farmer {index + 1}', 'email': f'farmer{user_id}@example.com',
+        'password_hash': opts['password_hash'], 'created_at': datetime.combine(joined, datetime.min.time()),
+    }
+
+    # habits: each with its own start date and adherence rate
+    n_habits = min(len(HABITS), max(1, int(rng.gauss(opts['habits_per_user'], 1.5))))
+    for h, name in enumerate(rng.sample(HABITS, n_habits)):
+        habit_id = opts['habit_base'] + index * len(HABITS) + h + 1
+        yield 'habits', {'habit_id': habit_id, 'user_id': user_id, 'habit_name': name, 'description': sentence(rng, 3, 8)}
+        adherence = rng.betavariate(3, 2)
+        start = rng.randint(0, days // 3)
+        for d in range(start, days):
+            if rng.random() < adherence:
+                day = joined + timedelta(days=d)
+                yield 'habit_logs', {'habit_id': habit_id, 'completed': True, 'log_date': day}
+                bump(day, 'habits_completed')
+
+    # moods: a few check-ins most days, fewer on weekends
+    for d in range(days):
+        day = joined + timedelta(days=d)
+        mean = opts['moods_per_day'] * (0.6 if day.weekday() >= 5 else 1.0)
+        for _ in range(min(6, int(rng.expovariate(1 / mean) + 0.5)) if mean > 0 else 0):
+            yield 'mood', {
+                'user_id': user_id, 'mood': rng.choice(MOODS), 'energy_level': rng.randint(1, 5),
+                'notes': sentence(rng, 4, 20) if rng.random() < 0.4 else None, 'log_date': day,
+                'created_at': datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randint(360, 1380)),
+            }
+            bump(day, 'mood_entries')
+
+    # tasks: spread over history, older ones mostly done, some undated
+    for _ in range(max(0, int(rng.gauss(opts['tasks_per_user'], opts['tasks_per_user'] / 4)))):
+        offset = rng.randint(-30, days - 1)
+        due = today - timedelta(days=offset) if rng.random() > 0.02 else None
+        done = rng.random() < (0.9 if offset > 7 else 0.3)
+        yield 'tasks', {
+            'user_id': user_id, 'task_name': f'{rng.choice(TASK_VERBS)} {rng.choice(TASK_NOUNS)}',
+            'priority': rng.choice(['Low', 'Medium', 'Medium', 'High']), 'due_date': due, 'is_completed': done,
+        }
+        bump(due or date(1970, 1, 1), 'tasks_total')
+        if done:
+            bump(due or date(1970, 1, 1), 'tasks_completed')
+
+    # journal: long entries on some days, with a few stickers
+    for d in range(days):
+        if rng.random() < opts['journal_rate']:
+            day = joined + timedelta(days=d)
+            paragraphs = [sentence(rng, 40, 120) for _ in range(rng.randint(1, 5))]
+            yield 'journal', {
+                'user_id': user_id, 'content': '\n\n'.join(paragraphs),
+                'stickers': json.dumps(rng.sample(STICKERS, rng.randint(0, 3))), 'entry_date': day,
+                'created_at': datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randint(18, 23)),
+            }
+            bump(day, 'journal_entries')
+
+    for day, counts in summary.items():
+        yield 'daily_summary', dict(user_id=user_id, day=day, **counts)
+
+
+# ===== writers (run inside worker processes) =====
+
+_engine = None
+_tables = None
+
+
+def _init_worker(database_url, method):
+    """Process-pool initializer: one pooled engine per worker process."""
+    global _engine, _tables
+    import config
+    import sqlite_backend
+    from sqlalchemy import MetaData, create_engine
+
+    options = config.engine_options(database_url)
+    if method == 'load-data':
+        options['connect_args'] = dict(options.get('connect_args', {}), local_infile=True)
+    _engine = create_engine(database_url, **options)
+    sqlite_backend.install(_engine)
+    metadata = MetaData()
+    metadata.reflect(_engine, only=TABLES)
+    _tables = metadata.tables
+
+
+def _tsv_value(value):
+    if value is None:
+        return r'\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def _flush_insert(conn, buffers):
+    from sqlalchemy import insert
+    for table in TABLES:  # parents before children
+        rows = buffers[table]
+        if rows:
+            conn.execute(insert(_tables[table]), rows)
+            rows.clear()
+
+
+def _flush_load_data(conn, buffers):
+    for table in TABLES:
+        rows = buffers[table]
+        if not rows:
+            continue
+        columns = list(rows[0])
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, encoding='utf-8') as f:
+            for row in rows:
+                f.write('\t'.join(_tsv_value(row[c]) for c in columns) + '\n')
+            path = f.name
+        try:
+            conn.exec_driver_sql(
+                f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+                f"({', '.join(f'`{c}`' for c in columns)})"
+            )
+        finally:
+            os.unlink(path)
+        rows.clear()
+
+
+def write_users(indices, opts):
+    """Generate and write a chunk of users in one transaction per batch. Returns row counts."""
+    flush = _flush_load_data if opts['method'] == 'load-data' else _flush_insert
+    buffers = {t: [] for t in TABLES}
+    counts = dict.fromkeys(TABLES, 0)
+    pending = 0
+    with _engine.connect() as conn:
+        for index in indices:
+            for table, row in generate_user(index, opts):
+                buffers[table].append(row)
+                counts[table] += 1
+                pending += 1
+            if pending >= opts['batch']:
+                # flush on user boundaries so child rows never precede their parents
+                flush(conn, buffers)
+                conn.commit()
+                pending = 0
+        flush(conn, buffers)
+        conn.commit()
+    return counts
+
+
+# ===== driver =====
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'), required=not os.getenv('DATABASE_URL'))
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--habits-per-user', type=float, default=4)
+    parser.add_argument('--moods-per-day', type=float, default=2)
+    parser.add_argument('--tasks-per-user', type=int, default=40)
+    parser.add_argument('--journal-rate', type=float, default=0.3, help='probability of a journal entry per day')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--today', type=date.fromisoformat, default=None,
+                        help='anchor date for the history (default: today; fix it for byte-identical datasets)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk', type=int, default=20, help='users per work unit')
+    parser.add_argument('--batch', type=int, default=20000, help='rows buffered per INSERT/LOAD DATA flush')
+    parser.add_argument('--method', choices=['insert', 'load-data'], default='insert')
+    parser.add_argument('--password', default='farm-password')
+    args = parser.parse_args(argv)
+
+    url = args.database_url
+    os.environ['DATABASE_URL'] = url
+    if args.method == 'load-data' and not url.startswith('mysql'):
+        parser.error('--method load-data needs a MySQL database')
+    if url.startswith('sqlite') and args.workers > 1:
+        # SQLite has a single writer; extra processes only queue on the lock
+        print('SQLite backend: using a single writer process')
+        args.workers = 1
+
+    import app_fixed
+    from sqlalchemy import func, select
+    from werkzeug.security import generate_password_hash
+
+    app_fixed.create_app()
+    db = app_fixed.db
+    with app_fixed.app.app_context():
+        db.create_all()
+        user_base = db.session.execute(select(func.coalesce(func.max(app_fixed.User.user_id), 0))).scalar()
+        habit_base = db.session.execute(select(func.coalesce(func.max(app_fixed.Habit.habit_id), 0))).scalar()
+        db.session.remove()
+        db.engine.dispose()
+
+    opts = {
+        'seed': args.seed, 'today': args.today or date.today(), 'years': args.years,
+        'habits_per_user': args.habits_per_user, 'moods_per_day': args.moods_per_day,
+        'tasks_per_user': args.tasks_per_user, 'journal_rate': args.journal_rate,
+        'user_base': user_base, 'habit_base': habit_base, 'batch': args.batch, 'method': args.method,
+        'password_hash': generate_password_hash(args.password),
+    }
+    chunks = [list(range(i, min(i + args.chunk, args.users))) for i in range(0, args.users, args.chunk)]
+    totals = dict.fromkeys(TABLES, 0)
+    started = time.perf_counter()
+    done_users = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(url, args.method)) as pool:
+        futures = {pool.submit(write_users, chunk, opts): len(chunk) for chunk in chunks}
+        for future in as_completed(futures):
+            for table, n in future.result().items():
+                totals[table] += n
+            done_users += futures[future]
+            rows = sum(totals.values())
+            elapsed = time.perf_counter() - started
+            print(f"\r{done_users}/{args.users} users, {rows:,} rows, {rows / elapsed:,.0f} rows/s", end='', flush=True)
+
+    elapsed = time.perf_counter() - started
+    print()
+    for table in TABLES:
+        print(f"  {table:14} {totals[table]:>12,}")
+    print(f"✅ {sum(totals.values()):,} rows in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,408 @@
+"""
+End-to-end HTTP benchmark for the /api endpoints.
+
+Seeds a database with N users and a configurable amount of history, then drives
+every API route concurrently (Flask test client in-process, or a real local
+HTTP server with --mode server) and reports throughput and p50/p95/p99 latency
+per endpoint. Results are written as JSON so runs can be compared across commits.
+
+    python bench/http_bench.py --users 20 --days 365 --requests 300 --concurrency 8 --out after.json
+    python bench/http_bench.py --compare before.json after.json
+
+The database defaults to a fresh SQLite file in a temp dir; pass --database-url
+to benchmark MySQL (the target database is seeded, so use a scratch schema).
+The image upload route is skipped because it writes into static/uploads.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_PASSWORD = 'bench-password'
+
+
+# ===== seeding =====
+
+def seed(app_module, users, days, habits_per_user, tasks_per_user, journal_per_user, moods_per_day, rng):
+    """Insert benchmark users with `days` of history. Returns the list of user ids."""
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+
+    db = app_module.db
+    m = app_module
+    today = date.today()
+    pw_hash = generate_password_hash(BENCH_PASSWORD)  # hashing is slow; share one hash
+    stamp = int(time.time())
+    moods = ['happy', 'calm', 'tired', 'sad', 'excited']
+
+    with m.app.app_context():
+        db.create_all()
+        user_ids = []
+        for i in range(users):
+            user = m.User(name=f'bench{i}', email=f'bench{stamp}_{i}@example.com', password_hash=pw_hash)
+            db.session.add(user)
+            db.session.flush()
+            uid = user.user_id
+            user_ids.append(uid)
+
+            habit_ids = []
+            for h in range(habits_per_user):
+                habit = m.Habit(user_id=uid, habit_name=f'habit {h}', description='bench')
+                db.session.add(habit)
+                db.session.flush()
+                habit_ids.append(habit.habit_id)
+
+            log_rows, mood_rows = [], []
+            for d in range(days):
+                day = today - timedelta(days=d)
+                for hid in habit_ids:
+                    if rng.random() < 0.7:
+                        log_rows.append({'habit_id': hid, 'log_date': day, 'completed': True})
+                for _ in range(moods_per_day):
+                    mood_rows.append({
+                        'user_id': uid, 'mood': rng.choice(moods), 'energy_level': rng.randint(1, 5),
+                        'notes': 'bench', 'log_date': day,
+                        'created_at': datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randint(6, 22)),
+                    })
+            task_rows = [{
+                'user_id': uid, 'task_name': f'task {t}', 'priority': rng.choice(['Low', 'Medium', 'High']),
+                'due_date': today - timedelta(days=rng.randint(-30, max(days, 1))), 'is_completed': rng.random() < 0.6,
+            } for t in range(tasks_per_user)]
+            journal_rows = [{
+                'user_id': uid, 'content': 'Dear diary, ' * 20, 'stickers': json.dumps(['/static/img/habit.PNG']),
+                'entry_date': today - timedelta(days=rng.randint(0, max(days - 1, 0))), 'created_at': datetime.utcnow(),
+            } for _ in range(journal_per_user)]
+
+            for model, rows in ((m.HabitLog, log_rows), (m.Mood, mood_rows), (m.Task, task_rows), (m.Journal, journal_rows)):
+                if rows:
+                    db.session.execute(insert(model), rows)
+            db.session.commit()
+
+        m.rebuild_daily_summary()
+    return user_ids
+
+
+# ===== endpoints =====
+
+class Ctx:
+    """Per-worker state: the acting user and ids of rows it can touch."""
+
+    def __init__(self, user_id, habit_ids, task_ids, journal_ids):
+        self.user_id = user_id
+        self.habit_ids = habit_ids
+        self.task_ids = task_ids
+        self.journal_ids = journal_ids
+
+
+def load_ids(app_module, user_ids):
+    m = app_module
+    ids = {}
+    with m.app.app_context():
+        for uid in user_ids:
+            ids[uid] = (
+                [h.habit_id for h in m.Habit.query.filter_by(user_id=uid).all()],
+                [t.task_id for t in m.Task.query.filter_by(user_id=uid).limit(200).all()],
+                [j.journal_id for j in m.Journal.query.filter_by(user_id=uid).limit(200).all()],
+            )
+    return ids
+
+
+# name -> (method, path(ctx, rng), json body(ctx, rng) or None)
+ENDPOINTS = {
+    'GET /api/mood': ('GET', lambda c, r: '/api/mood', None),
+    'GET /api/mood?date': ('GET', lambda c, r: f'/api/mood?date={date.today().isoformat()}', None),
+    'GET /api/mood/recent': ('GET', lambda c, r: '/api/mood/recent?limit=7', None),
+    'GET /api/mood/history': ('GET', lambda c, r: '/api/mood/history?days=30', None),
+    'GET /api/mood/streak': ('GET', lambda c, r: '/api/mood/streak', None),
+    'POST /api/mood': ('POST', lambda c, r: '/api/mood', lambda c, r: {'mood': 'happy', 'energy_level': r.randint(1, 5)}),
+    'GET /api/habits': ('GET', lambda c, r: '/api/habits', None),
+    'POST /api/habits': ('POST', lambda c, r: '/api/habits', lambda c, r: {'name': 'bench habit'}),
+    'POST /api/habits/<id>/log': ('POST', lambda c, r: f'/api/habits/{r.choice(c.habit_ids)}/log', None),
+    'GET /api/habits/stats': ('GET', lambda c, r: '/api/habits/stats', None),
+    'GET /api/tasks': ('GET', lambda c, r: '/api/tasks', None),
+    'POST /api/tasks': ('POST', lambda c, r: '/api/tasks', lambda c, r: {'name': 'bench task'}),
+    'PUT /api/tasks/<id>': ('PUT', lambda c, r: f'/api/tasks/{r.choice(c.task_ids)}', lambda c, r: {'name': 'renamed'}),
+    'POST /api/tasks/<id>/toggle': ('POST', lambda c, r: f'/api/tasks/{r.choice(c.task_ids)}/toggle', None),
+    'GET /api/tasks/stats': ('GET', lambda c, r: '/api/tasks/stats', None),
+    'GET /api/journal': ('GET', lambda c, r: '/api/journal', None),
+    'POST /api/journal': ('POST', lambda c, r: '/api/journal', lambda c, r: {'content': 'bench entry', 'stickers': []}),
+    'PUT /api/journal/<id>': ('PUT', lambda c, r: f'/api/journal/{r.choice(c.journal_ids)}', lambda c, r: {'content': 'edited'}),
+    'GET /api/farm/stats': ('GET', lambda c, r: '/api/farm/stats', None),
+    'GET /api/cache/stats': ('GET', lambda c, r: '/api/cache/stats', None),
+}
+
+# The asyncio variant of farm stats (--async-api)
+ASYNC_ENDPOINTS = {
+    'GET /api/async/farm/stats': ('GET', lambda c, r: '/api/async/farm/stats', None),
+}
+
+# Deletes first create the row they remove (setup is not timed)
+DELETE_ENDPOINTS = {
+    'DELETE /api/habits/<id>': ('/api/habits', {'name': 'to delete'}, 'habit', 'habit_id', '/api/habits/{}'),
+    'DELETE /api/tasks/<id>': ('/api/tasks', {'name': 'to delete'}, 'task', 'task_id', '/api/tasks/{}'),
+    'DELETE /api/journal/<id>': ('/api/journal', {'content': 'to delete'}, 'entry', 'journal_id', '/api/journal/{}'),
+}
+
+
+# ===== transports =====
+
+class TestClientTransport:
+    """In-process requests through Flask's test client, one client per worker thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def client(self, user_id):
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = {}
+        if user_id not in clients:
+            client = self.app.test_client()
+            with client.session_transaction() as s:
+                s['user_id'] = user_id
+            clients[user_id] = client
+        return clients[user_id]
+
+    def prepare(self, user_id):
+        self.client(user_id)
+
+    def request(self, user_id, method, path, body=None):
+        resp = self.client(user_id).open(path, method=method, json=body)
+        return resp.status_code, resp.get_json(silent=True)
+
+    def close(self):
+        pass
+
+
+class ServerTransport:
+    """Real HTTP against a threaded werkzeug server on localhost."""
+
+    def __init__(self, app, user_emails):
+        import logging
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no per-request access log
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.user_emails = user_emails
+        self._local = threading.local()
+
+    def opener(self, user_id):
+        import http.cookiejar
+        import urllib.parse
+        import urllib.request
+        openers = getattr(self._local, 'openers', None)
+        if openers is None:
+            openers = self._local.openers = {}
+        if user_id not in openers:
+            opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+            form = urllib.parse.urlencode({'email': self.user_emails[user_id], 'password': BENCH_PASSWORD}).encode()
+            opener.open(self.base + '/login', data=form).read()
+            openers[user_id] = opener
+        return openers[user_id]
+
+    def prepare(self, user_id):
+        self.opener(user_id)  # log in outside the timed section
+
+    def request(self, user_id, method, path, body=None):
+        import urllib.error
+        import urllib.request
+        data = json.dumps(body).encode() if body is not None else (b'' if method != 'GET' else None)
+        req = urllib.request.Request(self.base + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with self.opener(user_id).open(req) as resp:
+                payload = resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            payload, status = e.read(), e.code
+        try:
+            return status, json.loads(payload)
+        except ValueError:
+            return status, None
+
+    def close(self):
+        self.server.shutdown()
+
+
+# ===== driver =====
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def run_endpoint(transport, name, contexts, n_requests, concurrency, seed_value):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        rng = random.Random(seed_value * 1000003 + i)
+        ctx = contexts[i % len(contexts)]
+        transport.prepare(ctx.user_id)
+        if name in DELETE_ENDPOINTS:
+            create_path, body, key, id_field, delete_path = DELETE_ENDPOINTS[name]
+            _, created = transport.request(ctx.user_id, 'POST', create_path, body)
+            method, path, body = 'DELETE', delete_path.format(created[key][id_field]), None
+        else:
+            method, path_fn, body_fn = ENDPOINTS[name]
+            path, body = path_fn(ctx, rng), body_fn(ctx, rng) if body_fn else None
+        started = time.perf_counter()
+        status, _ = transport.request(ctx.user_id, method, path, body)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if status >= 400:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    wall = time.perf_counter() - wall_start
+
+    ms = sorted(x * 1000 for x in latencies)
+    return {
+        'count': len(ms),
+        'errors': errors,
+        'throughput_rps': round(len(ms) / wall, 1) if wall else None,
+        'mean_ms': round(sum(ms) / len(ms), 3) if ms else None,
+        'p50_ms': round(percentile(ms, 50), 3) if ms else None,
+        'p95_ms': round(percentile(ms, 95), 3) if ms else None,
+        'p99_ms': round(percentile(ms, 99), 3) if ms else None,
+        'max_ms': round(ms[-1], 3) if ms else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def print_table(results):
+    print(f"{'endpoint':34} {'n':>6} {'err':>4} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:34} {r['count']:>6} {r['errors']:>4} {r['throughput_rps']:>9} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"before: {before['meta'].get('commit')}  after: {after['meta'].get('commit')}")
+    print(f"{'endpoint':34} {'p50 before':>11} {'p50 after':>10} {'p95 before':>11} {'p95 after':>10} {'rps change':>11}")
+    for name, a in after['results'].items():
+        b = before['results'].get(name)
+        if not b:
+            continue
+        change = f"{(a['throughput_rps'] / b['throughput_rps'] - 1) * 100:+.1f}%" if b['throughput_rps'] else '-'
+        print(f"{name:34} {b['p50_ms']:>11} {a['p50_ms']:>10} {b['p95_ms']:>11} {a['p95_ms']:>10} {change:>11}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='defaults to a fresh SQLite file in a temp dir')
+    parser.add_argument('--mode', choices=['client', 'server'], default='client')
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--days', type=int, default=365, help='days of mood/habit history per user')
+    parser.add_argument('--habits', type=int, default=5, help='habits per user')
+    parser.add_argument('--tasks', type=int, default=500, help='tasks per user')
+    parser.add_argument('--journal', type=int, default=200, help='journal entries per user')
+    parser.add_argument('--moods-per-day', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=10, help='untimed requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoints', help='only run endpoints whose name contains this text')
+    parser.add_argument('--no-cache', action='store_true', help='disable the stats response cache')
+    parser.add_argument('--async-api', action='store_true', help='also run /api/async/farm/stats (needs an async driver)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='write JSON results here')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    tmpdir = None
+    if not args.database_url:
+        tmpdir = tempfile.mkdtemp(prefix='farm-bench-')
+        args.database_url = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+    # config.py reads the environment at import time
+    os.environ['DATABASE_URL'] = args.database_url
+    if args.no_cache:
+        os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+    if args.async_api:
+        os.environ['ASYNC_DB_ENABLED'] = '1'
+        ENDPOINTS.update(ASYNC_ENDPOINTS)
+    import app_fixed
+    app_fixed.create_app()
+
+    rng = random.Random(args.seed)
+    t0 = time.perf_counter()
+    user_ids = seed(app_fixed, args.users, args.days, args.habits, args.tasks, args.journal, args.moods_per_day, rng)
+    print(f"Seeded {len(user_ids)} users in {time.perf_counter() - t0:.1f}s")
+
+    ids = load_ids(app_fixed, user_ids)
+    contexts = [Ctx(uid, *ids[uid]) for uid in user_ids]
+
+    if args.mode == 'server':
+        with app_fixed.app.app_context():
+            emails = {u.user_id: u.email for u in app_fixed.User.query.filter(app_fixed.User.user_id.in_(user_ids))}
+        transport = ServerTransport(app_fixed.app, emails)
+    else:
+        transport = TestClientTransport(app_fixed.app)
+
+    names = [n for n in list(ENDPOINTS) + list(DELETE_ENDPOINTS) if not args.endpoints or args.endpoints in n]
+    results = {}
+    try:
+        for i, name in enumerate(names):
+            if args.warmup:
+                run_endpoint(transport, name, contexts, args.warmup, args.concurrency, args.seed + i + 7919)
+            results[name] = run_endpoint(transport, name, contexts, args.requests, args.concurrency, args.seed + i)
+    finally:
+        transport.close()
+
+    print_table(results)
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'dialect': args.database_url.split(':', 1)[0],
+            'mode': args.mode,
+            'users': args.users, 'days': args.days, 'habits': args.habits, 'tasks': args.tasks,
+            'journal': args.journal, 'moods_per_day': args.moods_per_day,
+            'requests': args.requests, 'concurrency': args.concurrency, 'cache': not args.no_cache,
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+JSON serialization microbenchmark.
+
+Times turning N task and mood rows into a JSON response body (to_dict() plus
+encoding), without a database or HTTP, for each provider:
+
+  legacy   to_dict() with isoformat() strings + Flask's stdlib provider (sorted keys)
+  stdlib   to_dict() with date objects + IsoJSONProvider
+  orjson   to_dict() with date objects + OrjsonProvider (if orjson is installed)
+
+    python bench/json_bench.py --rows 10000 --repeat 7
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_rows(app_module, n, rng):
+    today = date.today()
+    tasks, moods = [], []
+    for i in range(n):
+        day = today - timedelta(days=rng.randrange(730))
+        created = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randrange(86400))
+        tasks.append(app_module.Task(
+            task_id=i + 1, user_id=1, task_name=f'Water the crops #{i}', due_date=day,
+            is_completed=rng.random() < 0.5, priority=rng.choice(['low', 'medium', 'high'])
+        ))
+        moods.append(app_module.Mood(
+            mood_id=i + 1, user_id=1, mood=rng.choice(['happy', 'calm', 'tired', 'sad']),
+            energy_level=rng.randint(1, 5), notes='Harvested the parsnips today.', log_date=day, created_at=created
+        ))
+    return tasks, moods
+
+
+def iso(d):
+    return {k: v.isoformat() if isinstance(v, date) else v for k, v in d.items()}
+
+
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=7, help='runs per case; the best is reported')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    import app_fixed
+    from flask.json.provider import DefaultJSONProvider
+    from json_provider import IsoJSONProvider, OrjsonProvider, orjson
+
+    app = app_fixed.app
+    tasks, moods = make_rows(app_fixed, args.rows, random.Random(args.seed))
+    providers = {'legacy': DefaultJSONProvider(app), 'stdlib': IsoJSONProvider(app)}
+    if orjson is not None:
+        providers['orjson'] = OrjsonProvider(app)
+    else:
+        print('orjson not installed; skipping that provider')
+
+    print(f"{'rows':14} {'provider':8} {'to_dict ms':>11} {'encode ms':>10} {'total ms':>9} {'bytes':>9}")
+    for label, rows in (('tasks', tasks), ('moods', moods)):
+        for name, provider in providers.items():
+            # legacy to_dict() produced ISO strings itself; include that cost in its to_dict column
+            to_dict = (lambda: [iso(r.to_dict()) for r in rows]) if name == 'legacy' else (lambda: [r.to_dict() for r in rows])
+            payload = {'success': True, label: to_dict(), 'count': len(rows)}
+            with app.app_context():
+                encode = lambda: provider.response(payload).get_data()
+                t_dict = best_of(args.repeat, to_dict)
+                t_encode = best_of(args.repeat, encode)
+                size = len(encode())
+            print(f"{f'{len(rows)} {label}':14} {name:8} {t_dict:>11.1f} {t_encode:>10.1f} {t_dict + t_encode:>9.1f} {size:>9}")
+
+
+if __name__ == '__main__':
+    main()
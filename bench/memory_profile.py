@@ -0,0 +1,109 @@
+"""
+Memory/CPU profile of list serialization: ORM hydration vs lean row projections.
+
+Seeds one user with N mood and N journal rows in a scratch SQLite file, then
+builds the /api/mood/history and /api/journal response bodies two ways:
+
+  orm    Model.query...all() + instance.to_dict()   (the old read path)
+  lean   lean_select(Model) rows + Model.to_dict(row)  (the current one)
+
+For each it reports wall time and the tracemalloc peak while the request is
+built, i.e. the extra memory a worker needs to serve it.
+
+    python bench/memory_profile.py --rows 100000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def seed(app_module, rows, rng):
+    from sqlalchemy import insert
+
+    db = app_module.db
+    today = date.today()
+    moods, journal = [], []
+    for i in range(rows):
+        day = today - timedelta(days=i // 4)
+        created = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randrange(86400))
+        moods.append({'user_id': 1, 'mood': rng.choice(['happy', 'calm', 'tired', 'sad']),
+                      'energy_level': rng.randint(1, 5), 'notes': 'Harvested the parsnips today.',
+                      'log_date': day, 'created_at': created})
+        journal.append({'user_id': 1, 'content': 'Fished at the lake until dusk. ' * 4,
+                        'stickers': '["fish", "sun"]', 'entry_date': day, 'created_at': created})
+    with app_module.app.app_context():
+        db.create_all()
+        db.session.execute(insert(app_module.Mood), moods)
+        db.session.execute(insert(app_module.Journal), journal)
+        db.session.commit()
+
+
+def measure(app_module, fn):
+    """(ms, peak MiB, body bytes); timed without tracemalloc, which slows allocation down."""
+    with app_module.app.app_context():
+        gc.collect()
+        t0 = time.perf_counter()
+        body = fn()
+        elapsed = time.perf_counter() - t0
+        app_module.db.session.remove()
+        del body
+        gc.collect()
+        tracemalloc.start()
+        body = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        app_module.db.session.remove()
+    return elapsed * 1000, peak / 2 ** 20, len(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='mood rows and journal rows to seed')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix='farm-mem-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'mem.db')
+    import app_fixed
+    from flask import jsonify
+    app_fixed.create_app()
+    Mood, Journal, db = app_fixed.Mood, app_fixed.Journal, app_fixed.db
+
+    t0 = time.perf_counter()
+    seed(app_fixed, args.rows, random.Random(args.seed))
+    print(f"Seeded {args.rows} mood + {args.rows} journal rows in {time.perf_counter() - t0:.1f}s")
+
+    cases = {
+        ('mood history', 'orm'): lambda: jsonify({'success': True, 'entries': [
+            e.to_dict() for e in Mood.query.filter(Mood.user_id == 1)
+            .order_by(Mood.log_date.desc(), Mood.created_at.desc()).all()]}).get_data(),
+        ('mood history', 'lean'): lambda: jsonify({'success': True, 'entries': [
+            Mood.to_dict(r) for r in db.session.execute(
+                app_fixed.lean_select(Mood).where(Mood.user_id == 1)
+                .order_by(Mood.log_date.desc(), Mood.created_at.desc()))]}).get_data(),
+        ('journal', 'orm'): lambda: jsonify({'success': True, 'entries': [
+            e.to_dict() for e in Journal.query.filter_by(user_id=1)
+            .order_by(Journal.entry_date.desc(), Journal.created_at.desc()).all()]}).get_data(),
+        ('journal', 'lean'): lambda: jsonify({'success': True, 'entries': [
+            Journal.to_dict(r) for r in db.session.execute(
+                app_fixed.lean_select(Journal).where(Journal.user_id == 1)
+                .order_by(Journal.entry_date.desc(), Journal.created_at.desc()))]}).get_data(),
+    }
+    print(f"{'list':14} {'path':5} {'time ms':>9} {'peak MiB':>9} {'body MiB':>9}")
+    for (label, path), fn in cases.items():
+        measure(app_fixed, fn)  # warm up caches and statement compilation
+        ms, peak, size = measure(app_fixed, fn)
+        print(f"{label:14} {path:5} {ms:>9.0f} {peak:>9.1f} {size / 2 ** 20:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import gzip
+import zlib
+
+from flask import request
+
+# Optional: brotli is preferred when installed and the client accepts it
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/javascript', 'text/html', 'text/css',
+    'text/plain', 'text/csv', 'image/svg+xml', 'application/x-ndjson',
+)
+
+
+class Compressor:
+    """
+    Compresses responses according to the request's Accept-Encoding.
+
+    Brotli (if the module is installed) wins over gzip when the client takes
+    both. Streamed responses are compressed chunk by chunk as they are
+    produced. Bodies below COMPRESS_MIN_SIZE, pass-through responses (static
+    files) and responses that already carry a Content-Encoding are sent as-is.
+    """
+
+    def __init__(self, app=None):
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 4
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESS_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+        app.after_request(self.compress)
+        app.extensions['compressor'] = self
+
+    def choose_encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, response):
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = encoding
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        if encoding == 'br':
+            body = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            body = gzip.compress(body, compresslevel=self.gzip_level)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        # a strong validator names exact bytes; the compressed variant gets its own
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{encoding}')
+        return response
+
+    def _compress_stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            compress, flush = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)  # 31: gzip container
+            compress, flush = compressor.compress, compressor.flush
+        try:
+            for chunk in chunks:
+                data = compress(chunk.encode() if isinstance(chunk, str) else chunk)
+                if data:
+                    yield data
+            yield flush()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
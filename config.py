@@ -1,4 +1,6 @@
 ﻿import os
+from contextlib import contextmanager
+from urllib.parse import quote_plus
 
 # Optional: load .env if python-dotenv is installed
 try:
@@ -7,24 +9,196 @@ try:
 except Exception:
     pass
 
+
+def _env_bool(name, default):
+    return os.getenv(name, default).strip().lower() not in ("0", "false", "no", "off", "")
+
+
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_USER = os.getenv("DB_USER", "root")
 DB_PASS = os.getenv("DB_PASS", "")
 DB_NAME = os.getenv("DB_NAME", "daily_tracker")
 DB_PORT = int(os.getenv("DB_PORT", 3306))
 
-def get_db_connection():
+# DATABASE_URL wins over the individual DB_* settings
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+pymysql://{quote_plus(DB_USER)}:{quote_plus(DB_PASS)}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+# Connection pool tuning
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))        # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))       # stay below MySQL's wait_timeout
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "1")
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+DB_READ_TIMEOUT = int(os.getenv("DB_READ_TIMEOUT", 30))
+DB_WRITE_TIMEOUT = int(os.getenv("DB_WRITE_TIMEOUT", 30))
+
+# Embedded SQLite backend (DATABASE_URL=sqlite:///path/to/farm.db)
+DB_SQLITE_BUSY_TIMEOUT = float(os.getenv("DB_SQLITE_BUSY_TIMEOUT", 5))  # seconds to wait on the write lock
+DB_SQLITE_SYNCHRONOUS = os.getenv("DB_SQLITE_SYNCHRONOUS", "NORMAL").upper()
+DB_SQLITE_CACHE_KB = int(os.getenv("DB_SQLITE_CACHE_KB", 65536))
+DB_SQLITE_MMAP_BYTES = int(os.getenv("DB_SQLITE_MMAP_BYTES", 256 * 1024 * 1024))
+
+
+def engine_options(url=DATABASE_URL):
+    """create_engine() keyword arguments for `url`, driven by the DB_* pool settings."""
+    from db_pool import TimedQueuePool
+    from sqlite_backend import is_memory_url
+
+    if is_memory_url(url):
+        # one shared in-memory database; a pool of separate connections would each see an empty db
+        from sqlalchemy.pool import StaticPool
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if url.startswith("sqlite"):
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": DB_SQLITE_BUSY_TIMEOUT,
+        }
+    elif url.startswith("mysql"):
+        options["connect_args"] = {
+            "connect_timeout": DB_CONNECT_TIMEOUT,
+            "read_timeout": DB_READ_TIMEOUT,
+            "write_timeout": DB_WRITE_TIMEOUT,
+        }
+    return options
+
+
+# Flask / Flask-SQLAlchemy settings (loaded with app.config.from_object)
+SECRET_KEY = os.getenv("SECRET_KEY", "stardew-farm-secret-key-2024")
+SQLALCHEMY_DATABASE_URI = DATABASE_URL
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(DATABASE_URL)
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 60))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 10000))
+
+# Large list endpoints (mood history, tasks, journal) stream their JSON in
+# batches; these are hard caps on what a single request can ask for
+HISTORY_MAX_DAYS = int(os.getenv("HISTORY_MAX_DAYS", 3660))
+LIST_MAX_ROWS = int(os.getenv("LIST_MAX_ROWS", 50000))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 500))
+
+# Rows per multi-row INSERT (and per transaction) when importing an export
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+
+# User sharding: comma-separated database URLs, one per shard (shard0, shard1, ...;
+# append only). Per-user tables live on the shards; users and the user_shards
+# directory stay on DATABASE_URL. Unset = everything on DATABASE_URL.
+SHARD_DATABASE_URLS = os.getenv("SHARD_DATABASE_URLS", "")
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", 64))                      # hash ring points per shard
+SHARD_DIRECTORY_TTL = float(os.getenv("SHARD_DIRECTORY_TTL", 5))       # seconds a worker caches a user's shard
+
+# Read replicas: comma-separated URLs of replicas of DATABASE_URL. Read-only API
+# views read from them; clients that just wrote stay on the primary for
+# REPLICA_STICKY_SECONDS (keep it >= REPLICA_MAX_LAG). Unset = primary only.
+REPLICA_DATABASE_URLS = os.getenv("REPLICA_DATABASE_URLS", "")
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 5))
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))                # seconds; laggier replicas are skipped
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", 5))  # seconds between health/lag checks
+
+# Write-behind for mood and habit-log POSTs: queued in process and committed in
+# groups (one transaction per flush). WRITE_BEHIND_ACK=commit answers after the
+# commit; queued answers 202 at once (writes still queued are lost if the process dies).
+WRITE_BEHIND_ENABLED = _env_bool("WRITE_BEHIND_ENABLED", "0")
+WRITE_BEHIND_ACK = os.getenv("WRITE_BEHIND_ACK", "commit")
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", 5))      # collect window after the first write
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", 500))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", 10000))  # beyond this, writes get 503
+WRITE_BEHIND_TIMEOUT = float(os.getenv("WRITE_BEHIND_TIMEOUT", 5))        # seconds a request waits for its commit
+
+# Admission control for /api. RATE_LIMITS gives each user (or client address) a
+# token bucket per endpoint class: "class=requests/seconds,..." with classes read,
+# write (by HTTP method), stats, export and import; unlisted classes are unlimited.
+# Buckets are per worker (memory) or shared through Redis (redis).
+RATE_LIMITS = os.getenv("RATE_LIMITS", "")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "redis://localhost:6379/0")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))            # memory backend; LRU beyond this
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 0))         # per worker; 0 = no limit
+ADMISSION_POOL_SATURATION = float(os.getenv("ADMISSION_POOL_SATURATION", 0.9))  # shed with 503 above this; 0 = off
+
+# JSON encoder for API responses: auto (orjson when installed), orjson or stdlib
+JSON_PROVIDER = os.getenv("JSON_PROVIDER", "auto")
+
+# Response compression (brotli is used when the module is installed)
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))   # bytes; smaller bodies go out as-is
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", 4))
+
+TABLE_SIZE_SAMPLE_INTERVAL = int(os.getenv("TABLE_SIZE_SAMPLE_INTERVAL", 300))
+
+# Requests where one statement shape repeats this often are logged as likely N+1s
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+
+# Slow-query log (viewable at /admin/slow-queries)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", 200))
+SLOW_QUERY_EXPLAIN = _env_bool("SLOW_QUERY_EXPLAIN", "1")
+SLOW_QUERY_PARAMETERS = _env_bool("SLOW_QUERY_PARAMETERS", "0")  # keep bound values (user data) in entries
+
+# Request profiler: where profiles go, how many to keep, and sampled
+# endpoints as "endpoint:N,..." (profile 1 in N requests)
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 50))
+PROFILE_SAMPLE = os.getenv("PROFILE_SAMPLE", "")
+
+# Async read path (/api/async/...): needs aiomysql or aiosqlite (and greenlet).
+# ASYNC_DATABASE_URL defaults to DATABASE_URL with the matching async driver.
+ASYNC_DB_ENABLED = _env_bool("ASYNC_DB_ENABLED", "0")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+ASYNC_DB_TIMEOUT = float(os.getenv("ASYNC_DB_TIMEOUT", 30))
+
+# Token for the /admin diagnostics views; unset means no access, unless
+# ADMIN_ALLOW_LOOPBACK lets loopback clients in (only safe without a local proxy)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+ADMIN_ALLOW_LOOPBACK = _env_bool("ADMIN_ALLOW_LOOPBACK", "0")
+
+# Production server (wsgi.py / gunicorn.conf.py). Each worker process has its own
+# pool, so WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) must fit MySQL's
+# max_connections; WEB_THREADS above DB_POOL_SIZE only queue on the pool.
+WEB_BIND = os.getenv("WEB_BIND", "0.0.0.0:8000")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+WEB_THREADS = int(os.getenv("WEB_THREADS", 4))
+WEB_TIMEOUT = int(os.getenv("WEB_TIMEOUT", 30))
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 20))  # seconds to finish in-flight requests
+WEB_MAX_REQUESTS = int(os.getenv("WEB_MAX_REQUESTS", 0))           # recycle workers after N requests (0 = never)
+
+
+_engine = None
+
+def get_engine():
+    """
+    Shared pooled engine for scripts running outside the Flask app.
+    Created on first use with the same pool settings as the app.
+    """
+    global _engine
+    if _engine is None:
+        from sqlalchemy import create_engine
+        import sqlite_backend
+        _engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+        sqlite_backend.install(_engine)
+    return _engine
+
+
+@contextmanager
+def db_connection():
     """
-    Returns a new pymysql connection using the configured credentials.
-    Callers should close the connection when done.
+    Pooled SQLAlchemy connection in a transaction: commits on success,
+    rolls back on error, and always returns the connection to the pool.
     """
-    import pymysql
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASS,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor,
-        autocommit=False
-    )
+    with get_engine().begin() as conn:
+        yield conn
@@ -83,6 +83,65 @@ CREATE TABLE IF NOT EXISTS `tasks` (
   KEY `idx_tasks_due_date` (`due_date`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Daily summary (per-user counters maintained by the write endpoints;
+-- rebuild with `flask --app "app_fixed:create_app()" rebuild-summary`)
+CREATE TABLE IF NOT EXISTS `daily_summary` (
+  `user_id` INT(11) NOT NULL,
+  `day` DATE NOT NULL,
+  `mood_entries` INT(11) NOT NULL DEFAULT 0,
+  `habits_completed` INT(11) NOT NULL DEFAULT 0,
+  `tasks_total` INT(11) NOT NULL DEFAULT 0,
+  `tasks_completed` INT(11) NOT NULL DEFAULT 0,
+  `journal_entries` INT(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`user_id`, `day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Latest run of completed days per habit (current streak while last_day is today);
+-- maintained by the habit-log writes and rebuilt by rebuild-summary
+CREATE TABLE IF NOT EXISTS `habit_streaks` (
+  `habit_id` INT(11) NOT NULL,
+  `user_id` INT(11) NOT NULL,
+  `last_day` DATE NOT NULL,
+  `length` INT(11) NOT NULL,
+  PRIMARY KEY (`habit_id`),
+  KEY `idx_habit_streaks_user_id` (`user_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Per-user data versions, bumped with every write; used as ETag validators for the list APIs
+CREATE TABLE IF NOT EXISTS `data_versions` (
+  `user_id` INT(11) NOT NULL,
+  `resource` VARCHAR(20) NOT NULL,
+  `version` INT(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`user_id`, `resource`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Resumable imports (/api/import, `flask import-data`): progress and exported -> new ids
+CREATE TABLE IF NOT EXISTS `import_jobs` (
+  `job_id` VARCHAR(64) NOT NULL,
+  `user_id` INT(11) NOT NULL,
+  `lines_done` INT(11) NOT NULL DEFAULT 0,
+  `status` VARCHAR(20) NOT NULL DEFAULT 'running',
+  `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`job_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS `import_id_map` (
+  `job_id` VARCHAR(64) NOT NULL,
+  `table_name` VARCHAR(20) NOT NULL,
+  `old_id` INT(11) NOT NULL,
+  `new_id` INT(11) NOT NULL,
+  PRIMARY KEY (`job_id`, `table_name`, `old_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Shard directory (SHARD_DATABASE_URLS): which shard holds each user's rows
+CREATE TABLE IF NOT EXISTS `user_shards` (
+  `user_id` INT(11) NOT NULL,
+  `shard` VARCHAR(20) NOT NULL,
+  `moving` TINYINT(1) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`user_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Optional: sample data (uncomment to insert)
 -- INSERT INTO `habits` (`user_id`, `habit_name`, `description`) VALUES (1, 'Drink water', '8 glasses/day');
 -- INSERT INTO `tasks` (`user_id`, `task_name`, `due_date`, `is_completed`) VALUES (1, 'Finish report', '2025-12-08', 0);
@@ -0,0 +1,105 @@
+-- SQLite schema for the embedded backend (DATABASE_URL=sqlite:///farm.db).
+-- Mirrors schema.sql table for table; `python app_fixed.py` or /init-db
+-- creates the same tables and indexes from the models.
+-- Journal mode is persistent per database file:
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE IF NOT EXISTS users (
+  user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name VARCHAR(150) NOT NULL,
+  email VARCHAR(255) NOT NULL UNIQUE,
+  password_hash VARCHAR(255) NOT NULL,
+  created_at DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS habits (
+  habit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL,
+  habit_name VARCHAR(100) NOT NULL,
+  description TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_habits_user_id ON habits (user_id);
+
+CREATE TABLE IF NOT EXISTS habit_logs (
+  habit_log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  habit_id INTEGER NOT NULL,
+  completed BOOLEAN NOT NULL DEFAULT 0,
+  log_date DATE NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_habit_logs_habit_id ON habit_logs (habit_id);
+
+CREATE TABLE IF NOT EXISTS journal (
+  journal_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL,
+  content TEXT NOT NULL,
+  stickers TEXT,
+  entry_date DATE NOT NULL,
+  created_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_journal_user_id ON journal (user_id);
+
+CREATE TABLE IF NOT EXISTS mood (
+  mood_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL,
+  mood VARCHAR(100) NOT NULL,
+  energy_level INTEGER,
+  notes TEXT,
+  log_date DATE NOT NULL,
+  created_at DATETIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mood_user_id ON mood (user_id);
+CREATE INDEX IF NOT EXISTS idx_mood_log_date ON mood (log_date);
+
+CREATE TABLE IF NOT EXISTS tasks (
+  task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL,
+  task_name VARCHAR(150) NOT NULL,
+  priority VARCHAR(20) DEFAULT 'Medium',
+  due_date DATE,
+  is_completed BOOLEAN DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_id ON tasks (user_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks (due_date);
+
+CREATE TABLE IF NOT EXISTS daily_summary (
+  user_id INTEGER NOT NULL,
+  day DATE NOT NULL,
+  mood_entries INTEGER NOT NULL DEFAULT 0,
+  habits_completed INTEGER NOT NULL DEFAULT 0,
+  tasks_total INTEGER NOT NULL DEFAULT 0,
+  tasks_completed INTEGER NOT NULL DEFAULT 0,
+  journal_entries INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS data_versions (
+  user_id INTEGER NOT NULL,
+  resource VARCHAR(20) NOT NULL,
+  version INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, resource)
+);
+
+-- Resumable imports (/api/import, `flask import-data`): progress and exported -> new ids
+CREATE TABLE IF NOT EXISTS import_jobs (
+  job_id VARCHAR(64) PRIMARY KEY,
+  user_id INTEGER NOT NULL,
+  lines_done INTEGER NOT NULL DEFAULT 0,
+  status VARCHAR(20) NOT NULL DEFAULT 'running',
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS import_id_map (
+  job_id VARCHAR(64) NOT NULL,
+  table_name VARCHAR(20) NOT NULL,
+  old_id INTEGER NOT NULL,
+  new_id INTEGER NOT NULL,
+  PRIMARY KEY (job_id, table_name, old_id)
+);
+
+-- Shard directory (SHARD_DATABASE_URLS): which shard holds each user's rows
+CREATE TABLE IF NOT EXISTS user_shards (
+  user_id INTEGER PRIMARY KEY,
+  shard VARCHAR(20) NOT NULL,
+  moving BOOLEAN NOT NULL DEFAULT 0
+);
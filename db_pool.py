@@ -0,0 +1,79 @@
+import bisect
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds (ms) of the checkout latency histogram buckets; the last is +Inf
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolMetrics:
+    """Checkout latency histogram and saturation counters for one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.peak_checked_out = 0
+        self.buckets = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+
+    def record(self, seconds, checked_out):
+        ms = seconds * 1000
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self.buckets[bisect.bisect_left(CHECKOUT_BUCKETS_MS, ms)] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f'le_{b}ms' for b in CHECKOUT_BUCKETS_MS] + ['le_inf']
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'peak_checked_out': self.peak_checked_out,
+                'wait_histogram': dict(zip(labels, self.buckets)),
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited and how full the pool is."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record(time.perf_counter() - started, self.checkedout())
+        return conn
+
+    def recreate(self):
+        # keep counters across dispose() / recreate
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def capacity(self):
+        """Maximum simultaneous connections, or None when overflow is unbounded."""
+        return None if self._max_overflow < 0 else self.size() + self._max_overflow
+
+    def saturation(self):
+        capacity = self.capacity()
+        return round(self.checkedout() / capacity, 3) if capacity else None
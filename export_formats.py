@@ -0,0 +1,74 @@
+import csv
+import io
+import time
+import zipfile
+
+
+def ndjson_lines(table, rows, to_record, dumps):
+    """One JSON document per row: {"table": ..., "row": {...}}."""
+    for row in rows:
+        yield dumps({'table': table, 'row': to_record(row)}) + '\n'
+
+
+def csv_chunks(columns, rows, batch_size=500):
+    """CSV text for `rows` (tuples in `columns` order), header first, in batches of rows."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(columns)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(['' if v is None else v for v in row])
+        if i % batch_size == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+class _Sink:
+    """Write-only file object that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+class ZipStream:
+    """
+    Zip archive written to an unseekable stream, so it can be sent while it is
+    being built: zipfile falls back to data descriptors after each member and
+    the central directory goes out at the end. Each add_*() yields the bytes
+    produced so far; memory use is one chunk, not one archive.
+    """
+
+    def __init__(self):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, mode='w')
+
+    def add_chunks(self, name, chunks, compress=True):
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        with self._zip.open(info, mode='w', force_zip64=True) as member:
+            for chunk in chunks:
+                member.write(chunk.encode() if isinstance(chunk, str) else chunk)
+                yield self._sink.drain()
+        yield self._sink.drain()
+
+    def add_file(self, name, path, compress=False, chunk_size=64 * 1024):
+        # images are already compressed; store them as-is by default
+        with open(path, 'rb') as f:
+            yield from self.add_chunks(name, iter(lambda: f.read(chunk_size), b''), compress)
+
+    def close(self):
+        self._zip.close()
+        return self._sink.drain()
@@ -0,0 +1,38 @@
+"""
+Gunicorn settings:  gunicorn -c gunicorn.conf.py wsgi:app
+
+Values come from the WEB_* settings in config.py. The app is imported once in
+the master (preload_app) and forked into workers; create_app() registers an
+at-fork hook so each worker starts with an empty connection pool instead of
+sharing the master's sockets. SIGTERM gives workers WEB_GRACEFUL_TIMEOUT
+seconds to finish in-flight requests before they are killed.
+"""
+import config
+
+bind = config.WEB_BIND
+workers = config.WEB_CONCURRENCY
+worker_class = 'gthread'
+threads = config.WEB_THREADS
+timeout = config.WEB_TIMEOUT
+graceful_timeout = config.WEB_GRACEFUL_TIMEOUT
+keepalive = 5
+max_requests = config.WEB_MAX_REQUESTS
+max_requests_jitter = config.WEB_MAX_REQUESTS // 10
+preload_app = True
+accesslog = '-'
+
+
+def on_starting(server):
+    if workers > 1 and config.RESPONSE_CACHE_BACKEND == 'memory':
+        server.log.warning(
+            'RESPONSE_CACHE_BACKEND=memory is per worker: a write only invalidates the stats cached '
+            'by the worker that handled it; use redis to share the cache across %d workers', workers)
+
+
+def post_fork(server, worker):
+    server.log.info('Worker %s forked; connection pool reset', worker.pid)
+
+
+def worker_exit(server, worker):
+    from app_fixed import shutdown_app
+    shutdown_app()
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+
+def pool_status(engine):
+    """Connection pool counters for the readiness probe (whatever the pool class exposes)."""
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        fn = getattr(pool, name, None)
+        if callable(fn):
+            stats[name] = fn()
+    # checkout latency / saturation when the app runs on db_pool.TimedQueuePool
+    metrics = getattr(pool, 'metrics', None)
+    if metrics is not None:
+        stats['capacity'] = pool.capacity()
+        stats['saturation'] = pool.saturation()
+        stats['checkout'] = metrics.snapshot()
+    return stats
+
+
+class TableSizeSampler:
+    """
+    Approximate table row counts, refreshed by a daemon thread every `interval`
+    seconds. The first snapshot samples once in the caller, so the first probe
+    after a worker starts already has counts. Uses the database's own statistics (information_schema.table_rows on
+    MySQL, MAX(rowid) on SQLite) so probes never trigger a COUNT(*) scan.
+    """
+
+    def __init__(self, app, db, tables, interval=300):
+        self.app = app
+        self.db = db
+        self.tables = tuple(tables)
+        self.interval = interval
+        self.sizes = {}
+        self.sampled_at = None
+        self.error = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._first = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        # (re)start lazily, and again in a forked worker where the thread is gone
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='table-size-sampler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        if self.sampled_at is None and self.error is None:
+            with self._first:  # concurrent first probes wait for the one sample
+                if self.sampled_at is None and self.error is None:
+                    self._try_sample()
+        self.start()
+        return {
+            'tables': dict(self.sizes),
+            'sampled_at': self.sampled_at,
+            'error': self.error,
+        }
+
+    def sample(self):
+        with self.app.app_context():
+            engine = self.db.engine
+            with engine.connect() as conn:
+                if engine.dialect.name == 'mysql':
+                    rows = conn.execute(text(
+                        "SELECT table_name, table_rows FROM information_schema.tables "
+                        "WHERE table_schema = DATABASE()"
+                    ))
+                    sizes = {name: int(n or 0) for name, n in rows if name in self.tables}
+                elif engine.dialect.name == 'sqlite':
+                    sizes = {
+                        t: conn.execute(text(f'SELECT MAX(rowid) FROM "{t}"')).scalar() or 0
+                        for t in self.tables
+                    }
+                else:
+                    sizes = {}
+        self.sizes = sizes
+        self.sampled_at = time.time()
+        self.error = None
+
+    def _try_sample(self):
+        try:
+            self.sample()
+        except Exception as e:
+            self.error = str(e)
+            print(f"Table size sampler error: {e}")
+
+    def _run(self):
+        # snapshot() took the first sample
+        while not self._stop.wait(self.interval):
+            self._try_sample()
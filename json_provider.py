@@ -0,0 +1,69 @@
+import json
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+# Optional: orjson serializes dicts, dates and datetimes in C
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(s):
+    """Parse JSON text (e.g. a stored stickers column) with the fastest available parser."""
+    return orjson.loads(s) if orjson is not None else json.loads(s)
+
+
+class IsoJSONProvider(DefaultJSONProvider):
+    """
+    Stdlib provider that writes dates and datetimes as ISO 8601 (Flask's default
+    uses HTTP dates), so models can hand out date objects whichever backend runs.
+    """
+
+    sort_keys = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+
+class OrjsonProvider(IsoJSONProvider):
+    """
+    orjson-backed provider: dates, datetimes, UUIDs and dataclasses are encoded
+    natively and responses are built straight from the encoded bytes.
+    Anything orjson can't encode falls back to the stdlib provider's default().
+    """
+
+    def _options(self, kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._options(kwargs)).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options({'indent': indent}))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def provider_class(name):
+    """JSON_PROVIDER setting -> provider class ('auto' picks orjson when installed)."""
+    if name == 'orjson' or (name == 'auto' and orjson is not None):
+        if orjson is None:
+            raise RuntimeError('JSON_PROVIDER=orjson but orjson is not installed')
+        return OrjsonProvider
+    if name in ('auto', 'stdlib'):
+        return IsoJSONProvider
+    raise ValueError(f"Unknown JSON_PROVIDER: {name!r}")
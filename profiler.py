@@ -0,0 +1,206 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import g, request
+
+_PROFILE_ID = re.compile(r'^[0-9a-f]{16}$')
+
+
+def parse_sample_rates(spec):
+    """'get_tasks:100,api_farm_stats:20' -> {'get_tasks': 100, 'api_farm_stats': 20}"""
+    rates = {}
+    for part in (spec or '').split(','):
+        if ':' in part:
+            endpoint, n = part.rsplit(':', 1)
+            if int(n) > 0:
+                rates[endpoint.strip()] = int(n)
+    return rates
+
+
+class _ProfiledBody:
+    """Response iterable that calls finish() once the body is sent (or dropped)."""
+
+    def __init__(self, chunks, finish):
+        self.chunks = chunks
+        self.finish = finish
+
+    def __iter__(self):
+        yield from self.chunks
+
+    def close(self):
+        finish, self.finish = self.finish, None
+        if finish is None:
+            return
+        try:
+            close = getattr(self.chunks, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            finish()
+
+    def __del__(self):
+        self.close()
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile wrapper around single requests.
+
+    A request is profiled when an authorized client sends `X-Profile: 1` (or
+    ?_profile=1), or when its endpoint is sampled 1-in-N via PROFILE_SAMPLE.
+    Each profile is written to PROFILE_DIR as a pstats dump plus a JSON
+    sidecar. Only the newest PROFILE_MAX_FILES are kept.
+
+    One request per process is profiled at a time (on Python 3.12+ cProfile
+    hooks the process-wide sys.monitoring, and a second enabled profiler
+    raises); triggers that arrive meanwhile are skipped and counted. Streamed
+    responses are profiled until their body has been sent, so the rows read
+    and encoded while streaming are included.
+    """
+
+    def __init__(self, app=None, authorize=None):
+        self.directory = None
+        self.max_files = 50
+        self.sample_rates = {}
+        self.authorize = authorize
+        self.skipped = 0
+        self._seen = Counter()
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+        if app is not None:
+            self.init_app(app, authorize)
+
+    def init_app(self, app, authorize):
+        app.config.setdefault('PROFILE_DIR', None)
+        app.config.setdefault('PROFILE_MAX_FILES', 50)
+        app.config.setdefault('PROFILE_SAMPLE', '')
+        self.directory = app.config['PROFILE_DIR'] or os.path.join(app.instance_path, 'profiles')
+        self.max_files = app.config['PROFILE_MAX_FILES']
+        self.sample_rates = parse_sample_rates(app.config['PROFILE_SAMPLE'])
+        self.authorize = authorize
+        app.before_request(self._start)
+        app.after_request(self._stop)
+        app.teardown_request(self._abort)
+        app.extensions['request_profiler'] = self
+
+    def _trigger(self):
+        if request.headers.get('X-Profile') == '1' or request.args.get('_profile') == '1':
+            return 'on-demand' if self.authorize() else None
+        rate = self.sample_rates.get(request.endpoint)
+        if rate:
+            with self._lock:
+                self._seen[request.endpoint] += 1
+                if self._seen[request.endpoint] % rate == 0:
+                    return 'sampled'
+        return None
+
+    def _start(self):
+        trigger = self._trigger()
+        if trigger is None:
+            return
+        if not self._active.acquire(blocking=False):
+            with self._lock:
+                self.skipped += 1
+            return
+        profile = cProfile.Profile()
+        g.request_profile = (profile, trigger, time.perf_counter())
+        profile.enable()
+
+    def _stop(self, response):
+        state = g.pop('request_profile', None)
+        if state is None:
+            return response
+        profile, trigger, started = state
+        meta = {
+            'id': uuid.uuid4().hex[:16],
+            'at': time.time(),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'trigger': trigger,
+            'streamed': response.is_streamed,
+        }
+        response.headers['X-Profile-Id'] = meta['id']
+        if response.is_streamed:
+            # the body is produced while it is sent: keep profiling until it is done
+            response.response = _ProfiledBody(response.response, lambda: self._finish(profile, meta, started))
+        else:
+            self._finish(profile, meta, started)
+        return response
+
+    def _finish(self, profile, meta, started):
+        profile.disable()
+        try:
+            meta['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            self.save(profile, meta)
+        finally:
+            self._active.release()
+
+    def _abort(self, exc=None):
+        # the view raised, so _stop never ran: discard the profile
+        state = g.pop('request_profile', None)
+        if state is not None:
+            state[0].disable()
+            self._active.release()
+
+    # ----- storage -----
+
+    def _path(self, profile_id, ext):
+        if not _PROFILE_ID.match(profile_id or ''):
+            return None
+        return os.path.join(self.directory, f'{profile_id}.{ext}')
+
+    def save(self, profile, meta):
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(self._path(meta['id'], 'prof'))
+        with open(self._path(meta['id'], 'json'), 'w') as f:
+            json.dump(meta, f)
+        self._prune()
+
+    def _prune(self):
+        sidecars = sorted(
+            (os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')),
+            key=os.path.getmtime
+        )
+        for sidecar in sidecars[:-self.max_files] if len(sidecars) > self.max_files else []:
+            for path in (sidecar, sidecar[:-5] + '.prof'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def index(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        entries.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(entries, key=lambda e: e['at'], reverse=True)
+
+    def raw_path(self, profile_id):
+        path = self._path(profile_id, 'prof')
+        return path if path and os.path.exists(path) else None
+
+    def report(self, profile_id, sort='cumulative', limit=40):
+        """Text summary of a stored profile (pstats print_stats), or None if unknown."""
+        path = self.raw_path(profile_id)
+        if path is None:
+            return None
+        out = io.StringIO()
+        stats = pstats.Stats(path, stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
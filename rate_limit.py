@@ -0,0 +1,270 @@
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from flask import current_app, g, jsonify, request, session
+
+from response_cache import RedisBackend, RedisError
+
+# KEYS[1] = bucket; ARGV = capacity, refill per second, cost. Refills by the
+# server's clock so workers on different hosts agree on elapsed time (Redis 5+).
+TOKEN_BUCKET_LUA = """
+local capacity, rate, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(bucket[1]) or capacity
+local at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - at) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+def rate_class(name):
+    """
+    Put a view in its own rate-limit class. It can go anywhere under
+    @app.route: decorators between the two must use functools.wraps, which
+    copies the attribute it sets onto their wrapper.
+    """
+    def decorator(view):
+        view.rate_class = name
+        return view
+    return decorator
+
+
+def parse_limits(spec):
+    """'stats=30/60,write=60/60' -> {'stats': (30, 0.5), ...}: capacity and tokens per second."""
+    limits = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        try:
+            name, rule = item.split('=')
+            count, seconds = rule.split('/')
+            count, seconds = int(count), float(seconds)
+        except ValueError:
+            raise ValueError(f"Bad RATE_LIMITS entry {item.strip()!r}, expected class=requests/seconds")
+        if count <= 0 or seconds <= 0:
+            raise ValueError(f"Bad RATE_LIMITS entry {item.strip()!r}, both numbers must be positive")
+        limits[name.strip()] = (count, count / seconds)
+    return limits
+
+
+class MemoryBuckets:
+    """
+    Token buckets in process: key -> [tokens, last refill], refilled lazily on
+    take(). The least recently used keys are dropped past max_keys; a dropped
+    bucket simply starts full again.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        """(allowed, tokens left) after trying to take `cost` tokens."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            allowed = bucket[0] >= cost
+            if allowed:
+                bucket[0] -= cost
+            return allowed, bucket[0]
+
+    def size(self):
+        return len(self._buckets)
+
+
+class RedisBuckets:
+    """Token buckets shared by every worker, updated atomically by a Lua script."""
+
+    def __init__(self, url):
+        self.client = RedisBackend(url)
+
+    def take(self, key, capacity, rate, cost=1):
+        allowed, tokens = self.client.eval(TOKEN_BUCKET_LUA, [key], [capacity, rate, cost])
+        return bool(allowed), float(tokens)
+
+    def reset(self):
+        self.client.reset()
+
+    def size(self):
+        return None
+
+
+class RateLimiter:
+    """
+    Admission control for /api requests, checked before the view (and before
+    any database access):
+
+    1. Concurrency: with ADMISSION_MAX_IN_FLIGHT set, a worker answers 503 once
+       that many API requests are already running in it.
+    2. Pool headroom: when the busiest connection pool has
+       ADMISSION_POOL_SATURATION of its connections checked out, new requests
+       get 503 at once instead of queueing for DB_POOL_TIMEOUT and failing.
+    3. Rate: each client (the signed-in user, else the remote address) has a
+       token bucket per endpoint class in RATE_LIMITS, e.g. "stats=30/60" for
+       bursts of 30 and 30 requests a minute. An empty bucket answers 429.
+       GET views are "read" and other methods "write" unless @rate_class()
+       names another class; classes missing from RATE_LIMITS are unlimited.
+
+    Buckets live in process (RATE_LIMIT_BACKEND=memory, per worker) or in
+    Redis (=redis, shared by all workers). If Redis fails, requests are let
+    through and counted in `errors`.
+    """
+
+    def __init__(self, app=None, **kwargs):
+        self.limits = {}
+        self.buckets = None
+        self.prefix = 'farm:rate'
+        self.max_in_flight = 0
+        self.pool_saturation = 0.0
+        self.in_flight = 0
+        self.limited = Counter()
+        self.shed = Counter()
+        self.errors = 0
+        self._pools = lambda: ()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, **kwargs)
+
+    def init_app(self, app, pools=None):
+        """pools() lists the connection pools to watch; it runs inside the request."""
+        app.config.setdefault('RATE_LIMITS', '')
+        app.config.setdefault('RATE_LIMIT_BACKEND', 'memory')
+        app.config.setdefault('RATE_LIMIT_URL', 'redis://localhost:6379/0')
+        app.config.setdefault('RATE_LIMIT_MAX_KEYS', 100000)
+        app.config.setdefault('ADMISSION_MAX_IN_FLIGHT', 0)
+        app.config.setdefault('ADMISSION_POOL_SATURATION', 0.9)
+
+        self.limits = parse_limits(app.config['RATE_LIMITS'])
+        kind = app.config['RATE_LIMIT_BACKEND']
+        if kind == 'memory':
+            self.buckets = MemoryBuckets(app.config['RATE_LIMIT_MAX_KEYS'])
+        elif kind == 'redis':
+            self.buckets = RedisBuckets(app.config['RATE_LIMIT_URL'])
+        else:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {kind!r}")
+        self.max_in_flight = app.config['ADMISSION_MAX_IN_FLIGHT']
+        self.pool_saturation = app.config['ADMISSION_POOL_SATURATION']
+        if pools is not None:
+            self._pools = pools
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+        app.extensions['rate_limiter'] = self
+
+    def reset(self):
+        """Drop Redis connections after fork; memory buckets are per-process anyway."""
+        if hasattr(self.buckets, 'reset'):
+            self.buckets.reset()
+
+    # ----- per request -----
+
+    def _admit(self):
+        if not request.path.startswith('/api'):
+            return None
+        with self._lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                self.shed['in_flight'] += 1
+                return self._reject(503, 'Server busy, retry shortly', 1)
+            self.in_flight += 1
+        g.admitted = True
+        if self.pool_saturation and self._busiest_pool() >= self.pool_saturation:
+            self.shed['pool'] += 1
+            return self._reject(503, 'Server busy, retry shortly', 1)
+        return self._check_rate()
+
+    def _release(self, exc=None):
+        if g.pop('admitted', False):
+            with self._lock:
+                self.in_flight -= 1
+
+    def _busiest_pool(self):
+        # TimedQueuePool knows its capacity; other pools (StaticPool, NullPool) are skipped
+        busiest = 0.0
+        for pool in self._pools():
+            saturation = getattr(pool, 'saturation', None)
+            value = saturation() if saturation is not None else None
+            if value is not None and value > busiest:
+                busiest = value
+        return busiest
+
+    def _check_rate(self):
+        name = self.endpoint_class()
+        limit = self.limits.get(name)
+        if limit is None:
+            return None
+        capacity, rate = limit
+        user_id = session.get('user_id')
+        client = f'u{user_id}' if user_id is not None else f'ip{request.remote_addr}'
+        try:
+            allowed, tokens = self.buckets.take(f'{self.prefix}:{name}:{client}', capacity, rate)
+        except (OSError, RedisError):
+            self.errors += 1
+            return None
+        if allowed:
+            return None
+        self.limited[name] += 1
+        response = self._reject(429, f'Too many {name} requests, slow down', (1 - tokens) / rate)
+        response.headers['X-RateLimit-Limit'] = str(capacity)
+        return response
+
+    def endpoint_class(self):
+        view = current_app.view_functions.get(request.endpoint)
+        name = getattr(view, 'rate_class', None)
+        if name is not None:
+            return name
+        return 'read' if request.method in ('GET', 'HEAD') else 'write'
+
+    def _reject(self, status, message, retry_after):
+        response = jsonify({'error': message})
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    # ----- reporting -----
+
+    def stats(self):
+        return {
+            'backend': type(self.buckets).__name__ if self.buckets else None,
+            'limits': {name: {'burst': capacity, 'per_second': round(rate, 4)}
+                       for name, (capacity, rate) in self.limits.items()},
+            'in_flight': self.in_flight,
+            'limited': dict(self.limited),
+            'shed': dict(self.shed),
+            'errors': self.errors,
+            'buckets': self.buckets.size() if self.buckets else 0,
+        }
+
+    def render_metrics(self):
+        lines = [
+            '# HELP farm_requests_in_flight API requests currently running in this worker.',
+            '# TYPE farm_requests_in_flight gauge',
+            f'farm_requests_in_flight {self.in_flight}',
+            '# HELP farm_rate_limited_total API requests answered 429 by endpoint class.',
+            '# TYPE farm_rate_limited_total counter',
+        ]
+        for name, n in sorted(self.limited.items()):
+            lines.append(f'farm_rate_limited_total{{class="{name}"}} {n}')
+        lines.append('# HELP farm_requests_shed_total API requests answered 503 before reaching the database.')
+        lines.append('# TYPE farm_requests_shed_total counter')
+        for reason, n in sorted(self.shed.items()):
+            lines.append(f'farm_requests_shed_total{{reason="{reason}"}} {n}')
+        return lines
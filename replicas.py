@@ -0,0 +1,216 @@
+import itertools
+import os
+import threading
+import time
+from functools import partial, wraps
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, request, session
+from sqlalchemy.exc import DBAPIError
+
+
+def read_only(view):
+    """
+    Mark a view as safe to serve from a read replica (put it right under
+    @app.route). If the replica fails while the view runs, the view is run
+    again on the primary.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            response = view(*args, **kwargs)
+        except Exception:
+            if not g.pop('replica_failed', False):
+                raise
+        else:
+            # the views turn errors into 500 responses themselves; the flag tells
+            if not g.pop('replica_failed', False):
+                return response
+        current_app.extensions['replica_router'].retry_on_primary()
+        return view(*args, **kwargs)
+    wrapper.read_only = True
+    return wrapper
+
+
+def replication_lag(conn):
+    """Seconds the replica behind `conn` trails its source (inf if replication is stopped)."""
+    if conn.dialect.name != 'mysql':
+        return 0.0
+    for statement in ('SHOW REPLICA STATUS', 'SHOW SLAVE STATUS'):  # MySQL 8.0.22+ / older
+        try:
+            row = conn.exec_driver_sql(statement).mappings().first()
+        except DBAPIError:
+            continue
+        if row is None:
+            return 0.0  # not replicating, e.g. a read-only copy
+        lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+        return float('inf') if lag is None else float(lag)
+    return 0.0  # no privilege to ask; the ping still has to pass
+
+
+class Replica:
+    def __init__(self, name):
+        self.name = name
+        self.healthy = True
+        self.lag = 0.0
+        self.error = None
+        self.checked_at = 0.0
+        self.reads = 0
+        self.lock = threading.Lock()
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of @read_only views to the replicas in REPLICA_DATABASE_URLS;
+    every other request, and every write, uses the primary.
+
+    Read-your-writes: a successful non-GET API request marks the client's
+    session for REPLICA_STICKY_SECONDS, and its reads stay on the primary
+    meanwhile. The mark travels in the session cookie, so it holds whichever
+    worker serves the next request.
+
+    Lag and failures: a background thread pings each replica (and on MySQL
+    asks for its lag) every REPLICA_CHECK_INTERVAL seconds, so requests never
+    wait on a check. A replica that fails, lags more than REPLICA_MAX_LAG
+    seconds, or drops a connection is skipped until its next good check; a
+    read-only request that hit the failure is run again on the primary. With
+    no replica left, reads fall back to the primary.
+    """
+
+    def __init__(self, app=None, **kwargs):
+        self.replicas = []
+        self.fallbacks = 0
+        self.sticky_reads = 0
+        self.retries = 0
+        self._engines = {}
+        self._next = itertools.count()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app, **kwargs)
+
+    def init_app(self, app, db, engine_options):
+        """Call before db.init_app(): the replicas are added to SQLALCHEMY_BINDS."""
+        app.config.setdefault('REPLICA_DATABASE_URLS', '')
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+        app.config.setdefault('REPLICA_MAX_LAG', 5)
+        app.config.setdefault('REPLICA_CHECK_INTERVAL', 5)
+        urls = [url.strip() for url in app.config['REPLICA_DATABASE_URLS'].split(',') if url.strip()]
+        self.db = db
+        self.sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+        self.max_lag = app.config['REPLICA_MAX_LAG']
+        self.check_interval = app.config['REPLICA_CHECK_INTERVAL']
+        self.replicas = [Replica(f'replica{i}') for i in range(len(urls))]
+        if self.replicas:
+            binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+            for replica, url in zip(self.replicas, urls):
+                binds[replica.name] = dict(engine_options(url), url=url)
+            app.before_request(self._choose_replica)
+            app.after_request(self._stick_after_write)
+        app.extensions['replica_router'] = self
+
+    @property
+    def enabled(self):
+        return bool(self.replicas)
+
+    def engines(self):
+        return {replica.name: self.db.engines[replica.name] for replica in self.replicas}
+
+    def watch_engines(self):
+        """Take a replica out of rotation as soon as one of its connections fails (needs app context)."""
+        self._engines = self.engines()  # for the health thread, which runs without an app context
+        for replica in self.replicas:
+            sa.event.listen(self._engines[replica.name], 'handle_error', partial(self._on_error, replica))
+
+    # ----- per request -----
+
+    def _choose_replica(self):
+        view = current_app.view_functions.get(request.endpoint)
+        if request.method not in ('GET', 'HEAD') or not getattr(view, 'read_only', False):
+            return
+        if session.get('_primary_until', 0) > time.time():
+            self.sticky_reads += 1
+            return
+        g.replica = self.pick()
+
+    def _stick_after_write(self, response):
+        if (request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400
+                and request.path.startswith('/api')):
+            session['_primary_until'] = time.time() + self.sticky_seconds
+        return response
+
+    def route(self, mapper, clause):
+        """Replica engine for a SELECT in a read-only request, None for anything else."""
+        replica = g.get('replica') if has_request_context() else None
+        if replica is None or clause is None or not getattr(clause, 'is_select', False):
+            return None
+        replica.reads += 1
+        return self.db.engines[replica.name]
+
+    def retry_on_primary(self):
+        """Drop the failed replica's transaction and route the rest of the request to the primary."""
+        self.db.session.rollback()
+        g.replica = None
+        self.retries += 1
+
+    # ----- health -----
+
+    def pick(self):
+        """A healthy replica (round robin), or None to read from the primary."""
+        self._start()
+        candidates = [replica for replica in self.replicas if replica.healthy]
+        if not candidates:
+            self.fallbacks += 1
+            return None
+        return candidates[next(self._next) % len(candidates)]
+
+    def _start(self):
+        # lazily, and again in a forked worker where the thread is gone
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='replica-health', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for replica in self.replicas:
+                self._check(replica)
+            self._stop.wait(self.check_interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def _check(self, replica):
+        if not replica.lock.acquire(blocking=False):
+            return  # another thread is checking it; use the last result
+        try:
+            with self._engines[replica.name].connect() as conn:
+                conn.exec_driver_sql('SELECT 1')
+                replica.lag = replication_lag(conn)
+            replica.healthy = replica.lag <= self.max_lag
+            replica.error = None if replica.healthy else f"lag {replica.lag}s > {self.max_lag}s"
+        except Exception as e:
+            replica.healthy, replica.error = False, str(e)
+        finally:
+            replica.checked_at = time.monotonic()
+            replica.lock.release()
+
+    def _on_error(self, replica, context):
+        # disconnects, failed connects and server-side errors; not bad SQL or constraint violations
+        if context.is_disconnect or context.connection is None or isinstance(
+                context.sqlalchemy_exception, (sa.exc.OperationalError, sa.exc.InterfaceError)):
+            replica.healthy, replica.error = False, str(context.original_exception)
+            replica.checked_at = time.monotonic()
+            if has_request_context() and g.get('replica') is replica:
+                g.replica_failed = True  # read_only() runs the view again on the primary
+
+    def status(self):
+        return [{'name': r.name, 'healthy': r.healthy, 'lag_s': r.lag, 'error': r.error, 'reads': r.reads}
+                for r in self.replicas]
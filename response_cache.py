@@ -0,0 +1,281 @@
+import hashlib
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from urllib.parse import urlparse
+
+from flask import Response, session
+
+
+class MemoryBackend:
+    """In-process LRU store with a per-entry TTL."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def size(self):
+        return len(self._data)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend:
+    """
+    Minimal Redis-protocol (RESP) client: GET, SET .. PX, DEL, EVAL.
+    Works against Redis or any server speaking the same protocol; eviction is
+    left to the server's maxmemory policy. One socket per thread.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', timeout=0.5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        if self.password:
+            self._command('AUTH', self.password)
+        if self.db:
+            self._command('SELECT', self.db)
+
+    def reset(self):
+        # forget (without closing) sockets inherited from a parent process
+        self._local = threading.local()
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _command(self, *args):
+        if getattr(self._local, 'sock', None) is None:
+            self._connect()
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        try:
+            self._local.sock.sendall(b''.join(parts))
+            return self._read_reply()
+        except OSError:
+            self._close()
+            raise
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError('connection closed by server')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload
+        if kind == b'-':
+            raise RedisError(payload.decode(errors='replace'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            count = int(payload)
+            return None if count < 0 else [self._read_reply() for _ in range(count)]
+        raise RedisError(f'unexpected reply {line!r}')
+
+    def get(self, key):
+        return self._command('GET', key)
+
+    def set(self, key, value, ttl):
+        self._command('SET', key, value, 'PX', max(int(ttl * 1000), 1))
+
+    def delete(self, *keys):
+        if keys:
+            self._command('DEL', *keys)
+
+    def eval(self, script, keys, args):
+        """Run a Lua script server-side (EVALSHA; EVAL when the server has not cached it yet)."""
+        sha = hashlib.sha1(script.encode()).hexdigest()
+        try:
+            return self._command('EVALSHA', sha, len(keys), *keys, *args)
+        except RedisError as e:
+            if not str(e).startswith('NOSCRIPT'):
+                raise
+            return self._command('EVAL', script, len(keys), *keys, *args)
+
+    def size(self):
+        return None
+
+
+# Versions outlive any entry; if one expires anyway the next lookup is just a miss
+VERSION_TTL = 86400
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class ResponseCache:
+    """
+    Per-user read-through cache for JSON endpoints.
+
+    Views decorated with @cached(name) are keyed by (user, name, version,
+    today) so date-dependent stats never outlive the day they were computed
+    for. Write endpoints call invalidate(user_id, *names) after committing,
+    which gives (user, name) a new version. The version lives in the backend
+    next to the entries, so with the redis backend a write seen by one worker
+    invalidates the entry for all of them. The memory backend is per process:
+    under several workers the others keep serving their copy for up to
+    RESPONSE_CACHE_TTL seconds.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 60
+        self.prefix = 'farm:resp'
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memory')
+        app.config.setdefault('RESPONSE_CACHE_URL', 'redis://localhost:6379/0')
+        app.config.setdefault('RESPONSE_CACHE_TTL', 60)
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 10000)
+
+        kind = app.config['RESPONSE_CACHE_BACKEND']
+        if kind == 'memory':
+            self.backend = MemoryBackend(app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+        elif kind == 'redis':
+            self.backend = RedisBackend(app.config['RESPONSE_CACHE_URL'])
+        elif kind in ('none', '', None):
+            self.backend = None
+        else:
+            raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {kind!r}")
+        self.ttl = app.config['RESPONSE_CACHE_TTL']
+        app.extensions['response_cache'] = self
+
+    def reset(self):
+        """Drop backend connections after fork; the memory backend is per-process anyway."""
+        if hasattr(self.backend, 'reset'):
+            self.backend.reset()
+
+    def key(self, user_id, name, version):
+        return f"{self.prefix}:{user_id}:{name}:{version}:{date.today().isoformat()}"
+
+    def version_key(self, user_id, name):
+        return f"{self.prefix}:{user_id}:{name}:version"
+
+    def _new_version(self, user_id, name):
+        version = os.urandom(6).hex()
+        self.backend.set(self.version_key(user_id, name), version, VERSION_TTL)
+        return version
+
+    def cached(self, name):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+                user_id = session.get('user_id', 1)
+                key = body = None
+                try:
+                    version = self.backend.get(self.version_key(user_id, name))
+                    if version is None:
+                        key = self.key(user_id, name, self._new_version(user_id, name))  # nothing cached under it yet
+                    else:
+                        key = self.key(user_id, name, _text(version))
+                        body = self.backend.get(key)
+                except (OSError, RedisError):
+                    self.errors += 1
+                if body is not None:
+                    self.hits += 1
+                    response = Response(body, mimetype='application/json')
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self.misses += 1
+                response = view(*args, **kwargs)
+                if isinstance(response, Response) and response.status_code == 200:
+                    # stored under the version read above: if a write invalidated it
+                    # while we were computing, nobody looks this entry up again
+                    if key is not None:
+                        try:
+                            self.backend.set(key, response.get_data(), self.ttl)
+                        except (OSError, RedisError):
+                            self.errors += 1
+                    response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, user_id, *names):
+        if self.backend is None:
+            return
+        try:
+            for name in names:
+                self._new_version(user_id, name)  # old entries are unreachable and expire
+        except (OSError, RedisError):
+            self.errors += 1
+        self.invalidations += len(names)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'errors': self.errors,
+            'evictions': getattr(self.backend, 'evictions', None),
+            'entries': self.backend.size() if self.backend else 0,
+        }
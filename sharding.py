@@ -0,0 +1,225 @@
+import bisect
+import hashlib
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, jsonify, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql.util import find_tables
+
+# shard chosen explicitly (CLI commands, the rebalancer); wins over the request's user
+_pinned_shard = ContextVar('pinned_shard', default=None)
+
+
+class ShardMoving(Exception):
+    """The user's rows are being moved between shards; the request should be retried."""
+
+
+class HashRing:
+    """Consistent hashing: adding a shard re-places only about 1/N of the users."""
+
+    def __init__(self, names, vnodes=64):
+        self._points = sorted((self._hash(f'{name}#{i}'), name) for name in names for i in range(vnodes))
+        self._keys = [point for point, _ in self._points]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def lookup(self, key):
+        i = bisect.bisect(self._keys, self._hash(str(key))) % len(self._keys)
+        return self._points[i][1]
+
+
+class RoutingSession(Session):
+    """
+    db.session that picks an engine per statement: per-user tables go to the
+    current user's shard (ShardRouter), reads of read-only views to a replica
+    (replicas.ReplicaRouter), everything else to the default database.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            for name in ('shard_router', 'replica_router'):
+                router = current_app.extensions.get(name)
+                engine = router.route(mapper, clause) if router is not None and router.enabled else None
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _expose_statement(orm_execute_state):
+    # ORM statements without a single subject (e.g. union()) reach get_bind() with neither
+    # mapper nor clause; hand over the statement so its tables can be inspected
+    orm_execute_state.bind_arguments.setdefault('clause', orm_execute_state.statement)
+
+
+class ShardRouter:
+    """
+    Spreads users over the databases in SHARD_DATABASE_URLS.
+
+    Tables keyed by user are "sharded": every statement on them goes to the
+    shard of the current user (the session's user in a request, or the one
+    pinned with use_user()/use_shard()). Everything else, including the users
+    table and the directory itself, stays on the default database.
+
+    The directory (user -> shard) is the source of truth. A user without an
+    entry is placed by consistent hashing on first use and the choice is
+    recorded, so adding a shard never moves anyone implicitly; moves are
+    explicit (see move_user in app_fixed). Entries are cached per process for
+    SHARD_DIRECTORY_TTL seconds; a move flags the user first and waits one TTL
+    so every worker answers 503 for that user instead of writing to the old shard.
+    """
+
+    def __init__(self, app=None, **kwargs):
+        self.shards = []
+        self.tables = frozenset()
+        self.ttl = 5
+        self._cache = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, **kwargs)
+
+    def init_app(self, app, db, directory, tables, engine_options):
+        """Call before db.init_app(): the shards are added to SQLALCHEMY_BINDS."""
+        app.config.setdefault('SHARD_DATABASE_URLS', '')
+        app.config.setdefault('SHARD_VNODES', 64)
+        app.config.setdefault('SHARD_DIRECTORY_TTL', 5)
+        urls = [url.strip() for url in app.config['SHARD_DATABASE_URLS'].split(',') if url.strip()]
+        self.db = db
+        self.directory = directory
+        self.tables = frozenset(tables)
+        self.ttl = app.config['SHARD_DIRECTORY_TTL']
+        # names follow list position: append new shards, never reorder
+        self.shards = [f'shard{i}' for i in range(len(urls))]
+        if self.shards:
+            binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+            for name, url in zip(self.shards, urls):
+                binds[name] = dict(engine_options(url), url=url)
+            self.ring = HashRing(self.shards, app.config['SHARD_VNODES'])
+            if not sa.event.contains(RoutingSession, 'do_orm_execute', _expose_statement):
+                sa.event.listen(RoutingSession, 'do_orm_execute', _expose_statement)
+            app.before_request(self._resolve_request_shard)
+            app.register_error_handler(ShardMoving, self._moving)
+        app.extensions['shard_router'] = self
+
+    @property
+    def enabled(self):
+        return bool(self.shards)
+
+    def engines(self):
+        return {name: self.db.engines[name] for name in self.shards}
+
+    # ----- routing -----
+
+    def route(self, mapper, clause):
+        """Engine for a statement on sharded tables, None for anything else."""
+        if clause is not None:
+            names = {t.name for t in find_tables(clause, include_crud=True)}
+        elif mapper is not None:
+            names = {sa.inspect(mapper).local_table.name}
+        else:
+            return None
+        if not names & self.tables:
+            return None
+        if names - self.tables:
+            raise sa.exc.InvalidRequestError(
+                f"Statement mixes sharded and global tables: {', '.join(sorted(names))}")
+        return self.db.engines[self.current_shard()]
+
+    def current_shard(self):
+        shard = _pinned_shard.get()
+        if shard is not None:
+            return shard
+        if has_request_context():
+            if 'shard' not in g:
+                g.shard = self.shard_for(session.get('user_id', 1))
+            return g.shard
+        raise RuntimeError('No user to route by; wrap the code in shard_router.use_user(user_id)')
+
+    def _resolve_request_shard(self):
+        # fail fast with 503 for users being moved, before a view catches the error
+        if request.path.startswith('/api'):
+            self.current_shard()
+
+    def _moving(self, e):
+        response = jsonify({'error': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(max(1, int(self.ttl)))
+        return response
+
+    @contextmanager
+    def use_shard(self, name):
+        token = _pinned_shard.set(name)
+        try:
+            yield name
+        finally:
+            _pinned_shard.reset(token)
+
+    def use_user(self, user_id):
+        """Route sharded tables to `user_id`'s shard (no-op without shards)."""
+        if not self.shards:
+            return nullcontext()
+        return self.use_shard(self.shard_for(user_id, allow_moving=True))
+
+    # ----- directory -----
+
+    def shard_for(self, user_id, allow_moving=False):
+        now = time.monotonic()
+        entry = self._cache.get(user_id)
+        if entry is None or entry[2] < now:
+            shard, moving = self._lookup(user_id)
+            entry = (shard, moving, now + self.ttl)
+            with self._lock:
+                if len(self._cache) > 100000:
+                    self._cache.clear()
+                self._cache[user_id] = entry
+        shard, moving, _ = entry
+        if moving and not allow_moving:
+            raise ShardMoving(f"User {user_id} is being moved to another shard, retry shortly")
+        return shard
+
+    def _lookup(self, user_id):
+        table = self.directory
+        with self.db.engine.connect() as conn:
+            row = conn.execute(sa.select(table.c.shard, table.c.moving).where(table.c.user_id == user_id)).first()
+            if row is None:
+                shard = self.ring.lookup(user_id)
+                try:
+                    conn.execute(sa.insert(table).values(user_id=user_id, shard=shard, moving=False))
+                    conn.commit()
+                except IntegrityError:
+                    # placed by another worker meanwhile; theirs wins
+                    conn.rollback()
+                    row = conn.execute(sa.select(table.c.shard, table.c.moving).where(table.c.user_id == user_id)).first()
+                else:
+                    return shard, False
+        if row.shard not in self.shards:
+            raise RuntimeError(f"User {user_id} is on unknown shard {row.shard!r}")
+        return row.shard, bool(row.moving)
+
+    def set_directory(self, user_id, shard, moving):
+        table = self.directory
+        with self.db.engine.begin() as conn:
+            updated = conn.execute(sa.update(table).where(table.c.user_id == user_id).values(shard=shard, moving=moving))
+            if not updated.rowcount:
+                conn.execute(sa.insert(table).values(user_id=user_id, shard=shard, moving=moving))
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+    def placements(self):
+        """(user_id, current shard, shard the hash ring would pick) for every directory entry."""
+        table = self.directory
+        with self.db.engine.connect() as conn:
+            rows = conn.execute(sa.select(table.c.user_id, table.c.shard).order_by(table.c.user_id)).all()
+        return [(user_id, shard, self.ring.lookup(user_id)) for user_id, shard in rows]
+
+    def create_all(self):
+        """Create the sharded tables on every shard."""
+        tables = [t for t in self.db.metadata.sorted_tables if t.name in self.tables]
+        for engine in self.engines().values():
+            self.db.metadata.create_all(engine, tables=tables)
@@ -0,0 +1,142 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import has_request_context, request
+
+from sql_metrics import normalize_sql
+
+
+class SlowQueryLog:
+    """
+    Ring buffer of statements slower than SLOW_QUERY_MS.
+
+    Each entry keeps the normalized shape, raw statement, duration and the
+    route that issued it; the bound parameters (emails, journal text, ...) only
+    with SLOW_QUERY_PARAMETERS. The first time a slow SELECT shape is seen
+    its EXPLAIN is queued to a background thread, which checks out its own
+    connection, runs it and caches the plan per shape; the request that ran
+    the slow query never waits for it (nor for a free pooled connection).
+    """
+
+    def __init__(self, app=None, tracker=None, engine=None):
+        self.threshold = 0.2
+        self.entries = deque(maxlen=200)
+        self.plans = OrderedDict()
+        self.max_plans = 500
+        self.keep_parameters = False
+        self.engine = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = None
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app, tracker, engine)
+
+    def init_app(self, app, tracker, engine):
+        app.config.setdefault('SLOW_QUERY_MS', 200)
+        app.config.setdefault('SLOW_QUERY_BUFFER', 200)
+        app.config.setdefault('SLOW_QUERY_EXPLAIN', True)
+        app.config.setdefault('SLOW_QUERY_PARAMETERS', False)
+        self.threshold = app.config['SLOW_QUERY_MS'] / 1000
+        self.entries = deque(maxlen=app.config['SLOW_QUERY_BUFFER'])
+        self.explain_enabled = app.config['SLOW_QUERY_EXPLAIN']
+        self.keep_parameters = app.config['SLOW_QUERY_PARAMETERS']
+        self.engine = engine
+        self.logger = app.logger
+        tracker.add_listener(self.observe)
+        app.extensions['slow_query_log'] = self
+
+    def observe(self, statement, parameters, duration, conn):
+        if duration < self.threshold or getattr(self._local, 'explaining', False):
+            return
+        shape = normalize_sql(statement)
+        route = None
+        if has_request_context():
+            route = f"{request.method} {request.path} ({request.endpoint})"
+        entry = {
+            'at': time.time(),
+            'duration_ms': round(duration * 1000, 2),
+            'shape': shape,
+            'statement': statement,
+            'parameters': repr(parameters)[:500] if self.keep_parameters else None,
+            'route': route,
+        }
+        with self._lock:
+            self.entries.append(entry)
+        self.logger.warning('Slow query (%.1f ms) in %s: %s', entry['duration_ms'], route, shape[:300])
+
+        if self.explain_enabled and shape.lstrip('( ').upper().startswith('SELECT'):
+            with self._lock:
+                if shape in self.plans:
+                    return
+                self.plans[shape] = {'pending': True}  # one EXPLAIN per shape, however many hits
+                while len(self.plans) > self.max_plans:
+                    self.plans.popitem(last=False)
+            self._start()
+            try:
+                # on the engine the statement ran on (shards have their own)
+                self._pending.put_nowait((shape, statement, parameters, conn.engine))
+            except queue.Full:
+                with self._lock:
+                    self.plans.pop(shape, None)  # try again next time it is slow
+
+    def _start(self):
+        # lazily, and again in a forked worker where the thread is gone
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pending = queue.Queue(100)
+            self._thread = threading.Thread(target=self._run, args=(self._pending,), name='slow-query-explain', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, pending):
+        while True:
+            job = pending.get()
+            if job is None:
+                return
+            shape, statement, parameters, engine = job
+            plan = self.explain(statement, parameters, engine)
+            with self._lock:
+                if shape in self.plans:
+                    self.plans[shape] = plan
+
+    def stop(self):
+        if self._thread is not None and self._pid == os.getpid():
+            self._pending.put(None)
+
+    def explain(self, statement, parameters, engine=None):
+        """EXPLAIN the statement with its original parameters; returns rows as lists of strings."""
+        engine = engine or self.engine
+        prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+        self._local.explaining = True
+        try:
+            with engine.connect() as conn:
+                result = conn.exec_driver_sql(prefix + statement, parameters)
+                columns = list(result.keys())
+                rows = [[str(v) for v in row] for row in result]
+            return {'columns': columns, 'rows': rows}
+        except Exception as e:
+            return {'error': str(e)}
+        finally:
+            self._local.explaining = False
+
+    def snapshot(self, limit=None):
+        with self._lock:
+            entries = list(self.entries)[::-1]
+        if limit:
+            entries = entries[:limit]
+        with self._lock:
+            plans = dict(self.plans)
+        return [dict(e, plan=plans.get(e['shape'])) for e in entries]
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.plans.clear()
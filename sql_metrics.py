@@ -0,0 +1,165 @@
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Buckets for the per-endpoint histograms
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_PARAMS = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+")
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_sql(statement):
+    """Statement shape: literals and IN-lists collapsed to '?', whitespace squeezed."""
+    shape = _LITERALS.sub('?', statement)
+    shape = _PARAMS.sub('?', shape)
+    shape = _IN_LISTS.sub('IN (?)', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+def metric_lines(name, help_text, kind, value):
+    """HELP/TYPE/sample lines for one unlabelled gauge or counter."""
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+
+
+class Histogram:
+    """Labelled cumulative histogram in Prometheus exposition format."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self, label_name='endpoint'):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label, series in sorted(self._series.items()):
+                for bound, n in zip(self.buckets, series['counts']):
+                    lines.append(f'{self.name}_bucket{{{label_name}="{label}",le="{bound}"}} {n}')
+                lines.append(f'{self.name}_bucket{{{label_name}="{label}",le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{label_name}="{label}"}} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{{{label_name}="{label}"}} {series["count"]}')
+        return lines
+
+
+class QueryTracker:
+    """
+    Per-request SQL accounting built on engine cursor events.
+
+    Every statement executed while handling a request is counted and timed and
+    its normalized shape tallied. When one shape repeats `n_plus_one_threshold`
+    times in a request it is logged as a likely N+1. Per-endpoint histograms
+    are rendered for Prometheus by render_metrics().
+    """
+
+    def __init__(self, app=None, engine=None):
+        self.n_plus_one_threshold = 5
+        self.request_duration = Histogram(
+            'farm_http_request_duration_seconds', 'Request latency by endpoint.', DURATION_BUCKETS)
+        self.db_time = Histogram(
+            'farm_db_time_per_request_seconds', 'Total time spent in SQL per request.', DURATION_BUCKETS)
+        self.query_count = Histogram(
+            'farm_db_queries_per_request', 'SQL statements issued per request.', QUERY_COUNT_BUCKETS)
+        self.n_plus_one = Counter()
+        self._listeners = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, engine)
+
+    def init_app(self, app, engine):
+        app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 5)
+        self.n_plus_one_threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+        self.logger = app.logger
+        self.instrument(engine)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions['query_tracker'] = self
+
+    def instrument(self, engine):
+        if not event.contains(engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def add_listener(self, fn):
+        """Call fn(statement, parameters, duration, conn) after every statement."""
+        self._listeners.append(fn)
+
+    # ----- engine events -----
+
+    # the start time rides on the statement's execution context, so a statement
+    # that raises (no after_cursor_execute) leaves nothing behind on the connection
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._query_start
+        if has_request_context():
+            stats = g.get('sql_stats')
+            if stats is not None:
+                stats['count'] += 1
+                stats['time'] += duration
+                stats['shapes'][normalize_sql(statement)] += 1
+        for fn in self._listeners:
+            fn(statement, parameters, duration, conn)
+
+    # ----- request hooks -----
+
+    def _start_request(self):
+        g.sql_stats = {'count': 0, 'time': 0.0, 'shapes': Counter(), 'started': time.perf_counter()}
+
+    def _finish_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        self.request_duration.observe(endpoint, time.perf_counter() - stats['started'])
+        self.db_time.observe(endpoint, stats['time'])
+        self.query_count.observe(endpoint, stats['count'])
+
+        shape, repeats = stats['shapes'].most_common(1)[0] if stats['shapes'] else (None, 0)
+        if repeats >= self.n_plus_one_threshold:
+            with self._lock:
+                self.n_plus_one[endpoint] += 1
+            self.logger.warning(
+                'Possible N+1 in %s: %d of %d queries share one shape: %s',
+                endpoint, repeats, stats['count'], shape[:300]
+            )
+
+        response.headers['X-DB-Queries'] = str(stats['count'])
+        response.headers['X-DB-Time-ms'] = f"{stats['time'] * 1000:.2f}"
+        return response
+
+    # ----- exposition -----
+
+    def render_metrics(self, extra_lines=()):
+        lines = []
+        for hist in (self.request_duration, self.query_count, self.db_time):
+            lines.extend(hist.render())
+        lines.append('# HELP farm_n_plus_one_suspected_total Requests flagged as likely N+1 query patterns.')
+        lines.append('# TYPE farm_n_plus_one_suspected_total counter')
+        with self._lock:
+            for endpoint, n in sorted(self.n_plus_one.items()):
+                lines.append(f'farm_n_plus_one_suspected_total{{endpoint="{endpoint}"}} {n}')
+        lines.extend(extra_lines)
+        return '\n'.join(lines) + '\n'
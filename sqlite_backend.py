@@ -0,0 +1,37 @@
+from sqlalchemy import event
+
+
+def is_memory_url(url):
+    url = str(url)
+    return url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') in ('sqlite:', 'sqlite+pysqlite:'))
+
+
+def apply_pragmas(dbapi_conn, connection_record=None):
+    """
+    Per-connection tuning for the embedded backend:
+    WAL lets readers run alongside the single writer, synchronous=NORMAL
+    only fsyncs at checkpoints (safe with WAL), and busy_timeout makes
+    writers wait for the lock instead of failing with 'database is locked'.
+    """
+    import config
+
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute('PRAGMA journal_mode=WAL')
+        cur.execute(f'PRAGMA synchronous={config.DB_SQLITE_SYNCHRONOUS}')
+        cur.execute(f'PRAGMA busy_timeout={int(config.DB_SQLITE_BUSY_TIMEOUT * 1000)}')
+        cur.execute(f'PRAGMA cache_size=-{int(config.DB_SQLITE_CACHE_KB)}')
+        cur.execute(f'PRAGMA mmap_size={int(config.DB_SQLITE_MMAP_BYTES)}')
+        cur.execute('PRAGMA temp_store=MEMORY')
+        cur.execute('PRAGMA foreign_keys=ON')
+    finally:
+        cur.close()
+
+
+def install(engine):
+    """Register the pragmas on `engine` if it is SQLite; does nothing for other backends."""
+    if engine.dialect.name != 'sqlite':
+        return False
+    if not event.contains(engine, 'connect', apply_pragmas):
+        event.listen(engine, 'connect', apply_pragmas)
+    return True
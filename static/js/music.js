@@ -1,5 +1,7 @@
 ﻿(function(){
-    const AUDIO_SRC = '/static/audio/stardew_theme.mp3';
+    // fingerprinted URL from the page's script tag when available (long-lived cache)
+    const currentScript = document.currentScript;
+    const AUDIO_SRC = (currentScript && currentScript.dataset.audioSrc) || '/static/audio/stardew_theme.mp3';
     let audio = null;
     let playing = false;
 
@@ -6,7 +6,8 @@ const TASK_API = {
     updateTask: (id) => `/api/tasks/${id}`,
     deleteTask: (id) => `/api/tasks/${id}`,
     toggleTask: (id) => `/api/tasks/${id}/toggle`,
-    getTaskStats: '/api/tasks/stats'
+    getTaskStats: '/api/tasks/stats',
+    importData: '/api/import'
 };
 
 // Task categories with icons
@@ -1052,19 +1053,29 @@ function importTasks(file) {
                 return;
             }
             
-            // Import each task
+            // Import all tasks in one request, in the server's export format
+            const lines = [JSON.stringify({ table: 'export', row: { version: 1 } })];
             for (const task of tasks) {
-                await fetch(TASK_API.createTask, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({
-                        name: task.name || 'Imported Task',
-                        description: task.description || '',
-                        date: task.date || new Date().toISOString().split('T')[0]
-                    })
-                });
+                lines.push(JSON.stringify({
+                    table: 'tasks',
+                    row: {
+                        task_name: task.name || task.task_name || 'Imported Task',
+                        priority: task.priority || 'Medium',
+                        due_date: task.date || task.due_date || new Date().toISOString().split('T')[0],
+                        is_completed: !!(task.completed || task.is_completed)
+                    }
+                }));
+            }
+            const response = await fetch(TASK_API.importData, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/x-ndjson',
+                },
+                body: lines.join('\n') + '\n'
+            });
+            const result = await response.json();
+            if (!result.success) {
+                throw new Error(result.error || 'Import failed');
             }
             
             // Reload tasks
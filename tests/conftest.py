@@ -0,0 +1,49 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def make_app():
+    """
+    make_app(**config) -> a freshly imported app_fixed with create_app(config)
+    applied and its tables created. create_app() runs once per module object, so
+    the module is re-imported for every app (each gets its own db and extensions).
+    """
+    loaded = []
+
+    def make(**overrides):
+        sys.modules.pop('app_fixed', None)
+        module = importlib.import_module('app_fixed')
+        overrides.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///:memory:')
+        overrides.setdefault('TESTING', True)
+        module.create_app(overrides)
+        with module.app.app_context():
+            module.db.create_all(bind_key=None)  # replicas get their data by copying
+            module.shard_router.create_all()
+        loaded.append(module)
+        return module
+
+    yield make
+    for module in loaded:
+        module.shutdown_app()
+    sys.modules.pop('app_fixed', None)
+
+
+def add_user(module, user_id, name='Farmer'):
+    with module.app.app_context():
+        module.db.session.add(module.User(
+            user_id=user_id, name=name, email=f'user{user_id}@example.com', password_hash='x'))
+        module.db.session.commit()
+
+
+def login(module, user_id):
+    client = module.app.test_client()
+    with client.session_transaction() as s:
+        s['user_id'] = user_id
+    return client
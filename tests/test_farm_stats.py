@@ -0,0 +1,94 @@
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import add_user, login
+
+
+def seed(m, user_id, days, habits, tasks, entries):
+    today = date.today()
+    with m.app.app_context():
+        session = m.db.session
+        session.add_all(m.Mood(user_id=user_id, mood='happy', energy_level=3, log_date=today - timedelta(days=d))
+                        for d in range(days))
+        habit_rows = [m.Habit(user_id=user_id, habit_name=f'habit {i}') for i in range(habits)]
+        session.add_all(habit_rows)
+        session.flush()
+        session.add_all(m.HabitLog(habit_id=h.habit_id, completed=True, log_date=today - timedelta(days=d))
+                        for h in habit_rows for d in range(days))
+        session.add_all(m.Task(user_id=user_id, task_name=f'task {i}', due_date=today, is_completed=i % 2 == 0)
+                        for i in range(tasks))
+        session.add_all(m.Journal(user_id=user_id, content='Dear diary', entry_date=today - timedelta(days=i))
+                        for i in range(entries))
+        session.commit()
+        m.rebuild_daily_summary(user_id)  # the counts come from daily_summary
+
+
+@pytest.mark.parametrize('days, habits, tasks, entries', [(2, 1, 2, 1), (365, 20, 300, 200)])
+def test_farm_stats_query_count_is_fixed(make_app, days, habits, tasks, entries):
+    m = make_app(RESPONSE_CACHE_BACKEND='none')
+    add_user(m, 1)
+    seed(m, 1, days, habits, tasks, entries)
+
+    response = login(m, 1).get('/api/farm/stats')
+
+    assert response.status_code == 200
+    assert response.headers['X-DB-Queries'] == '3'
+    stats = response.get_json()['stats']
+    assert stats['total_moods'] == days
+    assert stats['total_habits'] == habits
+    assert stats['completed_habits_today'] == habits
+    assert (stats['total_tasks'], stats['completed_tasks']) == (tasks, (tasks + 1) // 2)
+    assert stats['total_journal'] == entries
+
+
+@pytest.mark.parametrize('days, habits', [(2, 1), (365, 20)])
+def test_habits_stats_do_not_read_the_log_history(make_app, days, habits):
+    m = make_app(RESPONSE_CACHE_BACKEND='none')
+    add_user(m, 1)
+    seed(m, 1, days, habits, 0, 0)
+
+    response = login(m, 1).get('/api/habits/stats')
+
+    assert response.headers['X-DB-Queries'] == '3'
+    assert response.get_json()['stats'] == {
+        'total_habits': habits, 'completed_today': habits, 'completion_rate': 100.0, 'best_streak': days}
+
+
+def test_habit_streaks_follow_the_writes(make_app):
+    m = make_app(RESPONSE_CACHE_BACKEND='none')
+    add_user(m, 1)
+    seed(m, 1, 3, 2, 0, 0)
+    client = login(m, 1)
+    with m.app.app_context():
+        first, second = m.db.session.scalars(m.select(m.Habit.habit_id).order_by(m.Habit.habit_id)).all()
+
+    def best_streak():
+        return client.get('/api/habits/stats').get_json()['stats']['best_streak']
+
+    client.post(f'/api/habits/{first}/log')  # un-complete today
+    assert best_streak() == 3
+    client.post(f'/api/habits/{second}/log')
+    assert best_streak() == 0
+    client.post(f'/api/habits/{first}/log')
+    assert best_streak() == 3
+    client.delete(f'/api/habits/{first}')
+    assert best_streak() == 0
+
+    with m.app.app_context():
+        m.rebuild_daily_summary(1)
+    assert best_streak() == 0
+    client.post(f'/api/habits/{second}/log')
+    assert best_streak() == 3
+
+
+def test_async_farm_stats_match_the_sync_ones(make_app, tmp_path):
+    m = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path}/farm.db', ASYNC_DB_ENABLED=True,
+                 RESPONSE_CACHE_BACKEND='none')
+    add_user(m, 1)
+    seed(m, 1, 5, 2, 3, 4)
+    client = login(m, 1)
+
+    response = client.get('/api/async/farm/stats')
+    assert response.status_code == 200
+    assert response.get_json() == client.get('/api/farm/stats').get_json()
@@ -0,0 +1,17 @@
+from conftest import add_user
+
+
+def test_first_readiness_probe_has_table_counts(make_app):
+    m = make_app()
+    add_user(m, 1)
+    body = m.app.test_client().get('/health/ready').get_json()
+    rows = body['approx_rows']
+    assert rows['sampled_at'] is not None and rows['error'] is None
+    assert rows['tables']['users'] == 1
+    assert all(isinstance(n, int) for n in rows['tables'].values())
+
+
+def test_first_health_call_has_counts(make_app):
+    m = make_app()
+    body = m.app.test_client().get('/health').get_json()
+    assert body == {'status': 'healthy', 'mood_entries': 0, 'habit_entries': 0}
@@ -0,0 +1,54 @@
+import json
+
+from sqlalchemy import func, select
+
+from conftest import add_user, login
+
+
+def export_lines(m, moods, end=True):
+    lines = [{'table': 'export', 'row': {'version': m.EXPORT_VERSION, 'user_id': 1}}]
+    lines += [{'table': 'mood', 'row': {'mood': mood, 'energy_level': 3, 'log_date': '2026-10-01'}} for mood in moods]
+    if end:
+        lines.append({'table': 'end', 'row': {'counts': {'mood': len(moods)}}})
+    return ''.join(json.dumps(line) + '\n' for line in lines)
+
+
+def import_state(m, job_id):
+    with m.app.app_context():
+        status = m.db.session.get(m.ImportJob, job_id).status
+        summarized = m.db.session.scalar(select(func.sum(m.DailySummary.mood_entries)).where(
+            m.DailySummary.user_id == 2))
+        return status, summarized
+
+
+def test_import_with_end_record_is_done(make_app):
+    m = make_app()
+    add_user(m, 2)
+    response = login(m, 2).post('/api/import', data=export_lines(m, ['happy', 'calm']))
+    body = response.get_json()
+    assert response.status_code == 200 and body['complete'] is True
+    assert import_state(m, body['job_id']) == ('done', 2)
+
+
+def test_import_without_end_record_stays_partial(make_app):
+    m = make_app()
+    add_user(m, 2)
+    client = login(m, 2)
+    body = client.post('/api/import', data=export_lines(m, ['happy', 'calm'], end=False)).get_json()
+    assert body['complete'] is False
+    assert import_state(m, body['job_id']) == ('partial', 2)
+
+    # the full file finishes the job without importing the same rows twice
+    body = client.post(f"/api/import?job={body['job_id']}", data=export_lines(m, ['happy', 'calm'])).get_json()
+    assert body['complete'] is True
+    assert import_state(m, body['job_id']) == ('done', 2)
+
+
+def test_failed_import_rebuilds_summary_for_committed_rows(make_app):
+    m = make_app(IMPORT_BATCH_SIZE=1)
+    add_user(m, 2)
+    data = export_lines(m, ['happy', 'calm', 'x' * 101])  # the last mood is too long
+    response = login(m, 2).post('/api/import', data=data)
+    body = response.get_json()
+    assert response.status_code == 400 and 'line 4' in body['error']
+    assert import_state(m, body['job_id']) == ('partial', 2)
@@ -0,0 +1,45 @@
+import json
+from datetime import date, timedelta
+
+from conftest import add_user, login
+
+
+def seed(m, user_id, n):
+    today = date.today()
+    with m.app.app_context():
+        m.db.session.add_all(m.Mood(user_id=user_id, mood='calm', log_date=today - timedelta(days=d)) for d in range(n))
+        m.db.session.add_all(m.Task(user_id=user_id, task_name=f'task {i}', due_date=today) for i in range(n))
+        m.db.session.add_all(m.Journal(user_id=user_id, content=f'entry {i}') for i in range(n))
+        m.db.session.commit()
+
+
+def test_list_caps(make_app):
+    m = make_app(LIST_MAX_ROWS=3, HISTORY_MAX_DAYS=4, RESPONSE_CACHE_BACKEND='none')
+    add_user(m, 1)
+    seed(m, 1, 10)
+    client = login(m, 1)
+
+    for path, key in [('/tasks', 'tasks'), ('/journal', 'entries'), ('/mood/history?days=100', 'entries')]:
+        body = client.get('/api' + path).get_json()
+        assert body['success'] is True
+        assert len(body[key]) == body['count'] == 3
+        assert body['truncated'] is True
+
+    history = client.get('/api' + '/mood/history?days=100').get_json()
+    assert history['days'] == 4
+    assert client.get('/api' + '/mood/history?days=soon').status_code == 400
+
+
+def test_stream_error_is_reported_in_the_trailer(make_app):
+    m = make_app()
+
+    def rows():
+        yield {'n': 1}
+        raise RuntimeError('connection lost')
+
+    with m.app.test_request_context():
+        response = m.stream_list('items', rows(), dict, 10)
+        body = json.loads(response.get_data())
+    assert body['items'] == [{'n': 1}]
+    assert body['truncated'] is True
+    assert body['error'] == 'connection lost'
@@ -0,0 +1,46 @@
+from conftest import add_user, login
+
+ADMIN = {'X-Profile': '1', 'X-Admin-Token': 'secret'}
+
+
+def test_streamed_response_is_profiled_until_sent(make_app, tmp_path):
+    m = make_app(PROFILE_DIR=str(tmp_path / 'profiles'), ADMIN_TOKEN='secret')
+    add_user(m, 1)
+    client = login(m, 1)
+    client.post('/api/tasks', json={'name': 'feed the chickens'})
+
+    response = client.get('/api/tasks', headers=ADMIN)
+    profile_id = response.headers['X-Profile-Id']
+    assert 'feed the chickens' in response.get_data(as_text=True)
+    response.close()
+
+    [meta] = m.request_profiler.index()
+    assert meta['id'] == profile_id and meta['streamed'] is True
+    assert 'generate' in m.request_profiler.report(profile_id, limit=None)  # stream_list's body generator
+    assert m.request_profiler._active.acquire(blocking=False)  # released for the next one
+
+
+def test_only_one_profile_at_a_time(make_app, tmp_path):
+    m = make_app(PROFILE_DIR=str(tmp_path / 'profiles'), ADMIN_TOKEN='secret')
+    add_user(m, 1)
+    client = login(m, 1)
+
+    with m.request_profiler._active:  # another request is being profiled
+        response = client.get('/api/farm/stats', headers=ADMIN)
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+    assert m.request_profiler.skipped == 1
+
+    response = client.get('/api/farm/stats', headers=ADMIN)
+    assert 'X-Profile-Id' in response.headers
+
+
+def test_admin_token_only_counts_in_the_header(make_app, tmp_path):
+    m = make_app(PROFILE_DIR=str(tmp_path / 'profiles'), ADMIN_TOKEN='secret')
+    add_user(m, 1)
+    client = login(m, 1)
+
+    response = client.get('/api/farm/stats?admin_token=secret', headers={'X-Profile': '1'})
+    assert 'X-Profile-Id' not in response.headers
+    assert client.get('/admin/profiles?admin_token=secret').status_code == 403
+    assert client.get('/admin/profiles', headers={'X-Admin-Token': 'secret'}).status_code == 200
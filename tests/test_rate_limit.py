@@ -0,0 +1,58 @@
+from conftest import add_user, login
+
+
+class SaturatedPool:
+    def saturation(self):
+        return 0.95
+
+
+def test_empty_bucket_answers_429_with_retry_after(make_app):
+    m = make_app(RATE_LIMITS='read=2/60')
+    add_user(m, 1)
+    client = login(m, 1)
+
+    assert [client.get('/api/tasks').status_code for _ in range(2)] == [200, 200]
+    response = client.get('/api/tasks')
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 30
+    assert response.headers['X-RateLimit-Limit'] == '2'
+    assert m.rate_limiter.limited['read'] == 1
+
+
+def test_limits_are_per_class_and_per_client(make_app):
+    m = make_app(RATE_LIMITS='stats=1/60', RESPONSE_CACHE_BACKEND='none')
+    add_user(m, 1)
+    add_user(m, 2)
+    client = login(m, 1)
+
+    assert client.get('/api/farm/stats').status_code == 200
+    assert client.get('/api/habits/stats').status_code == 429  # same class, @rate_class('stats')
+    assert client.get('/api/tasks').status_code == 200  # 'read' is not limited
+    assert client.post('/api/tasks', json={'name': 'weed'}).status_code != 429
+    assert login(m, 2).get('/api/farm/stats').status_code == 200  # another user's bucket
+
+
+def test_saturated_pool_sheds_with_503(make_app):
+    m = make_app()
+    add_user(m, 1)
+    client = login(m, 1)
+    m.rate_limiter._pools = lambda: [SaturatedPool()]
+
+    response = client.get('/api/tasks')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert m.rate_limiter.shed['pool'] == 1
+    assert m.rate_limiter.in_flight == 0  # released by the teardown
+    assert client.get('/health/live').status_code == 200  # only /api is admitted
+
+
+def test_in_flight_cap_sheds_with_503(make_app):
+    m = make_app(ADMISSION_MAX_IN_FLIGHT=1)
+    add_user(m, 1)
+    client = login(m, 1)
+
+    m.rate_limiter.in_flight = 1  # another request is running
+    assert client.get('/api/tasks').status_code == 503
+    assert m.rate_limiter.shed['in_flight'] == 1
+    m.rate_limiter.in_flight = 0
+    assert client.get('/api/tasks').status_code == 200
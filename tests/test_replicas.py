@@ -0,0 +1,49 @@
+import shutil
+import time
+
+from conftest import add_user, login
+
+
+def replica_app(make_app, tmp_path, replica_url=None):
+    primary = tmp_path / 'primary.db'
+    m = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{primary}', RESPONSE_CACHE_BACKEND='none',
+                 REPLICA_DATABASE_URLS=replica_url or f'sqlite:///{tmp_path}/replica.db')
+    add_user(m, 1)
+    client = login(m, 1)
+    assert client.post('/api/tasks', json={'name': 'water the crops'}).status_code == 200
+    with m.app.app_context():
+        m.db.engine.dispose()
+    shutil.copy(primary, tmp_path / 'replica.db')  # a replica that has caught up
+    return m, login(m, 1)  # new client: not sticky to the primary
+
+
+def task_names(client):
+    response = client.get('/api/tasks')
+    assert response.status_code == 200
+    return [t['name'] for t in response.get_json()['tasks']]
+
+
+def test_reads_go_to_the_replica(make_app, tmp_path):
+    m, client = replica_app(make_app, tmp_path)
+    assert task_names(client) == ['water the crops']
+    assert m.replica_router.status()[0]['reads'] > 0
+
+
+def test_read_is_retried_on_the_primary_when_the_replica_fails(make_app, tmp_path, monkeypatch):
+    (tmp_path / 'missing').mkdir()  # sqlite cannot open a directory: every connect fails
+    m, client = replica_app(make_app, tmp_path, replica_url=f'sqlite:///{tmp_path}/missing')
+    monkeypatch.setattr(m.replica_router, '_start', lambda: None)  # no health check, replica looks healthy
+
+    assert task_names(client) == ['water the crops']
+    assert m.replica_router.retries == 1
+    assert m.replica_router.status()[0]['healthy'] is False
+    assert task_names(client) == ['water the crops']  # now skipped without a retry
+    assert m.replica_router.retries == 1
+
+
+def test_health_checks_do_not_block_requests(make_app, tmp_path, monkeypatch):
+    m, client = replica_app(make_app, tmp_path)
+    monkeypatch.setattr(m.replica_router, '_check', lambda replica: time.sleep(2))  # a hung replica
+    started = time.perf_counter()
+    assert task_names(client) == ['water the crops']
+    assert time.perf_counter() - started < 1
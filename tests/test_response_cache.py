@@ -0,0 +1,133 @@
+import socketserver
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+from response_cache import RedisBackend, ResponseCache
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough RESP for RedisBackend: GET, SET .. PX, DEL."""
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            command = args[0].upper()
+            with self.server.lock:
+                if command == b'GET':
+                    value, expires_at = store.get(args[1], (None, 0))
+                    if value is None or expires_at <= time.monotonic():
+                        self.wfile.write(b'$-1\r\n')
+                    else:
+                        self.wfile.write(b'$%d\r\n%s\r\n' % (len(value), value))
+                elif command == b'SET':
+                    store[args[1]] = (args[2], time.monotonic() + int(args[4]) / 1000)
+                    self.wfile.write(b'+OK\r\n')
+                elif command == b'DEL':
+                    removed = sum(store.pop(key, None) is not None for key in args[1:])
+                    self.wfile.write(b':%d\r\n' % removed)
+                else:
+                    self.wfile.write(b'-ERR unknown command\r\n')
+
+
+@pytest.fixture
+def redis_url():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.store, server.lock = {}, threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'redis://127.0.0.1:{server.server_address[1]}/0'
+    server.shutdown()
+    server.server_close()
+
+
+def worker(**config):
+    """A Flask app with its own ResponseCache, standing in for one gunicorn worker."""
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', **config)
+    cache = ResponseCache(app)
+    calls = []
+
+    @app.route('/stats')
+    @cache.cached('stats')
+    def stats():
+        calls.append(1)
+        return jsonify({'computed': len(calls)})
+
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['user_id'] = 7
+    return client, cache
+
+
+def fetch(client):
+    response = client.get('/stats')
+    return response.headers['X-Cache'], response.get_json()['computed']
+
+
+def test_redis_backend_round_trip(redis_url):
+    backend = RedisBackend(redis_url)
+    assert backend.get('missing') is None
+    backend.set('k', b'value', 60)
+    assert backend.get('k') == b'value'
+    backend.delete('k')
+    assert backend.get('k') is None
+
+
+def test_memory_hit_miss_invalidate():
+    client, cache = worker(RESPONSE_CACHE_BACKEND='memory')
+    assert fetch(client) == ('MISS', 1)
+    assert fetch(client) == ('HIT', 1)
+    cache.invalidate(7, 'stats')
+    assert fetch(client) == ('MISS', 2)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_invalidation_reaches_every_worker(redis_url):
+    first, first_cache = worker(RESPONSE_CACHE_BACKEND='redis', RESPONSE_CACHE_URL=redis_url)
+    second, second_cache = worker(RESPONSE_CACHE_BACKEND='redis', RESPONSE_CACHE_URL=redis_url)
+    assert fetch(first) == ('MISS', 1)
+    assert fetch(second) == ('HIT', 1)  # shared entry
+
+    second_cache.invalidate(7, 'stats')  # a write handled by the other worker
+    assert fetch(first) == ('MISS', 2)
+    assert fetch(second) == ('HIT', 2)
+
+
+def test_entry_computed_across_an_invalidation_is_not_served():
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', RESPONSE_CACHE_BACKEND='memory')
+    cache = ResponseCache(app)
+    calls = []
+
+    @app.route('/stats')
+    @cache.cached('stats')
+    def stats():
+        calls.append(1)
+        if len(calls) == 1:
+            cache.invalidate(7, 'stats')  # a write commits while this response is built
+        return jsonify({'computed': len(calls)})
+
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['user_id'] = 7
+    assert fetch(client) == ('MISS', 1)
+    assert fetch(client) == ('MISS', 2)
+    assert fetch(client) == ('HIT', 2)
+
+
+def test_backend_errors_fall_through_to_the_view():
+    client, cache = worker(RESPONSE_CACHE_BACKEND='redis', RESPONSE_CACHE_URL='redis://127.0.0.1:1/0')
+    assert fetch(client) == ('MISS', 1)
+    assert fetch(client) == ('MISS', 2)
+    cache.invalidate(7, 'stats')
+    assert cache.stats()['errors'] == 3
@@ -0,0 +1,47 @@
+import sqlalchemy as sa
+
+from conftest import add_user, login
+
+
+def shard_apps(make_app, tmp_path):
+    urls = ','.join(f'sqlite:///{tmp_path}/shard{i}.db' for i in range(2))
+    return make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path}/main.db', SHARD_DATABASE_URLS=urls)
+
+
+def test_task_endpoints_use_the_users_shard(make_app, tmp_path):
+    m = shard_apps(make_app, tmp_path)
+    for user_id in (1, 2, 3, 4):
+        add_user(m, user_id)
+    with m.app.app_context():
+        shards = {user_id: m.shard_router.shard_for(user_id) for user_id in (1, 2, 3, 4)}
+    assert len(set(shards.values())) == 2, 'four users should land on both shards'
+
+    for user_id, shard in shards.items():
+        client = login(m, user_id)
+        created = client.post('/api/tasks', json={'name': f'task of {user_id}', 'date': '2026-01-02'})
+        assert created.status_code == 200
+        task_id = created.get_json()['task']['task_id']
+
+        tasks = client.get('/api/tasks').get_json()['tasks']
+        assert [t['task_id'] for t in tasks] == [task_id]
+
+        updated = client.put(f'/api/tasks/{task_id}', json={'name': 'renamed', 'date': '2026-01-03'})
+        assert updated.status_code == 200
+        assert updated.get_json()['task']['name'] == 'renamed'
+
+        toggled = client.post(f'/api/tasks/{task_id}/toggle')
+        assert toggled.status_code == 200
+        assert toggled.get_json()['task']['completed'] is True
+
+        with m.app.app_context():
+            engine = m.db.engines[shard]
+            with engine.connect() as conn:
+                row = conn.execute(sa.text('SELECT task_name, is_completed FROM tasks WHERE task_id = :id AND user_id = :u'),
+                                   {'id': task_id, 'u': user_id}).one()
+            assert tuple(row) == ('renamed', 1)
+            with m.db.engine.connect() as conn:
+                assert conn.execute(sa.text('SELECT COUNT(*) FROM tasks')).scalar() == 0
+
+        assert client.delete(f'/api/tasks/{task_id}').status_code == 200
+        assert client.get('/api/tasks').get_json()['tasks'] == []
+        assert client.post(f'/api/tasks/{task_id}/toggle').status_code == 404
@@ -0,0 +1,64 @@
+import time
+
+import sqlalchemy as sa
+from flask import Flask
+from sqlalchemy.pool import QueuePool
+
+from slow_queries import SlowQueryLog
+from sql_metrics import QueryTracker
+
+
+def wait_for_plan(log, shape, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        plan = log.snapshot()[0]['plan']
+        if plan is not None and not plan.get('pending'):
+            return plan
+        time.sleep(0.01)
+    raise AssertionError('EXPLAIN never finished')
+
+
+def test_explain_does_not_block_a_saturated_pool(tmp_path):
+    engine = sa.create_engine(f'sqlite:///{tmp_path}/slow.db', poolclass=QueuePool,
+                              pool_size=1, max_overflow=0, pool_timeout=3)
+    app = Flask(__name__)
+    app.config.update(SLOW_QUERY_MS=0)
+    tracker = QueryTracker(app, engine)
+    log = SlowQueryLog(app, tracker, engine)
+
+    with engine.connect() as conn:  # the only connection in the pool
+        started = time.perf_counter()
+        log.observe('SELECT 1', (), 1.0, conn)
+        log.observe('SELECT 1', (), 1.0, conn)  # same shape: no second EXPLAIN
+        assert time.perf_counter() - started < 0.5
+        assert log._pending.qsize() <= 1
+        assert log.snapshot()[0]['plan'] == {'pending': True}
+
+    assert 'rows' in wait_for_plan(log, 'SELECT 1')
+    assert len(log.entries) == 2
+    log.stop()
+
+
+def test_admin_views_are_closed_without_a_token(make_app):
+    m = make_app()
+    client = m.app.test_client()  # the test client connects from 127.0.0.1
+    assert client.get('/admin/slow-queries').status_code == 403
+
+    m.app.config['ADMIN_ALLOW_LOOPBACK'] = True
+    assert client.get('/admin/slow-queries').status_code == 200
+    assert client.get('/admin/slow-queries', environ_base={'REMOTE_ADDR': '10.0.0.7'}).status_code == 403
+
+    m.app.config['ADMIN_TOKEN'] = 'secret'
+    assert client.get('/admin/slow-queries').status_code == 403
+    assert client.get('/admin/slow-queries', headers={'X-Admin-Token': 'secret'}).status_code == 200
+
+
+def test_parameters_are_only_kept_on_request(tmp_path):
+    engine = sa.create_engine(f'sqlite:///{tmp_path}/slow.db')
+    for keep, expected in ((False, None), (True, "('farmer@example.com',)")):
+        app = Flask(__name__)
+        app.config.update(SLOW_QUERY_MS=0, SLOW_QUERY_EXPLAIN=False, SLOW_QUERY_PARAMETERS=keep)
+        log = SlowQueryLog(app, QueryTracker(app, engine), engine)
+        with engine.connect() as conn:
+            log.observe('SELECT ?', ('farmer@example.com',), 1.0, conn)
+        assert log.snapshot()[0]['parameters'] == expected
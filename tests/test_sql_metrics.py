@@ -0,0 +1,30 @@
+import sqlalchemy as sa
+from flask import Flask
+
+from sql_metrics import QueryTracker
+
+
+def test_failed_statement_leaves_no_timing_behind(tmp_path):
+    engine = sa.create_engine(f'sqlite:///{tmp_path}/metrics.db')
+    app = Flask(__name__)
+    tracker = QueryTracker(app, engine)
+    timed = []
+    tracker.add_listener(lambda statement, parameters, duration, conn: timed.append((statement, duration)))
+
+    @app.route('/')
+    def view():
+        with engine.connect() as conn:
+            for _ in range(3):
+                try:
+                    conn.execute(sa.text('SELECT * FROM missing_table'))
+                except sa.exc.OperationalError:
+                    conn.rollback()
+            conn.execute(sa.text('SELECT 1'))
+            leftovers = {key: value for key, value in conn.connection.info.items() if 'start' in key}
+        return {'leftovers': len(leftovers)}
+
+    response = app.test_client().get('/')
+    assert response.get_json() == {'leftovers': 0}
+    assert response.headers['X-DB-Queries'] == '1'
+    assert [statement for statement, _ in timed] == ['SELECT 1']
+    assert 0 <= timed[0][1] < 1
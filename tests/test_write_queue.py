@@ -0,0 +1,89 @@
+import threading
+
+from conftest import add_user, login
+
+
+def make_write_behind_app(make_app, tmp_path, **config):
+    # a file database: the flusher thread commits on its own connection
+    m = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'farm.db'}", WRITE_BEHIND_ENABLED=True, **config)
+    add_user(m, 1)
+    with m.app.app_context():
+        habit = m.Habit(user_id=1, habit_name='Water plants')
+        m.db.session.add(habit)
+        m.db.session.commit()
+        habit_id = habit.habit_id
+    return m, habit_id
+
+
+def hold_flusher(m, kind):
+    """Make the flusher wait for the returned event before applying `kind`."""
+    release = threading.Event()
+    apply, on_commit = m.write_queue.handlers[kind]
+
+    def held(payloads):
+        release.wait(5)
+        return apply(payloads)
+
+    m.write_queue.handlers[kind] = (held, on_commit)
+    return release
+
+
+def completed_today(m, habit_id):
+    with m.app.app_context():
+        return m.HabitLog.query.filter_by(
+            habit_id=habit_id, log_date=m.date.today(), completed=True).first() is not None
+
+
+def test_queued_toggles_count_pending_ones(make_app, tmp_path):
+    m, habit_id = make_write_behind_app(make_app, tmp_path, WRITE_BEHIND_ACK='queued')
+    client = login(m, 1)
+    release = hold_flusher(m, 'habit_log')
+
+    states = []
+    for _ in range(3):
+        response = client.post(f'/api/habits/{habit_id}/log')
+        assert response.status_code == 202
+        states.append(response.get_json()['habit']['completed_today'])
+    assert states == [True, False, True]
+
+    release.set()
+    m.write_queue.stop()  # flushes the queue
+    assert completed_today(m, habit_id) is True
+
+    # nothing queued any more: predicted from the database again
+    response = client.post(f'/api/habits/{habit_id}/log')
+    assert response.get_json()['habit']['completed_today'] is False
+
+
+def test_commit_timeout_answers_pending(make_app, tmp_path):
+    m, habit_id = make_write_behind_app(make_app, tmp_path, WRITE_BEHIND_TIMEOUT=0.05)
+    client = login(m, 1)
+    release = hold_flusher(m, 'habit_log')
+
+    response = client.post(f'/api/habits/{habit_id}/log')
+    assert response.status_code == 202
+    assert response.get_json()['pending'] is True
+
+    release.set()
+    m.write_queue.stop()
+    assert completed_today(m, habit_id) is True
+
+
+def test_toggle_of_an_already_committed_write_does_not_hang():
+    from concurrent.futures import Future
+
+    from write_queue import PendingToggles
+
+    def committed():
+        future = Future()
+        future.set_result(True)  # the flusher beat us to it
+        return future
+
+    toggles = PendingToggles()
+    done = []
+    worker = threading.Thread(target=lambda: done.extend(
+        toggles.toggle('habit', lambda: False, committed)[1] for _ in range(2)), daemon=True)
+    worker.start()
+    worker.join(2)
+    assert done == [True, True]  # each settled at once, so both read the stored state
+    assert toggles._pending == {}
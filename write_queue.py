@@ -0,0 +1,285 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import nullcontext
+
+from sql_metrics import Histogram, metric_lines
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class QueueFull(Exception):
+    """The write-behind queue holds WRITE_BEHIND_MAX_QUEUE operations; shed the write."""
+
+
+class WriteOp:
+    __slots__ = ('kind', 'payload', 'partition', 'future', 'queued_at')
+
+    def __init__(self, kind, payload, partition):
+        self.kind = kind
+        self.payload = payload
+        self.partition = partition
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+
+
+class PendingToggles:
+    """
+    Expected outcome of queued toggles, for answering before they are applied
+    (WRITE_BEHIND_ACK=queued). While toggles of a key from this process are
+    queued, the next one is predicted from the last prediction instead of from
+    the database, which does not show them yet. Toggles queued by other
+    worker processes are not seen.
+    """
+
+    def __init__(self):
+        self._pending = {}  # key -> [queued toggles, state after the last one]
+        self._settled = 0
+        self._lock = threading.Lock()
+
+    def toggle(self, key, committed_state, submit):
+        """
+        submit() the toggle of `key`; returns (future, expected state after it).
+        committed_state() reads the stored state, and is only called (outside
+        the lock) when no toggle of `key` is queued.
+        """
+        queued = None
+        while queued is None:
+            with self._lock:
+                entry = self._pending.get(key)
+                if entry is not None:
+                    queued = self._queue(key, entry, not entry[1], submit)
+                    break
+                settled = self._settled
+            state = not committed_state()
+            with self._lock:
+                entry = self._pending.get(key)
+                if entry is not None:
+                    queued = self._queue(key, entry, not entry[1], submit)
+                elif self._settled == settled:  # else a toggle committed meanwhile; read again
+                    queued = self._queue(key, [0, state], state, submit)
+        # outside the lock: a future that is already done runs the callback
+        # right here, and _settle takes the lock
+        queued[0].add_done_callback(lambda _: self._settle(key))
+        return queued
+
+    def _queue(self, key, entry, state, submit):
+        # under the lock, so predictions follow queue order
+        future = submit()
+        entry[0] += 1
+        entry[1] = state
+        self._pending[key] = entry
+        return future, state
+
+    def _settle(self, key):
+        with self._lock:
+            self._settled += 1
+            entry = self._pending[key]
+            entry[0] -= 1
+            if not entry[0]:
+                del self._pending[key]
+
+
+class WriteCoalescer:
+    """
+    Optional write-behind for small, frequent writes (WRITE_BEHIND_ENABLED).
+
+    Views submit() an operation instead of committing it themselves. A flusher
+    thread collects operations for WRITE_BEHIND_FLUSH_MS after the first one
+    arrives (or until WRITE_BEHIND_MAX_BATCH are waiting) and applies them with
+    the handler registered for their kind, all in one transaction: one commit,
+    and one fsync, per batch instead of per request. If a batch fails it is
+    retried one operation per transaction, so a bad write only fails its own
+    request.
+
+    WRITE_BEHIND_ACK decides when the request is answered:
+      commit   after its batch has committed (durable, as without the queue)
+      queued   as soon as it is queued (202; lost if the process dies first)
+    """
+
+    def __init__(self, app=None, **kwargs):
+        self.enabled = False
+        self.ack = 'commit'
+        self.handlers = {}
+        self.batches = 0
+        self.operations = 0
+        self.failures = 0
+        self.batch_sizes = Histogram(
+            'farm_write_batch_size', 'Operations committed per write-behind batch.', BATCH_SIZE_BUCKETS)
+        self.flush_seconds = Histogram(
+            'farm_write_flush_seconds', 'Time to apply and commit one write-behind batch.', LATENCY_BUCKETS)
+        self.queue_wait = Histogram(
+            'farm_write_ack_seconds', 'Time from submit to commit per operation.', LATENCY_BUCKETS)
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, **kwargs)
+
+    def init_app(self, app, db, partition=None, scope=None):
+        """
+        partition() is called in the request and scope(key) around the flush of
+        the operations that share its key, e.g. to pin the user's shard.
+        """
+        app.config.setdefault('WRITE_BEHIND_ENABLED', False)
+        app.config.setdefault('WRITE_BEHIND_ACK', 'commit')
+        app.config.setdefault('WRITE_BEHIND_FLUSH_MS', 5)
+        app.config.setdefault('WRITE_BEHIND_MAX_BATCH', 500)
+        app.config.setdefault('WRITE_BEHIND_MAX_QUEUE', 10000)
+        app.config.setdefault('WRITE_BEHIND_TIMEOUT', 5)
+        if app.config['WRITE_BEHIND_ACK'] not in ('commit', 'queued'):
+            raise ValueError(f"Unknown WRITE_BEHIND_ACK: {app.config['WRITE_BEHIND_ACK']!r}")
+        self.app = app
+        self.db = db
+        self.enabled = app.config['WRITE_BEHIND_ENABLED']
+        self.ack = app.config['WRITE_BEHIND_ACK']
+        self.flush_interval = app.config['WRITE_BEHIND_FLUSH_MS'] / 1000
+        self.max_batch = app.config['WRITE_BEHIND_MAX_BATCH']
+        self.max_queue = app.config['WRITE_BEHIND_MAX_QUEUE']
+        self.timeout = app.config['WRITE_BEHIND_TIMEOUT']
+        self.partition = partition or (lambda: None)
+        self.scope = scope or (lambda key: nullcontext())
+        app.extensions['write_coalescer'] = self
+
+    def register(self, kind, apply, on_commit=None):
+        """
+        apply(payloads) -> one result per payload; runs in the flusher's session
+        and must not commit. on_commit(payloads, results) runs after the commit.
+        """
+        self.handlers[kind] = (apply, on_commit)
+
+    # ----- request side -----
+
+    def submit(self, kind, payload):
+        """Queue one operation; the returned Future resolves to its result once committed."""
+        if kind not in self.handlers:
+            raise KeyError(f"No write handler for {kind!r}")
+        self._start()
+        op = WriteOp(kind, payload, self.partition())
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            raise QueueFull('Too many pending writes, retry shortly')
+        return op.future
+
+    def wait(self, future):
+        """
+        The operation's result; raises what its handler raised, or TimeoutError
+        after WRITE_BEHIND_TIMEOUT (the operation is still queued and may commit).
+        """
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            raise TimeoutError(f'Write not committed after {self.timeout}s') from None
+
+    # ----- flusher -----
+
+    def _start(self):
+        # lazily, and again in a forked worker where the thread is gone
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.max_queue)
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name='write-behind', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, pending):
+        while True:
+            op = pending.get()
+            if op is None:
+                return
+            batch = [op]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    op = pending.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if op is None:
+                    stop = True
+                    break
+                batch.append(op)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        with self.app.app_context():
+            groups = {}
+            for op in batch:
+                groups.setdefault(op.partition, []).append(op)
+            for partition, ops in groups.items():
+                with self.scope(partition):
+                    try:
+                        self._commit(ops)
+                    except Exception as e:
+                        self.db.session.rollback()
+                        if len(ops) == 1:
+                            self._fail(ops[0], e)
+                            continue
+                        # find the bad one(s); the others still commit
+                        for op in ops:
+                            try:
+                                self._commit([op])
+                            except Exception as e:
+                                self.db.session.rollback()
+                                self._fail(op, e)
+        self.batches += 1
+        self.flush_seconds.observe('all', time.perf_counter() - started)
+
+    def _commit(self, ops):
+        by_kind = {}
+        for op in ops:
+            by_kind.setdefault(op.kind, []).append(op)
+        results = {kind: self.handlers[kind][0]([op.payload for op in kind_ops]) for kind, kind_ops in by_kind.items()}
+        self.db.session.commit()
+        done = time.perf_counter()
+        for kind, kind_ops in by_kind.items():
+            on_commit = self.handlers[kind][1]
+            if on_commit is not None:
+                try:
+                    on_commit([op.payload for op in kind_ops], results[kind])
+                except Exception as e:
+                    self.app.logger.error('Write-behind on_commit for %s failed: %s', kind, e)
+            self.batch_sizes.observe(kind, len(kind_ops))
+            for op, result in zip(kind_ops, results[kind]):
+                self.queue_wait.observe(kind, done - op.queued_at)
+                op.future.set_result(result)
+        self.operations += len(ops)
+
+    def _fail(self, op, e):
+        self.failures += 1
+        if self.ack == 'queued':
+            # nobody is waiting for the result; the log is all that's left of it
+            self.app.logger.error('Write-behind %s dropped: %s (%r)', op.kind, e, op.payload)
+        op.future.set_exception(e)
+
+    def stop(self, timeout=5):
+        """Flush what is queued and stop the flusher (worker exit)."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def render_metrics(self):
+        lines = []
+        lines += metric_lines('farm_write_queue_depth', 'Write-behind operations waiting to be flushed.', 'gauge', self.depth())
+        lines += metric_lines('farm_write_batches_total', 'Write-behind batches flushed.', 'counter', self.batches)
+        lines += metric_lines('farm_write_operations_total', 'Write-behind operations committed.', 'counter', self.operations)
+        lines += metric_lines('farm_write_failures_total', 'Write-behind operations that failed.', 'counter', self.failures)
+        for hist in (self.batch_sizes, self.flush_seconds, self.queue_wait):
+            lines += hist.render(label_name='kind')
+        return lines
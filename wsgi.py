@@ -0,0 +1,24 @@
+"""
+Production entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app     # Linux/macOS: WEB_CONCURRENCY processes x WEB_THREADS
+    python wsgi.py                            # any OS (Windows too): waitress, WEB_THREADS threads
+
+`python app_fixed.py` remains the debug server for development.
+"""
+import config
+from app_fixed import create_app, shutdown_app
+
+app = create_app()
+
+
+if __name__ == '__main__':
+    from waitress import serve
+
+    print(f"🚀 Serving on http://{config.WEB_BIND} with {config.WEB_THREADS} threads")
+    try:
+        # waitress stops accepting on Ctrl+C and lets in-flight requests finish
+        serve(app, listen=config.WEB_BIND, threads=config.WEB_THREADS,
+              channel_timeout=config.WEB_TIMEOUT, ident='farm')
+    finally:
+        shutdown_app()